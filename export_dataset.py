@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import argparse
+import json
+import multiprocessing
+from modules.dataset_export import export_shards, migrate_segments
+from modules.clip_export import extract_segment_clips
+from modules.frame_tensor_export import export_frame_tensors
+from modules.output_store import JsonlOutputStore, merge_pending_log
+from modules.sqlite_store import export_sqlite_store
+from modules.columnar_export import update_columnar, read_columnar, filter_by_diagnosis, dataset_statistics
+
+
+def build_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(description="智能视频标注分析平台（慧影）- 无界面数据集导出工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    shards_parser = subparsers.add_parser("shards", help="校验标注数据并导出为训练用分片")
+    shards_parser.add_argument("--jsonl", required=True, help="标注输出的 JSONL 文件")
+    shards_parser.add_argument("--videos", help="视频文件夹，默认为 JSONL 同级的 videos 目录")
+    shards_parser.add_argument("--output", required=True, help="分片输出目录")
+    shards_parser.add_argument("--shard-size", type=int, default=1000, help="每个分片的条目数（默认1000）")
+    shards_parser.add_argument("--format", choices=["jsonl", "parquet", "both"], default="jsonl",
+                               help="分片格式（parquet 需要安装 pyarrow）")
+    shards_parser.add_argument("--workers", type=int, default=None, help="并行进程数")
+
+    migrate_parser = subparsers.add_parser("migrate", help="为旧条目补全结构化 segments 字段（一次性迁移）")
+    migrate_parser.add_argument("--jsonl", required=True, help="标注输出的 JSONL 文件")
+    migrate_parser.add_argument("--no-backup", action="store_true", help="不保留 .bak 备份")
+
+    clips_parser = subparsers.add_parser("clips", help="为每个标注片段切出单独的视频片段（可中断后继续）")
+    clips_parser.add_argument("--jsonl", required=True, help="标注输出的 JSONL 文件")
+    clips_parser.add_argument("--videos", help="视频文件夹，默认为 JSONL 同级的 videos 目录")
+    clips_parser.add_argument("--output", required=True, help="片段输出目录")
+    clips_parser.add_argument("--workers", type=int, default=None, help="并行进程数")
+    clips_parser.add_argument("--ffmpeg", help="ffmpeg 可执行文件路径（默认在 PATH 中查找）")
+    clips_parser.add_argument("--retry-failed", action="store_true", help="重试之前失败的片段")
+
+    frames_parser = subparsers.add_parser("frames", help="把每个条目的采样帧导出为内存映射的 .npy 数组（训练时免解码）")
+    frames_parser.add_argument("--jsonl", required=True, help="标注输出的 JSONL 文件")
+    frames_parser.add_argument("--videos", help="视频文件夹，默认为 JSONL 同级的 videos 目录")
+    frames_parser.add_argument("--output", required=True, help="输出目录")
+    frames_parser.add_argument("--frames", type=int, default=16, help="每个条目的帧数（默认16）")
+    frames_parser.add_argument("--size", type=int, nargs=2, default=[224, 224], metavar=("WIDTH", "HEIGHT"),
+                               help="帧尺寸，等比缩放后居中裁剪（默认224 224）")
+    frames_parser.add_argument("--sampling", choices=["uniform", "segments"], default="uniform",
+                               help="取帧方式：整个视频均匀取帧，或按标注片段取帧")
+    frames_parser.add_argument("--workers", type=int, default=None, help="并行进程数")
+
+    columnar_parser = subparsers.add_parser("columnar", help="增量更新 JSONL 旁的列式（Parquet）文件")
+    columnar_parser.add_argument("--jsonl", required=True, help="标注输出的 JSONL 文件")
+    columnar_parser.add_argument("--output", help="列式文件路径，默认与 JSONL 同名的 .parquet")
+    columnar_parser.add_argument("--force", action="store_true", help="忽略已有结果，完整重建")
+
+    stats_parser = subparsers.add_parser("stats", help="基于列式文件统计或筛选数据集")
+    stats_parser.add_argument("--jsonl", required=True, help="标注输出的 JSONL 文件（列式文件过期时先增量更新）")
+    stats_parser.add_argument("--diagnosis", help="只统计诊断结果中包含指定诊断的条目")
+    stats_parser.add_argument("--min-duration", type=float, help="最短视频时长（秒）")
+    stats_parser.add_argument("--max-duration", type=float, help="最长视频时长（秒）")
+    stats_parser.add_argument("--list", action="store_true", help="同时列出筛选出的视频")
+
+    return parser
+
+
+def build_filters(args):
+    """根据命令行参数生成列式文件的过滤条件（诊断是列表列，读取后由 filter_by_diagnosis 筛选）"""
+    filters = []
+    if args.min_duration is not None:
+        filters.append(("duration", ">=", args.min_duration))
+    if args.max_duration is not None:
+        filters.append(("duration", "<=", args.max_duration))
+    return filters or None
+
+
+def main(argv=None):
+    """命令行入口函数"""
+    args = build_parser().parse_args(argv)
+
+    # 标注程序保存时先追加到 <jsonl>.log（或写入 SQLite 工作库），导出前先生成完整的 JSONL
+    try:
+        merge_pending_log(args.jsonl)
+        export_sqlite_store(args.jsonl)
+    except OSError as e:
+        print(f"合并标注日志失败: {e}")
+        return 1
+
+    if args.command == "shards":
+        videos_folder = args.videos or os.path.join(os.path.dirname(os.path.abspath(args.jsonl)), "videos")
+        formats = ("jsonl", "parquet") if args.format == "both" else (args.format,)
+        try:
+            manifest = export_shards(args.jsonl, videos_folder, args.output,
+                                     shard_size=max(1, args.shard_size), formats=formats,
+                                     max_workers=args.workers)
+        except (OSError, RuntimeError) as e:
+            print(f"导出失败: {e}")
+            return 1
+        return 0 if manifest["total_entries"] > 0 else 1
+
+    if args.command == "migrate":
+        try:
+            # 持有写锁，避免与正在保存的标注程序同时替换文件
+            with JsonlOutputStore(args.jsonl).locked():
+                migrate_segments(args.jsonl, backup=not args.no_backup)
+        except OSError as e:
+            print(f"迁移失败: {e}")
+            return 1
+        return 0
+
+    if args.command == "clips":
+        videos_folder = args.videos or os.path.join(os.path.dirname(os.path.abspath(args.jsonl)), "videos")
+        try:
+            summary = extract_segment_clips(args.jsonl, videos_folder, args.output, max_workers=args.workers,
+                                            ffmpeg=args.ffmpeg, retry_failed=args.retry_failed)
+        except OSError as e:
+            print(f"片段导出失败: {e}")
+            return 1
+        return 0 if summary["failed"] == 0 else 1
+
+    if args.command == "frames":
+        videos_folder = args.videos or os.path.join(os.path.dirname(os.path.abspath(args.jsonl)), "videos")
+        try:
+            manifest = export_frame_tensors(args.jsonl, videos_folder, args.output,
+                                            frames=max(1, args.frames), width=args.size[0], height=args.size[1],
+                                            sampling=args.sampling, max_workers=args.workers)
+        except OSError as e:
+            print(f"帧数组导出失败: {e}")
+            return 1
+        return 0 if manifest["total_entries"] > 0 else 1
+
+    if args.command == "columnar":
+        try:
+            update_columnar(args.jsonl, args.output, force=args.force)
+        except (OSError, RuntimeError) as e:
+            print(f"列式导出失败: {e}")
+            return 1
+        return 0
+
+    if args.command == "stats":
+        try:
+            columnar_path = update_columnar(args.jsonl)["path"]
+            table = read_columnar(columnar_path, filters=build_filters(args))
+            if args.diagnosis:
+                table = filter_by_diagnosis(table, args.diagnosis)
+        except (OSError, RuntimeError) as e:
+            print(f"统计失败: {e}")
+            return 1
+        print(json.dumps(dataset_statistics(table), ensure_ascii=False, indent=2))
+        if args.list:
+            for entry_id, video in zip(table["id"].to_pylist(), table["video"].to_pylist()):
+                print(f"{entry_id}\t{video}")
+        return 0
+
+    return 1
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
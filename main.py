@@ -4,6 +4,7 @@
 import sys
 import os
 import traceback
+import multiprocessing
 from PyQt5.QtWidgets import QApplication
 from modules.main_window import MainWindow
 from PyQt5.QtCore import QTimer
@@ -27,6 +28,9 @@ def exception_hook(exctype, value, traceback_obj):
 
 def main():
     """程序入口函数"""
+    # 打包后的程序使用进程池时需要
+    multiprocessing.freeze_support()
+    
     # 设置异常捕获器
     sys.excepthook = exception_hook
     
@@ -0,0 +1,202 @@
+import re
+import math
+
+# 标注片段行：开始时间-结束时间: 标签。时间格式为 [时:]分:秒[.毫秒] 或纯秒数
+_TIME_PATTERN = r"\d+(?::\d{1,2}){0,2}(?:\.\d+)?"
+_SEGMENT_LINE_RE = re.compile(
+    rf"^\s*({_TIME_PATTERN})\s*-\s*({_TIME_PATTERN})\s*(?::\s*(.*?))?\s*$"
+)
+_THINK_RE = re.compile(r"<think>(.*?)</think>", re.S)
+_ANSWER_RE = re.compile(r"<answer>(.*?)</answer>", re.S)
+
+DESCRIPTION_HEADER = "视频总描述:"
+SEGMENTS_HEADER = "标注片段:"
+DIAGNOSIS_HEADER = "最终诊断结果:"
+
+
+def parse_time_ms(text):
+    """
+    将时间字符串解析为毫秒数
+
+    支持 "分:秒.毫秒"（播放器生成的格式）、"时:分:秒.毫秒" 和纯秒数。
+
+    Returns:
+        int: 毫秒数，无法解析时返回 None
+    """
+    if text is None:
+        return None
+    text = str(text).strip()
+    if not text:
+        return None
+    try:
+        seconds = 0.0
+        for part in text.split(':'):
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        return None
+    if not math.isfinite(seconds) or seconds < 0:
+        return None  # "inf"、"nan"、"1e400" 等也能被 float() 解析
+    return int(round(seconds * 1000))
+
+
+def format_time_ms(ms):
+    """将毫秒数格式化为播放器使用的 "分:秒.毫秒" 字符串"""
+    ms = max(0, int(ms))
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{minutes:02d}:{seconds:02d}.{ms:03d}"
+
+
+def parse_segment_line(line):
+    """
+    解析一行标注片段文本
+
+    Returns:
+        dict: {'start_time', 'end_time', 'label'}，不是有效片段行时返回 None
+    """
+    match = _SEGMENT_LINE_RE.match(line or "")
+    if not match:
+        return None
+    return {
+        'start_time': match.group(1),
+        'end_time': match.group(2),
+        'label': (match.group(3) or "").strip()
+    }
+
+
+def split_raw_description(raw_desc):
+    """
+    拆分 raw_description 文本
+
+    Returns:
+        tuple: (视频描述, 标注片段文本行列表, 最终诊断结果)
+    """
+    raw_desc = raw_desc or ""
+    diag_parts = raw_desc.split(f"\n\n{DIAGNOSIS_HEADER}", 1)
+    if len(diag_parts) > 1:
+        desc_content = diag_parts[0].strip()
+        final_diag = diag_parts[1].strip()
+    elif raw_desc.strip().startswith(DIAGNOSIS_HEADER):
+        desc_content = ""
+        final_diag = raw_desc.strip()[len(DIAGNOSIS_HEADER):].strip()
+    else:
+        desc_content = raw_desc.strip()
+        final_diag = ""
+
+    if desc_content.startswith(SEGMENTS_HEADER):
+        anno_parts = ["", desc_content[len(SEGMENTS_HEADER):]]
+    else:
+        anno_parts = desc_content.split(f"\n\n{SEGMENTS_HEADER}", 1)
+    video_desc = anno_parts[0].strip()
+    if video_desc.startswith(DESCRIPTION_HEADER):
+        video_desc = video_desc[len(DESCRIPTION_HEADER):].strip()
+
+    segment_lines = []
+    if len(anno_parts) > 1:
+        segment_lines = [line.strip() for line in anno_parts[1].strip().split('\n') if line.strip()]
+    return video_desc, segment_lines, final_diag
+
+
+def split_diagnoses(final_diag):
+    """把最终诊断结果拆成诊断列表（界面保存时以 ", " 连接多个诊断）"""
+    return [diagnosis.strip() for diagnosis in (final_diag or "").split(',') if diagnosis.strip()]
+
+
+def parse_raw_description(raw_desc):
+    """
+    解析 raw_description，返回 (视频描述, 标注列表, 最终诊断结果)。
+    无法识别的标注行会被跳过。
+    """
+    video_desc, segment_lines, final_diag = split_raw_description(raw_desc)
+    annotations = []
+    for line in segment_lines:
+        annotation = parse_segment_line(line)
+        if annotation:
+            annotations.append(annotation)
+    return video_desc, annotations, final_diag
+
+
+def segments_from_annotations(annotations):
+    """
+    将界面使用的标注列表转换为条目中保存的结构化片段
+
+    Returns:
+        list: [{'start_ms', 'end_ms', 'label'}]，时间无法解析的标注会被跳过
+    """
+    segments = []
+    for annotation in annotations:
+        start_ms = parse_time_ms(annotation.get('start_time'))
+        end_ms = parse_time_ms(annotation.get('end_time'))
+        if start_ms is None or end_ms is None:
+            print(f"警告: 标注时间无法解析，未写入结构化片段: {annotation}")
+            continue
+        segments.append({'start_ms': start_ms, 'end_ms': end_ms, 'label': annotation.get('label', '')})
+    return segments
+
+
+def annotations_from_segments(segments):
+    """将结构化片段转换为界面使用的标注列表"""
+    return [
+        {
+            'start_time': format_time_ms(segment['start_ms']),
+            'end_time': format_time_ms(segment['end_ms']),
+            'label': segment.get('label', '')
+        }
+        for segment in segments
+    ]
+
+
+def is_valid_segments(segments):
+    """检查 segments 字段是否为有效的结构化片段列表"""
+    if not isinstance(segments, list):
+        return False
+    for segment in segments:
+        if not isinstance(segment, dict):
+            return False
+        start_ms, end_ms = segment.get('start_ms'), segment.get('end_ms')
+        if not isinstance(start_ms, int) or not isinstance(end_ms, int) or start_ms < 0 or end_ms < start_ms:
+            return False
+        if not isinstance(segment.get('label', ''), str):
+            return False
+    return True
+
+
+def parse_entry(entry):
+    """
+    读取条目的视频描述、标注列表和最终诊断结果。
+    有结构化 segments 字段时直接使用，旧条目才从 raw_description 文本中解析标注。
+
+    Returns:
+        tuple: (视频描述, 标注列表, 最终诊断结果)
+    """
+    segments = entry.get('segments')
+    if is_valid_segments(segments):
+        video_desc, _, final_diag = split_raw_description(entry.get('raw_description', ''))
+        return video_desc, annotations_from_segments(segments), final_diag
+    return parse_raw_description(entry.get('raw_description', ''))
+
+
+def split_ai_response(text):
+    """
+    从 "<think>...</think><answer>...</answer>" 格式的回答中提取思维链和答案
+
+    Returns:
+        tuple: (思维链, 答案)
+    """
+    text = text or ""
+    think_match = _THINK_RE.search(text)
+    answer_match = _ANSWER_RE.search(text)
+    thinking = think_match.group(1).strip() if think_match else ""
+    if answer_match:
+        answer = answer_match.group(1).strip()
+    else:
+        answer = _THINK_RE.sub("", text).strip()
+    return thinking, answer
+
+
+def get_ai_response(entry):
+    """返回条目中第一条 gpt 回答文本"""
+    for turn in entry.get("conversations") or []:
+        if isinstance(turn, dict) and turn.get("from") == "gpt":
+            return turn.get("value", "") or ""
+    return ""
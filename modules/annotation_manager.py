@@ -1,8 +1,11 @@
 import os
-from PyQt5.QtCore import QObject, pyqtSignal, Qt
+import bisect
+from PyQt5.QtCore import QObject, pyqtSignal, Qt, QAbstractListModel, QModelIndex
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, 
                              QDialogButtonBox, QLineEdit, QMessageBox, QLabel)
-from PyQt5.QtGui import QFont
+from PyQt5.QtGui import QFont, QColor, QBrush
+from .annotation_format import parse_time_ms
+from .segments import Segment, IntervalTree
 
 
 class AnnotationDialog(QDialog):
@@ -128,6 +131,18 @@ class AnnotationDialog(QDialog):
             self.end_time_edit.setFocus()
             return
             
+        end_ms = parse_time_ms(self.end_time)
+        if end_ms is None:
+            QMessageBox.warning(self, "警告", "结束时间格式无效，请使用 分:秒.毫秒 格式（例如 01:23.456）")
+            self.end_time_edit.setFocus()
+            return
+
+        start_ms = parse_time_ms(self.start_time)
+        if start_ms is not None and end_ms < start_ms:
+            QMessageBox.warning(self, "警告", "结束时间不能早于开始时间")
+            self.end_time_edit.setFocus()
+            return
+
         if not self.label:
             QMessageBox.warning(self, "警告", "请输入标签描述")
             self.label_edit.setFocus()
@@ -146,78 +161,255 @@ class AnnotationDialog(QDialog):
 
 
 class AnnotationManager(QObject):
-    """标注管理器，处理视频片段标注的相关操作"""
+    """
+    标注管理器，处理视频片段标注的相关操作。
+
+    标注以 Segment（整数毫秒）保存，并按开始时间排序；同时维护一棵区间树，
+    用于查询某一时刻覆盖的片段（播放时高亮）和重叠检测。
+    每次修改都会发出细粒度的插入/更新/删除信号，列表模型据此只刷新受影响的行。
+    """
     
-    annotation_changed = pyqtSignal(list)  # 标注变更信号，传递更新后的标注列表
+    annotation_changed = pyqtSignal()  # 标注变更信号（任意修改后发出）
+    segment_inserted = pyqtSignal(int)  # 片段插入信号(行号)
+    segment_updated = pyqtSignal(int)  # 片段内容更新信号(行号)
+    segment_removed = pyqtSignal(int)  # 片段删除信号(行号)
+    segments_reset = pyqtSignal()  # 片段列表整体替换信号
+    suggestions_changed = pyqtSignal()  # 建议片段变化信号
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.annotations = []
+        self.segments = []
+        self._sort_keys = []
+        self._interval_tree = None
+        self.suggestions = []  # 镜头/运动分析给出的建议片段，不属于标注，不会被保存
+
+    @property
+    def interval_tree(self):
+        """区间树在片段变化后按需重建"""
+        if self._interval_tree is None:
+            self._interval_tree = IntervalTree(
+                (segment.start_ms, segment.end_ms, index) for index, segment in enumerate(self.segments)
+            )
+        return self._interval_tree
+
+    def _insert_segment(self, segment):
+        key = segment.sort_key()
+        row = bisect.bisect_right(self._sort_keys, key)
+        self._sort_keys.insert(row, key)
+        self.segments.insert(row, segment)
+        self._interval_tree = None
+        return row
+
+    def _remove_segment(self, row):
+        self._sort_keys.pop(row)
+        self._interval_tree = None
+        return self.segments.pop(row)
+
+    def _reset_segments(self, segments):
+        self.segments = sorted(segments, key=Segment.sort_key)
+        self._sort_keys = [segment.sort_key() for segment in self.segments]
+        self._interval_tree = None
+        self.segments_reset.emit()
+        self.annotation_changed.emit()
+
+    @staticmethod
+    def _make_segment(start_time, end_time, label):
+        if not end_time or not label:
+            return None
+        segment = Segment.from_annotation({"start_time": start_time, "end_time": end_time, "label": label})
+        if segment is None:
+            print(f"警告: 无法解析标注时间: {start_time}-{end_time}")
+        return segment
         
     def clear_annotations(self):
         """清除所有标注"""
-        self.annotations = []
-        self.annotation_changed.emit(self.annotations)
+        self._reset_segments([])
     
     def add_annotation(self, start_time, end_time, label):
-        """添加标注"""
-        if not end_time or not label:
+        """添加标注，按开始时间插入到对应位置"""
+        segment = self._make_segment(start_time, end_time, label)
+        if segment is None:
             return False
-            
-        annotation = {
-            "start_time": start_time,
-            "end_time": end_time,
-            "label": label
-        }
         
-        self.annotations.append(annotation)
-        self.annotation_changed.emit(self.annotations)
+        row = self._insert_segment(segment)
+        self.segment_inserted.emit(row)
+        self.annotation_changed.emit()
         return True
     
     def edit_annotation(self, index, start_time, end_time, label):
-        """编辑标注"""
-        if index < 0 or index >= len(self.annotations):
+        """编辑标注。时间变化导致排序位置改变时按删除+插入处理"""
+        if index < 0 or index >= len(self.segments):
             return False
             
-        if not end_time or not label:
+        segment = self._make_segment(start_time, end_time, label)
+        if segment is None:
             return False
-            
-        self.annotations[index] = {
-            "start_time": start_time,
-            "end_time": end_time,
-            "label": label
-        }
-        
-        self.annotation_changed.emit(self.annotations)
+
+        key = segment.sort_key()
+        stays_in_place = ((index == 0 or self._sort_keys[index - 1] <= key) and
+                          (index == len(self.segments) - 1 or key <= self._sort_keys[index + 1]))
+        if stays_in_place:
+            self.segments[index] = segment
+            self._sort_keys[index] = key
+            self._interval_tree = None
+            self.segment_updated.emit(index)
+        else:
+            self._remove_segment(index)
+            self.segment_removed.emit(index)
+            self.segment_inserted.emit(self._insert_segment(segment))
+        self.annotation_changed.emit()
         return True
     
     def delete_annotation(self, index):
         """删除标注"""
-        if index < 0 or index >= len(self.annotations):
+        if index < 0 or index >= len(self.segments):
             return False
             
-        self.annotations.pop(index)
-        self.annotation_changed.emit(self.annotations)
+        self._remove_segment(index)
+        self.segment_removed.emit(index)
+        self.annotation_changed.emit()
         return True
+
+    def count(self):
+        """标注数量"""
+        return len(self.segments)
     
     def get_annotations(self):
-        """获取所有标注"""
-        return self.annotations
+        """获取所有标注（按开始时间排序）"""
+        return [segment.to_annotation() for segment in self.segments]
     
     def get_annotation(self, index):
         """获取指定索引的标注"""
-        if 0 <= index < len(self.annotations):
-            return self.annotations[index]
+        if 0 <= index < len(self.segments):
+            return self.segments[index].to_annotation()
         return None
+
+    def get_segments(self):
+        """获取所有片段对象（按开始时间排序，只读使用）"""
+        return self.segments
     
     def set_annotations(self, annotations):
-        """设置标注列表"""
-        self.annotations = annotations if annotations else []
-        self.annotation_changed.emit(self.annotations)
+        """设置标注列表，无法解析时间的标注会被跳过"""
+        segments = []
+        for annotation in annotations or []:
+            segment = Segment.from_annotation(annotation)
+            if segment is None:
+                print(f"警告: 跳过时间无效的标注: {annotation}")
+                continue
+            segments.append(segment)
+        self._reset_segments(segments)
+
+    def segments_at(self, time_ms):
+        """返回覆盖指定时刻（毫秒）的标注索引列表，按索引升序"""
+        return sorted(self.interval_tree.at(time_ms))
+
+    def find_overlaps(self, start_ms, end_ms, exclude_index=-1):
+        """返回与指定时间区间重叠的标注索引列表"""
+        return sorted(index for index in self.interval_tree.overlapping(start_ms, end_ms)
+                      if index != exclude_index)
+    
+    def set_suggestions(self, suggestions):
+        """
+        设置建议片段
+
+        Args:
+            suggestions: [{'start_ms', 'end_ms', 'label'}] 列表
+        """
+        self.suggestions = sorted(
+            (Segment(item["start_ms"], item["end_ms"], item.get("label", "")) for item in suggestions or []),
+            key=Segment.sort_key
+        )
+        self.suggestions_changed.emit()
+
+    def get_suggestions(self):
+        """获取所有建议片段（按开始时间排序，只读使用）"""
+        return self.suggestions
+
+    def suggestion_at(self, time_ms):
+        """返回覆盖指定时刻的建议片段序号，没有时返回 -1"""
+        starts = [segment.start_ms for segment in self.suggestions]
+        index = bisect.bisect_right(starts, time_ms) - 1
+        if index >= 0 and self.suggestions[index].covers(time_ms):
+            return index
+        return -1
     
     def get_annotations_text(self):
         """获取标注的文本表示"""
         return "\n".join([
             f"{a['start_time']}-{a['end_time']}: {a['label']}" 
-            for a in self.annotations
-        ])
\ No newline at end of file
+            for a in self.get_annotations()
+        ])
+
+
+class AnnotationListModel(QAbstractListModel):
+    """
+    标注列表模型。根据 AnnotationManager 的细粒度信号增删改单行，
+    不会在每次编辑时重建整个列表；提示信息（含重叠片段）在显示时才计算。
+    """
+
+    HIGHLIGHT_COLOR = QColor("#fff3cd")
+
+    def __init__(self, manager, parent=None):
+        super().__init__(parent)
+        self.manager = manager
+        self._row_count = manager.count()  # 与视图同步的行数，在收到信号时才更新
+        self.highlighted_rows = set()
+        manager.segment_inserted.connect(self._on_inserted)
+        manager.segment_updated.connect(self._on_updated)
+        manager.segment_removed.connect(self._on_removed)
+        manager.segments_reset.connect(self._on_reset)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._row_count
+
+    def data(self, index, role=Qt.DisplayRole):
+        # 管理器先修改数据再发信号，视图在 begin/end 之间查询时行号可能已越界
+        if not index.isValid() or index.row() >= min(self._row_count, self.manager.count()):
+            return None
+        row = index.row()
+        segment = self.manager.segments[row]
+        if role == Qt.DisplayRole:
+            annotation = segment.to_annotation()
+            return f"【{annotation['start_time']} → {annotation['end_time']}】 : {annotation['label']}"
+        if role == Qt.ToolTipRole:
+            annotation = segment.to_annotation()
+            tooltip = f"开始: {annotation['start_time']}\n结束: {annotation['end_time']}\n标签: {annotation['label']}"
+            overlaps = self.manager.find_overlaps(segment.start_ms, segment.end_ms, exclude_index=row)
+            if overlaps:
+                tooltip += "\n与第 " + "、".join(str(i + 1) for i in overlaps) + " 个片段重叠"
+            return tooltip
+        if role == Qt.BackgroundRole and row in self.highlighted_rows:
+            return QBrush(self.HIGHLIGHT_COLOR)
+        return None
+
+    def set_highlighted_rows(self, rows):
+        """设置高亮行，只对状态变化的行发出 dataChanged"""
+        rows = set(rows)
+        changed = rows.symmetric_difference(self.highlighted_rows)
+        self.highlighted_rows = rows
+        for row in changed:
+            if row < self._row_count:
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [Qt.BackgroundRole])
+
+    def _on_inserted(self, row):
+        self.highlighted_rows = set()
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._row_count += 1
+        self.endInsertRows()
+
+    def _on_updated(self, row):
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    def _on_removed(self, row):
+        self.highlighted_rows = set()
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self._row_count -= 1
+        self.endRemoveRows()
+
+    def _on_reset(self):
+        self.beginResetModel()
+        self._row_count = self.manager.count()
+        self.highlighted_rows = set()
+        self.endResetModel()
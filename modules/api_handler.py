@@ -5,8 +5,10 @@ import sys
 from openai import OpenAI
 from PyQt5.QtWidgets import (QMessageBox, QProgressDialog, QDialog, QVBoxLayout, QHBoxLayout, 
                             QFormLayout, QLineEdit, QDialogButtonBox, QLabel, QGroupBox,
-                            QPushButton, QComboBox, QTextEdit, QFileDialog, QApplication)
+                            QPushButton, QComboBox, QTextEdit, QFileDialog, QApplication,
+                            QCheckBox, QSpinBox)
 from PyQt5.QtCore import Qt, QSize
+from .frame_sampler import FrameSampler, image_content
 
 # 添加资源路径处理函数
 def resource_path(relative_path):
@@ -24,9 +26,16 @@ DEFAULT_CONFIG = {
     "model": "deepseek-reasoner",
     "system_prompt": "填入系统提示语",
     "user_prompt_template": "{description}\n\n视频诊断结果为：{final_diagnosis}\n\n以上是你观察到的视频内容，现在请基于你的观察结果，详细思考分析<填入用户需求>？",
-    "human_prompt_template": "<image>\n分析所给的视频,告诉我<填入用户需求> "
+    "human_prompt_template": "<image>\n分析所给的视频,告诉我<填入用户需求> ",
+    "vision_enabled": False,
+    "vision_frame_count": 8,
+    "vision_max_size": 768,
+    "vision_sampling": "uniform"
 }
 
+# 视频帧取样方式
+VISION_SAMPLING_MODES = [("uniform", "整个视频均匀取帧"), ("segments", "按标注片段取帧")]
+
 # 配置文件路径，使用resource_path
 DEFAULT_CONFIG_PATH = resource_path("config/default_api_config.json")
 USER_CONFIG_PATH = resource_path("config/user_api_config.json")
@@ -188,6 +197,33 @@ class ModelSettingsDialog(QDialog):
         
         prompt_group.setLayout(prompt_layout)
         layout.addWidget(prompt_group)
+
+        # 视觉输入设置
+        vision_group = QGroupBox("视觉输入")
+        vision_layout = QFormLayout()
+        vision_layout.setLabelAlignment(Qt.AlignRight | Qt.AlignVCenter)
+
+        self.vision_enabled_check = QCheckBox("随请求发送视频帧（模型需支持图像输入）")
+        vision_layout.addRow(self.vision_enabled_check)
+
+        self.vision_frame_count_spin = QSpinBox()
+        self.vision_frame_count_spin.setRange(1, 32)
+        vision_layout.addRow("帧数:", self.vision_frame_count_spin)
+
+        self.vision_max_size_spin = QSpinBox()
+        self.vision_max_size_spin.setRange(128, 2048)
+        self.vision_max_size_spin.setSingleStep(64)
+        self.vision_max_size_spin.setSuffix(" px")
+        vision_layout.addRow("图像长边:", self.vision_max_size_spin)
+
+        self.vision_sampling_combo = QComboBox()
+        for mode, text in VISION_SAMPLING_MODES:
+            self.vision_sampling_combo.addItem(text, mode)
+        vision_layout.addRow("取帧方式:", self.vision_sampling_combo)
+
+        self.load_vision_settings()
+        vision_group.setLayout(vision_layout)
+        layout.addWidget(vision_group)
         
         # 说明信息
         info_label = QLabel("说明: 本软件仅支持符合OpenAI API格式的模型调用，请确保您设置的API提供商支持该格式。")
@@ -225,6 +261,14 @@ class ModelSettingsDialog(QDialog):
         
         self.setLayout(layout)
     
+    def load_vision_settings(self):
+        """把配置中的视觉输入设置显示到界面"""
+        self.vision_enabled_check.setChecked(bool(self.config.get("vision_enabled", DEFAULT_CONFIG["vision_enabled"])))
+        self.vision_frame_count_spin.setValue(int(self.config.get("vision_frame_count", DEFAULT_CONFIG["vision_frame_count"])))
+        self.vision_max_size_spin.setValue(int(self.config.get("vision_max_size", DEFAULT_CONFIG["vision_max_size"])))
+        index = self.vision_sampling_combo.findData(self.config.get("vision_sampling", DEFAULT_CONFIG["vision_sampling"]))
+        self.vision_sampling_combo.setCurrentIndex(max(0, index))
+
     def add_api_key(self):
         """添加新的API密钥"""
         api_key = self.api_key_edit.text().strip()
@@ -268,6 +312,7 @@ class ModelSettingsDialog(QDialog):
             self.system_prompt_edit.setPlainText(self.config["system_prompt"])
             self.user_prompt_edit.setPlainText(self.config["user_prompt_template"])
             self.human_prompt_edit.setPlainText(self.config["human_prompt_template"])
+            self.load_vision_settings()
             
             if self.config["api_keys"]:
                 key_preview = f"{self.config['api_keys'][0][:10]}******"
@@ -297,6 +342,10 @@ class ModelSettingsDialog(QDialog):
         self.config["system_prompt"] = system_prompt
         self.config["user_prompt_template"] = user_prompt_template
         self.config["human_prompt_template"] = human_prompt_template
+        self.config["vision_enabled"] = self.vision_enabled_check.isChecked()
+        self.config["vision_frame_count"] = self.vision_frame_count_spin.value()
+        self.config["vision_max_size"] = self.vision_max_size_spin.value()
+        self.config["vision_sampling"] = self.vision_sampling_combo.currentData()
         
         # 保存配置
         self.api_handler.set_config(self.config)
@@ -311,6 +360,12 @@ class APIHandler:
     def __init__(self):
         """初始化API处理器，加载配置"""
         self.config = self._load_config()
+        # 多模态请求的视频帧取样器，编码结果缓存在导入数据文件夹的缓存目录中
+        self.frame_sampler = FrameSampler()
+
+    def set_frame_cache_folder(self, cache_folder):
+        """设置视频帧编码结果的缓存目录"""
+        self.frame_sampler.set_cache_folder(cache_folder)
         
     def _load_config(self):
         """加载配置文件"""
@@ -369,7 +424,28 @@ class APIHandler:
         self.config = DEFAULT_CONFIG.copy()
         return self.save_config()
     
-    def call_api(self, description, final_diagnosis, parent=None):
+    def sample_video_frames(self, video_path, segments=None):
+        """
+        按视觉输入设置为视频取帧并编码，未启用视觉输入时返回空列表
+
+        Args:
+            video_path: 视频路径
+            segments: (可选) 标注片段 [(开始毫秒, 结束毫秒)]，取帧方式为按片段时使用
+
+        Returns:
+            list: base64 编码的 JPEG 字符串
+        """
+        if not video_path or not self.config.get("vision_enabled", DEFAULT_CONFIG["vision_enabled"]):
+            return []
+        if self.config.get("vision_sampling", DEFAULT_CONFIG["vision_sampling"]) != "segments":
+            segments = None
+        return self.frame_sampler.sample(
+            video_path,
+            count=int(self.config.get("vision_frame_count", DEFAULT_CONFIG["vision_frame_count"])),
+            max_size=int(self.config.get("vision_max_size", DEFAULT_CONFIG["vision_max_size"])),
+            segments=segments)
+
+    def call_api(self, description, final_diagnosis, parent=None, video_path=None, segments=None):
             """
             调用API生成推理数据
             
@@ -377,6 +453,8 @@ class APIHandler:
                 description: 视频描述内容，包含标注片段和总描述
                 final_diagnosis: 医生给出的最终诊断结果
                 parent: 父窗口对象，用于显示进度对话框
+                video_path: (可选) 视频路径，启用视觉输入时随请求发送取样的视频帧
+                segments: (可选) 标注片段 [(开始毫秒, 结束毫秒)]，用于按片段取帧
                 
             Returns:
                 dict: 包含reasoning_content和content的字典
@@ -419,12 +497,20 @@ class APIHandler:
                 
                 # 使用自定义系统提示语
                 system_prompt = self.config.get("system_prompt", DEFAULT_CONFIG["system_prompt"])
+
+                # 启用视觉输入时把视频帧放在文本之前，多模态格式与 OpenAI 兼容
+                user_content = user_prompt
+                frames = self.sample_video_frames(video_path, segments)
+                if frames:
+                    user_content = image_content(frames) + [{"type": "text", "text": user_prompt}]
+                elif video_path and self.config.get("vision_enabled"):
+                    print(f"未能从视频取帧，仅发送文本: {video_path}")
     
                 response = client.chat.completions.create(
                     model=model,
                     messages=[
                         {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
+                        {"role": "user", "content": user_content}
                     ],
                 )
     
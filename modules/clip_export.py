@@ -0,0 +1,371 @@
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import subprocess
+from .annotation_format import parse_entry, is_valid_segments, parse_time_ms
+from .dataset_export import iter_jsonl
+from .video_metadata import probe_video, create_process_pool, default_probe_workers
+
+CLIP_JOURNAL_NAME = "clips_journal.jsonl"
+CLIP_MANIFEST_NAME = "clips.jsonl"
+
+# OpenCV 报告的编码 fourcc -> 与源视频相同编码的 ffmpeg 编码器，只有这些编码支持边界 GOP 重编码后直接拼接
+SMART_CUT_ENCODERS = {
+    "avc1": "libx264", "h264": "libx264", "x264": "libx264",
+    "hev1": "libx265", "hvc1": "libx265", "hevc": "libx265",
+}
+_SHOWINFO_PTS_RE = re.compile(r"pts_time:\s*([0-9.]+)")
+
+
+def find_ffmpeg(ffmpeg=None):
+    """
+    查找 ffmpeg / ffprobe 可执行文件
+
+    Returns:
+        tuple: (ffmpeg 路径或 None, ffprobe 路径或 None)
+    """
+    ffmpeg = shutil.which(ffmpeg or "ffmpeg")
+    if not ffmpeg:
+        return None, None
+    ffprobe = None
+    candidate = os.path.join(os.path.dirname(ffmpeg), "ffprobe" + (".exe" if ffmpeg.lower().endswith(".exe") else ""))
+    if os.path.exists(candidate):
+        ffprobe = candidate
+    elif shutil.which("ffprobe"):
+        ffprobe = shutil.which("ffprobe")
+    return ffmpeg, ffprobe
+
+
+def _run(cmd):
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        message = result.stderr.decode("utf-8", "replace").strip().splitlines()
+        raise RuntimeError(message[-1] if message else f"命令执行失败: {cmd[0]}")
+    return result
+
+
+def probe_keyframes(video_path, ffmpeg, ffprobe=None):
+    """
+    获取视频关键帧时间（秒，升序）。
+    有 ffprobe 时只读取数据包标记，不解码；否则用 ffmpeg 只解码关键帧。
+    """
+    if ffprobe:
+        result = _run([ffprobe, "-v", "error", "-select_streams", "v:0",
+                       "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", video_path])
+        keyframes = []
+        for line in result.stdout.decode("utf-8", "replace").splitlines():
+            parts = line.strip().split(",")
+            if len(parts) >= 2 and "K" in parts[1] and parts[0] not in ("", "N/A"):
+                keyframes.append(float(parts[0]))
+        return sorted(keyframes)
+
+    result = _run([ffmpeg, "-hide_banner", "-nostats", "-skip_frame", "nokey", "-i", video_path,
+                   "-map", "0:v:0", "-vf", "showinfo", "-f", "null", "-"])
+    return sorted(float(value) for value in
+                  _SHOWINFO_PTS_RE.findall(result.stderr.decode("utf-8", "replace")))
+
+
+def plan_cut(start, end, keyframes, duration, frame_time):
+    """
+    规划片段的切割方式
+
+    起点不在关键帧上时，起点到下一个关键帧之间重编码；终点不在关键帧（或视频末尾）上时，
+    最后一个关键帧到终点之间重编码；中间的完整 GOP 直接复制码流。复制部分总是在关键帧处结束。
+
+    Returns:
+        list: [(方式 "copy"/"encode", 开始秒, 结束秒)]
+    """
+    tolerance = frame_time / 2
+    first_key = next((k for k in keyframes if k >= start - tolerance), None)
+    if first_key is None or first_key >= end - tolerance:
+        return [("encode", start, end)]
+
+    last_key = max(k for k in keyframes if k <= end + tolerance)
+    end_aligned = end >= duration - tolerance or abs(last_key - end) <= tolerance
+
+    parts = []
+    if first_key - start > tolerance:
+        parts.append(("encode", start, first_key))
+    if end_aligned:
+        parts.append(("copy", first_key, end))
+    elif last_key - first_key > tolerance:
+        parts.append(("copy", first_key, last_key))
+        parts.append(("encode", last_key, end))
+    else:
+        parts.append(("encode", first_key, end))
+
+    if all(mode == "encode" for mode, _, _ in parts):
+        return [("encode", start, end)]
+    return [part for part in parts if part[2] - part[1] > tolerance]
+
+
+def _cut_part(ffmpeg, video_path, mode, start, end, output_path, encoder):
+    if mode == "encode":
+        _run([ffmpeg, "-hide_banner", "-y", "-ss", f"{start:.6f}", "-t", f"{end - start:.6f}",
+              "-i", video_path, "-map", "0:v:0", "-an", "-c:v", encoder, "-preset", "veryfast", "-crf", "18",
+              "-pix_fmt", "yuv420p", output_path])
+        return
+
+    # 码流复制：输入端定位会落在不晚于 -ss 的关键帧上，加 1 毫秒避免浮点误差落到上一个关键帧。
+    # 有 B 帧时按 -t 截断会按解码顺序多带几帧，因此用 segment 复用器在终点处的关键帧切开，只保留第一段
+    pattern = output_path + ".%03d.mp4"
+    _run([ffmpeg, "-hide_banner", "-y", "-ss", f"{start + 0.001:.6f}", "-t", f"{end - start + 1:.6f}",
+          "-i", video_path, "-map", "0:v:0", "-an", "-c", "copy", "-f", "segment",
+          "-segment_times", f"{end - start:.6f}", "-reset_timestamps", "1", pattern])
+    folder = os.path.dirname(output_path) or "."
+    prefix = os.path.basename(output_path) + "."
+    for name in sorted(os.listdir(folder)):
+        if name.startswith(prefix) and name.endswith(".mp4"):
+            path = os.path.join(folder, name)
+            if name == prefix + "000.mp4":
+                os.replace(path, output_path)
+            else:
+                os.remove(path)
+
+
+def cut_clip_ffmpeg(video_path, start, end, output_path, keyframes, info, ffmpeg, work_folder):
+    """
+    用 ffmpeg 切出一个片段
+
+    Returns:
+        str: 实际使用的方式 "copy"（纯码流复制）、"smart"（边界重编码+复制）或 "encode"（整段重编码）
+    """
+    encoder = SMART_CUT_ENCODERS.get((info.get("codec") or "").strip().lower())
+    fps = info.get("fps") or 25.0
+    if encoder is None or not keyframes:
+        _cut_part(ffmpeg, video_path, "encode", start, end, output_path, encoder or "libx264")
+        return "encode"
+
+    parts = plan_cut(start, end, keyframes, info.get("duration") or end, 1.0 / fps)
+    if len(parts) == 1:
+        _cut_part(ffmpeg, video_path, parts[0][0], start, end, output_path, encoder)
+        return parts[0][0]
+
+    os.makedirs(work_folder, exist_ok=True)
+    part_paths = []
+    for i, (mode, part_start, part_end) in enumerate(parts):
+        part_path = os.path.join(work_folder, f"part{i}.mp4")
+        _cut_part(ffmpeg, video_path, mode, part_start, part_end, part_path, encoder)
+        part_paths.append(part_path)
+    list_path = os.path.join(work_folder, "parts.txt")
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for part_path in part_paths:
+            f.write(f"file '{os.path.abspath(part_path)}'\n")
+    _run([ffmpeg, "-hide_banner", "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+          "-c", "copy", output_path])
+    return "smart"
+
+
+def cut_clip_opencv(video_path, start, end, output_path):
+    """没有 ffmpeg 时的后备方案：用 OpenCV 逐帧读取并重编码"""
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError("无法打开视频")
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+        try:
+            cap.set(cv2.CAP_PROP_POS_MSEC, start * 1000)
+            written = 0
+            while True:
+                ret, frame = cap.read()
+                if not ret or cap.get(cv2.CAP_PROP_POS_MSEC) > end * 1000:
+                    break
+                writer.write(frame)
+                written += 1
+        finally:
+            writer.release()
+    finally:
+        cap.release()
+    if written == 0:
+        raise RuntimeError("片段内没有可读取的帧")
+    return "opencv"
+
+
+def probe_clip_source(video_path, ffmpeg, ffprobe):
+    """子进程任务：探测视频元数据和关键帧"""
+    info = probe_video(video_path)
+    keyframes = []
+    error = ""
+    if info.get("ok") and ffmpeg:
+        try:
+            keyframes = probe_keyframes(video_path, ffmpeg, ffprobe)
+        except (OSError, RuntimeError) as e:
+            error = str(e)
+    return video_path, info, keyframes, error
+
+
+def extract_clip(job, info, keyframes, output_folder, ffmpeg):
+    """
+    子进程任务：切出一个片段。先写入临时文件，成功后再改名，中断时不会留下不完整的片段。
+
+    Returns:
+        dict: 日志记录
+    """
+    record = dict(job)
+    started = time.time()
+    output_path = os.path.join(output_folder, job["clip"])
+    tmp_path = os.path.join(output_folder, f".{job['clip']}.tmp.mp4")
+    work_folder = os.path.join(output_folder, ".parts", job["key_hash"])
+    start, end = job["start_ms"] / 1000, job["end_ms"] / 1000
+    try:
+        if ffmpeg:
+            record["mode"] = cut_clip_ffmpeg(job["source"], start, end, tmp_path, keyframes, info, ffmpeg, work_folder)
+        else:
+            record["mode"] = cut_clip_opencv(job["source"], start, end, tmp_path)
+        os.replace(tmp_path, output_path)
+        record["status"] = "done"
+    except (OSError, RuntimeError) as e:
+        record["status"] = "failed"
+        record["error"] = str(e)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+    record["seconds"] = round(time.time() - started, 2)
+    return record
+
+
+def collect_clip_jobs(jsonl_path, videos_folder):
+    """从 JSONL 条目收集所有片段切割任务"""
+    jobs = []
+    for line_number, entry, error in iter_jsonl(jsonl_path):
+        if error or not isinstance(entry, dict) or not str(entry.get("video", "")).startswith("videos/"):
+            continue
+        video_name = entry["video"][7:]
+        source = os.path.join(videos_folder, video_name)
+        if is_valid_segments(entry.get("segments")):
+            segments = entry["segments"]
+        else:
+            _, annotations, _ = parse_entry(entry)
+            segments = [{"start_ms": parse_time_ms(a["start_time"]), "end_ms": parse_time_ms(a["end_time"]),
+                         "label": a["label"]} for a in annotations]
+        stem = os.path.splitext(video_name)[0]
+        for segment_index, segment in enumerate(segments):
+            start_ms, end_ms = segment.get("start_ms"), segment.get("end_ms")
+            if start_ms is None or end_ms is None or end_ms <= start_ms:
+                continue
+            label = segment.get("label", "")
+            key = f"{entry['video']}|{start_ms}|{end_ms}|{label}"
+            key_hash = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+            jobs.append({
+                "key": key,
+                "key_hash": key_hash,
+                "clip": f"{stem}_{start_ms}-{end_ms}_{key_hash[:6]}.mp4",
+                "source": source,
+                "video": entry["video"],
+                "entry_id": entry.get("id"),
+                "segment_index": segment_index,
+                "start_ms": start_ms,
+                "end_ms": end_ms,
+                "label": label
+            })
+    return jobs
+
+
+def read_journal(journal_path):
+    """读取任务日志，返回 {key: 最后一条记录}"""
+    records = {}
+    if not os.path.exists(journal_path):
+        return records
+    for _, record, error in iter_jsonl(journal_path):
+        if not error and isinstance(record, dict) and "key" in record:
+            records[record["key"]] = record
+    return records
+
+
+def extract_segment_clips(jsonl_path, videos_folder, output_folder, max_workers=None, ffmpeg=None,
+                          retry_failed=False, progress_callback=None):
+    """
+    为所有标注片段切出单独的视频片段
+
+    任务日志（clips_journal.jsonl）每完成一个片段追加一行，重新运行时跳过已完成且文件存在的片段，
+    因此可以随时中断后继续。结束后写出片段清单 clips.jsonl。
+
+    Args:
+        jsonl_path: 标注输出的 JSONL 文件
+        videos_folder: 视频文件夹
+        output_folder: 片段输出目录
+        max_workers: 进程数
+        ffmpeg: (可选) ffmpeg 可执行文件路径，默认在 PATH 中查找；找不到时用 OpenCV 重编码
+        retry_failed: 是否重试之前失败的片段
+        progress_callback: (可选) 进度回调 callback(已完成数, 总数, 记录)
+
+    Returns:
+        dict: 统计信息
+    """
+    started = time.time()
+    max_workers = max_workers or default_probe_workers()
+    ffmpeg, ffprobe = find_ffmpeg(ffmpeg)
+    if not ffmpeg:
+        print("未找到 ffmpeg，将使用 OpenCV 整段重编码（速度较慢，建议安装 ffmpeg）")
+    os.makedirs(output_folder, exist_ok=True)
+
+    jobs = collect_clip_jobs(jsonl_path, videos_folder)
+    journal_path = os.path.join(output_folder, CLIP_JOURNAL_NAME)
+    journal = read_journal(journal_path)
+
+    pending = []
+    for job in jobs:
+        record = journal.get(job["key"])
+        if record and record.get("status") == "done" and os.path.exists(os.path.join(output_folder, job["clip"])):
+            continue
+        if record and record.get("status") == "failed" and not retry_failed:
+            continue
+        pending.append(job)
+    print(f"共 {len(jobs)} 个片段，待处理 {len(pending)} 个")
+
+    counts = {"copy": 0, "smart": 0, "encode": 0, "opencv": 0, "failed": 0}
+    if pending:
+        with create_process_pool(max_workers) as executor:
+            # 第一阶段：每个视频只探测一次元数据和关键帧
+            sources = sorted({job["source"] for job in pending})
+            source_info = {}
+            for video_path, info, keyframes, error in executor.map(
+                    probe_clip_source, sources, [ffmpeg] * len(sources), [ffprobe] * len(sources)):
+                if error:
+                    print(f"读取关键帧失败，将整段重编码: {video_path}, {error}")
+                source_info[video_path] = (info, keyframes)
+
+            # 第二阶段：并行切割，每完成一个片段就写入日志
+            results = []  # Future 或无法处理时直接生成的失败记录
+            for job in pending:
+                info, keyframes = source_info[job["source"]]
+                if not info.get("ok"):
+                    results.append(dict(job, status="failed", error=info.get("error") or "无法打开视频"))
+                    continue
+                results.append(executor.submit(extract_clip, job, info, keyframes, output_folder, ffmpeg))
+
+            with open(journal_path, 'a', encoding='utf-8') as journal_file:
+                for done, result in enumerate(results, 1):
+                    record = result if isinstance(result, dict) else result.result()
+                    journal[record["key"]] = record
+                    journal_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    journal_file.flush()
+                    if record["status"] == "done":
+                        counts[record["mode"]] += 1
+                    else:
+                        counts["failed"] += 1
+                        print(f"片段切割失败: {record['clip']}, {record.get('error')}")
+                    if progress_callback:
+                        progress_callback(done, len(results), record)
+
+    manifest_path = os.path.join(output_folder, CLIP_MANIFEST_NAME)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        for job in jobs:
+            record = journal.get(job["key"])
+            if record and record.get("status") == "done":
+                f.write(json.dumps({key: record[key] for key in (
+                    "clip", "video", "entry_id", "segment_index", "start_ms", "end_ms", "label", "mode")},
+                    ensure_ascii=False) + "\n")
+    shutil.rmtree(os.path.join(output_folder, ".parts"), ignore_errors=True)
+
+    summary = dict(counts, total=len(jobs), processed=len(pending), seconds=round(time.time() - started, 1))
+    print(f"片段导出完成: {summary}")
+    return summary
@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import hashlib
+from .annotation_format import (parse_entry, is_valid_segments, parse_time_ms, split_ai_response, get_ai_response,
+                                split_diagnoses)
+
+COLUMNAR_VERSION = 2
+_SIGNATURE_KEY = b"annotation_lab.source_signature"
+_VERSION_KEY = b"annotation_lab.columnar_version"
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise RuntimeError("列式导出需要安装 pyarrow: pip install pyarrow")
+
+
+def default_columnar_path(jsonl_path):
+    """列式文件与 JSONL 放在同一目录，文件名相同、扩展名为 .parquet"""
+    return os.path.splitext(jsonl_path)[0] + ".parquet"
+
+
+def columnar_schema():
+    """列式存储的表结构"""
+    import pyarrow as pa
+    return pa.schema([
+        ("id", pa.int64()),
+        ("video", pa.string()),
+        ("duration", pa.float64()),
+        ("diagnoses", pa.list_(pa.string())),
+        ("description", pa.string()),
+        ("segment_count", pa.int32()),
+        ("segment_start_ms", pa.list_(pa.int64())),
+        ("segment_end_ms", pa.list_(pa.int64())),
+        ("segment_labels", pa.list_(pa.string())),
+        ("thinking_length", pa.int32()),
+        ("answer_length", pa.int32()),
+        ("line_hash", pa.string()),
+    ])
+
+
+def entry_to_row(entry, line_hash=""):
+    """将一个 JSONL 条目转换为列式存储的一行"""
+    video_desc, annotations, final_diag = parse_entry(entry)
+    if is_valid_segments(entry.get("segments")):
+        starts = [segment["start_ms"] for segment in entry["segments"]]
+        ends = [segment["end_ms"] for segment in entry["segments"]]
+    else:
+        starts = [parse_time_ms(a["start_time"]) for a in annotations]
+        ends = [parse_time_ms(a["end_time"]) for a in annotations]
+    labels = [a["label"] for a in annotations]
+    thinking, answer = split_ai_response(get_ai_response(entry))
+    entry_id = entry.get("id")
+
+    return {
+        "id": entry_id if isinstance(entry_id, int) else None,
+        "video": entry.get("video", ""),
+        "duration": float(entry.get("duration") or 0),
+        "diagnoses": split_diagnoses(final_diag),
+        "description": video_desc,
+        "segment_count": len(labels),
+        "segment_start_ms": starts,
+        "segment_end_ms": ends,
+        "segment_labels": labels,
+        "thinking_length": len(thinking),
+        "answer_length": len(answer),
+        "line_hash": line_hash,
+    }
+
+
+def _source_signature(jsonl_path):
+    stat = os.stat(jsonl_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _read_existing_rows(columnar_path):
+    """读取已有列式文件，返回 (来源签名, {line_hash: 行})"""
+    import pyarrow.parquet as pq
+    if not os.path.exists(columnar_path):
+        return None, {}
+    try:
+        table = pq.read_table(columnar_path)
+    except Exception as e:
+        print(f"读取已有列式文件失败，将完整重建: {e}")
+        return None, {}
+    metadata = table.schema.metadata or {}
+    if metadata.get(_VERSION_KEY) != str(COLUMNAR_VERSION).encode():
+        return None, {}
+    signature = metadata.get(_SIGNATURE_KEY, b"").decode()
+    rows = {row["line_hash"]: row for row in table.to_pylist()}
+    return signature, rows
+
+
+def update_columnar(jsonl_path, columnar_path=None, force=False):
+    """
+    增量更新 JSONL 旁的列式文件
+
+    每一行按内容哈希匹配已有的行，只有新增或修改过的行需要重新解析；
+    JSONL 自上次更新以来没有变化时直接返回。
+
+    Args:
+        jsonl_path: 标注输出的 JSONL 文件
+        columnar_path: (可选) 列式文件路径，默认与 JSONL 同名的 .parquet
+        force: 忽略已有结果，完整重建
+
+    Returns:
+        dict: 更新统计（总行数、重新解析的行数、删除的行数、是否跳过）
+    """
+    _require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columnar_path = columnar_path or default_columnar_path(jsonl_path)
+    started = time.time()
+    signature = _source_signature(jsonl_path)
+
+    old_signature, old_rows = (None, {}) if force else _read_existing_rows(columnar_path)
+    if old_signature == signature:
+        print(f"列式文件已是最新: {columnar_path}")
+        return {"path": columnar_path, "rows": len(old_rows), "parsed": 0, "removed": 0, "skipped": True}
+
+    # 同一视频出现多次时以最后一次为准，与历史记录索引保持一致
+    rows_by_video = {}
+    parsed = 0
+    with open(jsonl_path, 'rb') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            line_hash = hashlib.sha1(line.rstrip(b"\r\n")).hexdigest()
+            row = old_rows.get(line_hash)
+            if row is None:
+                try:
+                    entry = json.loads(line)
+                except ValueError as e:
+                    print(f"跳过无法解析的行 {line_number}: {e}")
+                    continue
+                row = entry_to_row(entry, line_hash)
+                parsed += 1
+            rows_by_video[row["video"]] = row
+
+    rows = sorted(rows_by_video.values(), key=lambda row: (row["id"] is None, row["id"] or 0))
+    reused_hashes = {row["line_hash"] for row in rows}
+    removed = sum(1 for line_hash in old_rows if line_hash not in reused_hashes)
+
+    schema = columnar_schema().with_metadata({
+        _SIGNATURE_KEY: signature.encode(),
+        _VERSION_KEY: str(COLUMNAR_VERSION).encode(),
+    })
+    table = pa.Table.from_pylist(rows, schema=schema)
+    tmp_path = columnar_path + ".tmp"
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, columnar_path)
+
+    print(f"列式文件已更新: {columnar_path}（{len(rows)} 行，重新解析 {parsed} 行，"
+          f"删除 {removed} 行，用时 {time.time() - started:.2f} 秒）")
+    return {"path": columnar_path, "rows": len(rows), "parsed": parsed, "removed": removed, "skipped": False}
+
+
+def read_columnar(columnar_path, columns=None, filters=None):
+    """
+    读取列式文件，可只读取部分列并按条件过滤
+
+    Args:
+        columns: (可选) 需要的列名列表
+        filters: (可选) pyarrow 过滤条件，例如 [("duration", ">", 10.0)]
+
+    Returns:
+        pyarrow.Table
+    """
+    _require_pyarrow()
+    import pyarrow.parquet as pq
+    return pq.read_table(columnar_path, columns=columns, filters=filters)
+
+
+def filter_by_diagnosis(table, diagnosis):
+    """筛选诊断列表中包含指定诊断的条目"""
+    import pyarrow.compute as pc
+    diagnoses = table["diagnoses"]
+    matched = pc.equal(pc.list_flatten(diagnoses), diagnosis)
+    # 父行号按行升序排列，去重后仍保持原来的行顺序
+    return table.take(pc.unique(pc.filter(pc.list_parent_indices(diagnoses), matched)))
+
+
+def dataset_statistics(table):
+    """
+    基于列式数据计算数据集统计信息
+
+    Returns:
+        dict: 条目数、总时长、片段数、诊断分布、思维链与答案平均长度等
+    """
+    import pyarrow.compute as pc
+
+    def scalar(value, default=0):
+        value = value.as_py()
+        return default if value is None else value
+
+    stats = {"entries": table.num_rows}
+    if "duration" in table.column_names:
+        stats["total_duration"] = round(scalar(pc.sum(table["duration"])), 3)
+        stats["mean_duration"] = round(scalar(pc.mean(table["duration"])), 3)
+    if "segment_count" in table.column_names:
+        stats["total_segments"] = scalar(pc.sum(table["segment_count"]))
+    if "segment_start_ms" in table.column_names and "segment_end_ms" in table.column_names:
+        starts = pc.list_flatten(table["segment_start_ms"])
+        ends = pc.list_flatten(table["segment_end_ms"])
+        lengths = pc.subtract(ends, starts)
+        stats["total_segment_seconds"] = round(scalar(pc.sum(lengths)) / 1000, 3)
+    for column in ("thinking_length", "answer_length"):
+        if column in table.column_names:
+            stats[f"mean_{column}"] = round(scalar(pc.mean(table[column])), 1)
+    if "diagnoses" in table.column_names:
+        # 一个条目可以有多个诊断，按诊断分别计数
+        counts = pc.value_counts(pc.list_flatten(table["diagnoses"])).to_pylist()
+        counts.sort(key=lambda item: item["counts"], reverse=True)
+        stats["diagnosis_counts"] = {item["values"]: item["counts"] for item in counts}
+    return stats
@@ -0,0 +1,277 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+from .annotation_format import is_valid_segments, parse_raw_description, segments_from_annotations
+from .video_metadata import (VideoMetadataCache, probe_videos, create_process_pool, default_probe_workers,
+                             dataset_cache_folder)
+
+
+def default_cache_folder(jsonl_path):
+    """与界面程序一致：JSONL 位于 <输出目录>/<数据集名>/ 下，缓存位于 <输出目录>/.cache/<数据集名>"""
+    dataset_folder = os.path.dirname(os.path.abspath(jsonl_path))
+    return dataset_cache_folder(os.path.dirname(dataset_folder), os.path.basename(dataset_folder))
+
+
+def iter_jsonl(jsonl_path):
+    """
+    逐行读取 JSONL 文件
+
+    Yields:
+        tuple: (行号, 条目字典或 None, 解析错误信息)
+    """
+    with open(jsonl_path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line), ""
+            except ValueError as e:
+                yield line_number, None, f"JSON解析失败: {e}"
+
+
+def validate_entry(entry, videos_folder):
+    """
+    校验单个标注条目
+
+    Returns:
+        str: 错误信息，校验通过时返回空字符串
+    """
+    if not isinstance(entry, dict):
+        return "条目不是JSON对象"
+
+    video_field = entry.get("video", "")
+    if not isinstance(video_field, str) or not video_field.startswith("videos/"):
+        return f"无效的视频字段: {video_field!r}"
+    if not os.path.exists(os.path.join(videos_folder, video_field[7:])):
+        return f"视频文件不存在: {video_field[7:]}"
+
+    conversations = entry.get("conversations")
+    if not isinstance(conversations, list) or len(conversations) < 2:
+        return "conversations 缺失或少于两轮"
+    roles = [turn.get("from") if isinstance(turn, dict) else None for turn in conversations[:2]]
+    if roles != ["human", "gpt"]:
+        return f"conversations 角色顺序错误: {roles}"
+    if not all(isinstance(turn.get("value"), str) and turn.get("value").strip() for turn in conversations[:2]):
+        return "conversations 内容为空"
+
+    if not isinstance(entry.get("raw_description", ""), str):
+        return "raw_description 不是字符串"
+    if "segments" in entry and not is_valid_segments(entry["segments"]):
+        return "segments 字段格式无效"
+    return ""
+
+
+def migrate_segments(jsonl_path, backup=True):
+    """
+    一次性迁移旧的 JSONL 文件：为缺少结构化 segments 字段的条目从 raw_description 解析并补全。
+    已有有效 segments 的行原样保留；写入临时文件后原子替换，并保留一份 .bak 备份。
+
+    Returns:
+        dict: 总条目数、迁移条目数、无法解析的行数
+    """
+    total = 0
+    migrated = 0
+    invalid_lines = 0
+    tmp_path = jsonl_path + ".tmp"
+    with open(jsonl_path, 'r', encoding='utf-8') as src, open(tmp_path, 'w', encoding='utf-8') as dst:
+        for line in src:
+            if not line.strip():
+                continue
+            total += 1
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                invalid_lines += 1
+                dst.write(line if line.endswith("\n") else line + "\n")
+                continue
+            if isinstance(entry, dict) and not is_valid_segments(entry.get("segments")):
+                _, annotations, _ = parse_raw_description(entry.get("raw_description", ""))
+                entry["segments"] = segments_from_annotations(annotations)
+                migrated += 1
+                line = json.dumps(entry, ensure_ascii=False) + "\n"
+            dst.write(line if line.endswith("\n") else line + "\n")
+
+    if migrated == 0:
+        os.remove(tmp_path)
+    else:
+        if backup:
+            shutil.copy2(jsonl_path, jsonl_path + ".bak")
+        os.replace(tmp_path, jsonl_path)
+    print(f"迁移完成: 共 {total} 条，补全 segments {migrated} 条，无法解析 {invalid_lines} 行")
+    return {"total": total, "migrated": migrated, "invalid_lines": invalid_lines}
+
+
+def _sha256_of_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+SHARD_FIELDS = ("id", "video", "duration", "conversations", "raw_description", "segments")
+
+
+def shard_schema(extra_keys=()):
+    """
+    Parquet 分片的表结构。所有分片使用同一结构，可作为一个数据集读取；
+    条目中其他字段以 JSON 字符串列保存，列名为字段名
+    """
+    import pyarrow as pa
+    fields = [
+        ("id", pa.int64()),
+        ("video", pa.string()),
+        ("duration", pa.float64()),
+        ("conversations", pa.list_(pa.struct([("from", pa.string()), ("value", pa.string())]))),
+        ("raw_description", pa.string()),
+        ("segments", pa.list_(pa.struct([("start_ms", pa.int64()), ("end_ms", pa.int64()),
+                                         ("label", pa.string())]))),
+    ]
+    fields.extend((key, pa.string()) for key in extra_keys)
+    return pa.schema(fields)
+
+
+def _shard_row(entry, extra_keys):
+    """把条目整理成与 shard_schema 一致的一行，缺少的字段为 null"""
+    row = {key: entry.get(key) for key in SHARD_FIELDS}
+    if not isinstance(row["id"], int):
+        row["id"] = None
+    for key in extra_keys:
+        row[key] = json.dumps(entry[key], ensure_ascii=False) if key in entry else None
+    return row
+
+
+def write_shard(shard_index, entries, output_folder, formats, extra_keys=()):
+    """
+    写出一个分片。该函数在子进程中执行，因此必须是模块级函数。
+
+    Returns:
+        dict: 分片信息（文件名、条目数、字节数、sha256）
+    """
+    shard_name = f"shard-{shard_index:05d}"
+    shard_info = {"index": shard_index, "count": len(entries), "files": []}
+
+    if "jsonl" in formats:
+        path = os.path.join(output_folder, f"{shard_name}.jsonl")
+        with open(path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False))
+                f.write("\n")
+        shard_info["files"].append({
+            "format": "jsonl",
+            "path": os.path.basename(path),
+            "bytes": os.path.getsize(path),
+            "sha256": _sha256_of_file(path)
+        })
+
+    if "parquet" in formats:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        path = os.path.join(output_folder, f"{shard_name}.parquet")
+        schema = shard_schema(extra_keys)
+        table = pa.Table.from_pylist([_shard_row(entry, extra_keys) for entry in entries], schema=schema)
+        pq.write_table(table, path, compression="zstd")
+        shard_info["files"].append({
+            "format": "parquet",
+            "path": os.path.basename(path),
+            "bytes": os.path.getsize(path),
+            "sha256": _sha256_of_file(path)
+        })
+
+    return shard_info
+
+
+def export_shards(jsonl_path, videos_folder, output_folder, shard_size=1000, formats=("jsonl",),
+                  max_workers=None, cache_folder=None):
+    """
+    校验标注条目、从元数据缓存补全视频时长，并并行写出分片和清单文件
+
+    Args:
+        jsonl_path: 输出 JSONL 文件路径
+        videos_folder: 视频文件夹路径（条目中的 videos/xxx 相对于它的上一级）
+        output_folder: 分片输出目录
+        shard_size: 每个分片的条目数
+        formats: 输出格式，可包含 "jsonl" 和 "parquet"
+        max_workers: 进程数
+        cache_folder: (可选) 元数据缓存目录，默认与界面程序使用同一个缓存目录
+
+    Returns:
+        dict: 清单内容
+    """
+    if "parquet" in formats:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError("导出 Parquet 需要安装 pyarrow: pip install pyarrow")
+
+    started = time.time()
+    max_workers = max_workers or default_probe_workers()
+    os.makedirs(output_folder, exist_ok=True)
+
+    # 1. 读取并校验条目
+    valid_entries = []
+    invalid_entries = []
+    for line_number, entry, error in iter_jsonl(jsonl_path):
+        if not error:
+            error = validate_entry(entry, videos_folder)
+        if error:
+            invalid_entries.append({"line": line_number, "error": error})
+        else:
+            valid_entries.append(entry)
+    print(f"读取 {len(valid_entries) + len(invalid_entries)} 条，校验通过 {len(valid_entries)} 条")
+
+    # 2. 从元数据缓存补全视频时长，缺失的在进程池中探测
+    cache_folder = cache_folder or default_cache_folder(jsonl_path)
+    metadata_cache = VideoMetadataCache(os.path.join(cache_folder, "video_metadata.json"))
+    video_paths = sorted({os.path.join(videos_folder, entry["video"][7:]) for entry in valid_entries})
+    missing_paths = metadata_cache.missing(video_paths)
+    if missing_paths:
+        print(f"探测 {len(missing_paths)} 个未缓存的视频元数据...")
+        for info in probe_videos(missing_paths, max_workers=max_workers):
+            metadata_cache.put(info)
+        metadata_cache.save()
+
+    resolved_entries = []
+    for entry in valid_entries:
+        info = metadata_cache.get(os.path.join(videos_folder, entry["video"][7:]))
+        if not info or not info.get("ok"):
+            reason = info.get("error", "未知错误") if info else "无法获取元数据"
+            invalid_entries.append({"id": entry.get("id"), "video": entry["video"], "error": f"视频不可用: {reason}"})
+            continue
+        entry["duration"] = round(info["duration"], 3)
+        resolved_entries.append(entry)
+
+    # 3. 按 id 排序后分片，并行写出
+    # 没有整数 id 的条目（null、字符串等）排在最后，与合并输出日志时的顺序一致
+    resolved_entries.sort(key=lambda x: (not isinstance(x.get("id"), int),
+                                         x.get("id") if isinstance(x.get("id"), int) else 0))
+    shards = [resolved_entries[i:i + shard_size] for i in range(0, len(resolved_entries), shard_size)]
+    extra_keys = tuple(sorted({key for entry in resolved_entries for key in entry} - set(SHARD_FIELDS)))
+    shard_infos = []
+    if shards:
+        with create_process_pool(min(max_workers, len(shards))) as executor:
+            futures = [executor.submit(write_shard, i, shard, output_folder, tuple(formats), extra_keys)
+                       for i, shard in enumerate(shards)]
+            for future in futures:
+                shard_infos.append(future.result())
+                print(f"已写出分片 {len(shard_infos)}/{len(shards)}")
+
+    manifest = {
+        "source": os.path.abspath(jsonl_path),
+        "videos_folder": os.path.abspath(videos_folder),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "formats": list(formats),
+        "shard_size": shard_size,
+        "total_entries": len(resolved_entries),
+        "total_duration": round(sum(entry["duration"] for entry in resolved_entries), 3),
+        "shards": shard_infos,
+        "invalid_entries": invalid_entries
+    }
+    with open(os.path.join(output_folder, "manifest.json"), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    print(f"导出完成: {len(resolved_entries)} 条，{len(shard_infos)} 个分片，"
+          f"{len(invalid_entries)} 条无效，用时 {time.time() - started:.1f} 秒")
+    return manifest
@@ -1,12 +1,17 @@
 import os
 import json
-import jsonlines
 import shutil
-import cv2
 import sys
 from PyQt5.QtWidgets import QFileDialog, QMessageBox, QProgressDialog
-from PyQt5.QtCore import QObject, pyqtSignal, Qt
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, Qt
 import traceback  # 引入 traceback 模块
+from .video_metadata import VideoMetadataCache, VIDEO_EXTENSIONS, probe_video, probe_videos, dataset_cache_folder
+from .video_identity import find_duplicates, find_name_collisions
+from .work_leases import LeaseManager
+from .output_store import JsonlOutputStore
+from .sqlite_store import SqliteOutputStore, default_sqlite_path
+from .scene_analysis import SceneAnalysisCache, analyze_videos
+from .annotation_format import parse_entry, segments_from_annotations
 
 def resource_path(relative_path):
     """获取资源的绝对路径，兼容开发环境和打包后的环境"""
@@ -14,6 +19,78 @@ def resource_path(relative_path):
         return os.path.join(sys._MEIPASS, relative_path)
     return os.path.join(os.path.abspath("."), relative_path)
 
+
+class MetadataProbeThread(QThread):
+    """后台视频元数据预检线程，在进程池中并行探测所有视频"""
+
+    progress = pyqtSignal(int, int)  # 进度信号(已完成数, 总数)
+    probe_finished = pyqtSignal(list)  # 完成信号(元数据字典列表)
+
+    def __init__(self, video_paths, max_workers=None, parent=None):
+        super().__init__(parent)
+        self.video_paths = list(video_paths)
+        self.max_workers = max_workers
+        self._stop_requested = False
+
+    def stop(self):
+        """请求停止，已提交的探测任务完成后线程退出"""
+        self._stop_requested = True
+
+    def run(self):
+        try:
+            results = probe_videos(
+                self.video_paths,
+                max_workers=self.max_workers,
+                progress_callback=lambda done, total, info: self.progress.emit(done, total),
+                should_stop=lambda: self._stop_requested
+            )
+        except Exception as e:
+            print(f"批量预检视频元数据失败: {str(e)}")
+            traceback.print_exc()
+            results = []
+        self.probe_finished.emit(results)
+
+
+class SceneAnalysisThread(QThread):
+    """后台镜头/运动分析线程，在进程池中并行分析尚未缓存的视频，结果逐个写入缓存"""
+
+    progress = pyqtSignal(int, int)  # 进度信号(已完成数, 总数)
+    video_analyzed = pyqtSignal(dict)  # 单个视频分析完成信号(分析结果)
+    analysis_finished = pyqtSignal(int)  # 完成信号(本次分析的视频数)
+
+    def __init__(self, video_paths, cache, max_workers=None, parent=None):
+        super().__init__(parent)
+        self.video_paths = list(video_paths)
+        self.cache = cache
+        self.max_workers = max_workers
+        self._stop_requested = False
+
+    def stop(self):
+        """请求停止，已提交的分析任务完成后线程退出"""
+        self._stop_requested = True
+
+    def _on_result(self, done, total, result):
+        # 失败的结果也写入缓存，避免每次导入都重新分析无法读取的视频
+        self.cache.save(result)
+        self.progress.emit(done, total)
+        self.video_analyzed.emit(result)
+
+    def run(self):
+        results = []
+        try:
+            pending_paths = self.cache.missing(self.video_paths)
+            results = analyze_videos(
+                pending_paths,
+                max_workers=self.max_workers,
+                progress_callback=self._on_result,
+                should_stop=lambda: self._stop_requested
+            )
+        except Exception as e:
+            print(f"镜头分析失败: {str(e)}")
+            traceback.print_exc()
+        self.analysis_finished.emit(len(results))
+
+
 class FileHandler(QObject):
     """文件处理器，负责文件和文件夹的操作"""
     
@@ -25,10 +102,17 @@ class FileHandler(QObject):
         super().__init__()
         self.current_folder_index = -1
         self.folders = []
+        self.folder_videos = []  # 与 folders 一一对应的视频文件名列表
+        self.video_folder_index = {}  # 视频文件名 -> 文件夹索引，导入时建立
+        self.history_index = None  # 输出 JSONL 的偏移索引，用于历史记录导航
         self.data_folder_name = ""  # 当前导入的数据文件夹名称
         self.output_folder = self.get_output_folder_from_settings()
-        self.output_jsonl = []  # 存储从文件加载或新生成的jsonl数据
+        self.storage_backend = self.get_storage_backend_from_settings()  # 工作存储: "jsonl" 或 "sqlite"
         self.api_config = self._load_api_config()  # 加载API配置以获取human_prompt_template
+        self.metadata_cache = None  # 视频元数据缓存，导入数据文件夹后创建
+        self.analysis_cache = None  # 镜头/运动分析结果缓存，导入数据文件夹后创建
+        self.lease_manager = None  # 多台工作站共享输出目录时的病例租约，导入数据文件夹后创建
+        self.output_store = None  # 可多进程并发写入的输出 JSONL，导入数据文件夹后创建
 
     def _load_api_config(self):
         """加载API配置文件以获取模板"""
@@ -83,6 +167,19 @@ class FileHandler(QObject):
         os.makedirs(default_output_folder, exist_ok=True)
         return default_output_folder
 
+    def get_storage_backend_from_settings(self):
+        """从配置文件读取工作存储类型，默认为 JSONL"""
+        settings_file = resource_path("config/output_folder_config.json")
+        if os.path.exists(settings_file):
+            try:
+                with open(settings_file, 'r', encoding='utf-8') as f:
+                    backend = json.load(f).get("storage_backend", "jsonl")
+                    if backend in ("jsonl", "sqlite"):
+                        return backend
+            except Exception as e:
+                print(f"读取工作存储配置失败: {str(e)}")
+        return "jsonl"
+
     def import_folder(self, parent=None):
         """
         导入数据文件夹，并根据输出文件确定起始点
@@ -91,11 +188,11 @@ class FileHandler(QObject):
             parent: 父窗口对象
             
         Returns:
-            tuple: (文件夹列表, 起始索引, 加载的输出数据)
+            tuple: (文件夹列表, 起始索引)
         """
         folder_path = QFileDialog.getExistingDirectory(parent, "选择数据文件夹")
         if not folder_path:
-            return [], -1, []
+            return [], -1
             
         progress = QProgressDialog("正在扫描文件夹...", None, 0, 0, parent)
         progress.setWindowTitle("导入数据")
@@ -107,67 +204,202 @@ class FileHandler(QObject):
         self.data_folder_name = os.path.basename(folder_path)
         
         folders = []
+        folder_videos = []
         for item in os.listdir(folder_path):
             item_path = os.path.join(folder_path, item)
             if os.path.isdir(item_path):
-                has_video = False
-                for file in os.listdir(item_path):
-                    if file.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')):
-                        has_video = True
-                        break
-                if has_video:
+                videos = [file for file in os.listdir(item_path)
+                          if file.lower().endswith(VIDEO_EXTENSIONS)]
+                if videos:
                     folders.append(item_path)
+                    folder_videos.append(videos)
                 
         if not folders:
             progress.close()
             QMessageBox.warning(parent, "警告", "所选文件夹中没有包含视频文件的子文件夹")
-            return [], -1, []
+            return [], -1
             
-        output_data_folder = os.path.join(self.output_folder, self.data_folder_name)
-        jsonl_path = os.path.join(output_data_folder, f"{self.data_folder_name}.jsonl")
+        jsonl_path = self.get_output_jsonl_path()
         start_index = 0
-        self.output_jsonl = []
-
-        if os.path.exists(jsonl_path):
+        self.close_output_store()
+        self.output_store = self.create_output_store(jsonl_path)
+        if isinstance(self.output_store, SqliteOutputStore):
+            self.output_store.register_folders(folder_videos)  # 断点由 cases 表的状态索引查询得到
+        self.history_index = self.output_store.history_index()
+        self.release_leases()
+        # 租约放在共享输出目录的缓存目录中，不在交付的数据集文件夹内
+        self.lease_manager = LeaseManager(os.path.join(self.get_cache_folder(), "leases"))
+
+        if self.output_store.exists():
             try:
-                with jsonlines.open(jsonl_path, mode='r') as reader:
-                    self.output_jsonl = [entry for entry in reader]
-                    
-                processed_videos = set()
-                for entry in self.output_jsonl:
-                    video_path = entry.get("video", "")
-                    if video_path.startswith("videos/"):
-                        video_name = video_path[7:]
-                        processed_videos.add(video_name)
-                
-                found_unprocessed = False
-                for i, folder in enumerate(folders):
-                    has_unprocessed_video_in_folder = False
-                    for file in os.listdir(folder):
-                        if file.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')):
-                            if file not in processed_videos:
-                                start_index = i
-                                found_unprocessed = True
-                                has_unprocessed_video_in_folder = True
-                                break
-                    if has_unprocessed_video_in_folder:
-                        break
-
-                if not found_unprocessed and folders:
-                    start_index = len(folders)
+                self.history_index.refresh()
+                start_index = self._find_unprocessed_folder(0, folder_videos, folders)
 
             except Exception as e:
                 print(f"读取或解析标注数据出错: {str(e)}")
                 QMessageBox.warning(parent, "警告", f"读取现有标注文件失败: {str(e)}\n将从第一个文件夹开始。")
                 start_index = 0
-                self.output_jsonl = []
         else:
-            start_index = 0
-            self.output_jsonl = []
+            start_index = self._find_unprocessed_folder(0, folder_videos, folders)
 
         progress.close()
         self.folders = folders
-        return self.folders, start_index, self.output_jsonl
+        self.folder_videos = folder_videos
+        self.video_folder_index = {}
+        for i, videos in enumerate(folder_videos):
+            for video in videos:
+                self.video_folder_index.setdefault(video, i)
+        self.metadata_cache = VideoMetadataCache(os.path.join(self.get_cache_folder(), "video_metadata.json"))
+        self.analysis_cache = SceneAnalysisCache(os.path.join(self.get_cache_folder(), "analysis"))
+        return self.folders, start_index
+
+    def get_output_jsonl_path(self):
+        """获取当前数据集的输出 JSONL 文件路径"""
+        output_data_folder = os.path.join(self.output_folder, self.data_folder_name)
+        return os.path.join(output_data_folder, f"{self.data_folder_name}.jsonl")
+
+    def create_output_store(self, jsonl_path):
+        """按配置创建工作存储：JSONL（追加日志）或 SQLite（WAL）"""
+        if self.storage_backend == "sqlite":
+            return SqliteOutputStore(default_sqlite_path(jsonl_path), jsonl_path)
+        return JsonlOutputStore(jsonl_path)
+
+    def get_output_store(self):
+        """获取标注的工作存储，尚未导入数据文件夹时按当前输出路径创建"""
+        if self.output_store is None or self.output_store.jsonl_path != self.get_output_jsonl_path():
+            self.close_output_store()
+            self.output_store = self.create_output_store(self.get_output_jsonl_path())
+        return self.output_store
+
+    def close_output_store(self):
+        """导出交付用的 JSONL 并关闭工作存储"""
+        if self.output_store is None:
+            return
+        self.merge_output_log()
+        if isinstance(self.output_store, SqliteOutputStore):
+            self.output_store.close()
+        self.output_store = None
+
+    def has_saved_entries(self):
+        """输出 JSONL 或其未合并的追加日志是否存在"""
+        return self.get_output_store().exists()
+
+    def merge_output_log(self):
+        """把追加日志合并回（或由 SQLite 导出）输出 JSONL（退出程序时调用，使交付文件保持完整）"""
+        if self.output_store is None or not self.output_store.exists():
+            return
+        try:
+            self.output_store.merge()
+        except Exception as e:
+            print(f"合并标注日志失败: {e}")
+
+    def get_history_count(self):
+        """获取已保存的历史记录数量"""
+        if self.history_index is None:
+            return 0
+        self.history_index.refresh()
+        return len(self.history_index)
+
+    def find_folder_index(self, video_name):
+        """根据视频文件名查找所在的输入文件夹索引，未找到时返回 -1"""
+        return self.video_folder_index.get(video_name, -1)
+
+    def _find_unprocessed_folder(self, start, folder_videos, folders=None):
+        """
+        从 start 开始查找第一个包含未处理视频的文件夹索引，没有则返回文件夹数量。
+        启用租约时跳过其他工作站正在处理的文件夹，并为找到的文件夹获取租约。
+        """
+        folders = folders if folders is not None else self.folders
+        i = self._next_pending_folder(start, folder_videos)
+        while i < len(folder_videos):
+            if self.lease_manager is None or self.lease_manager.claim(self.case_key(folders[i])):
+                return i
+            print(f"跳过其他工作站正在处理的文件夹: {os.path.basename(folders[i])}")
+            i = self._next_pending_folder(i + 1, folder_videos)
+        self.release_leases()
+        return len(folder_videos)
+
+    def _next_pending_folder(self, start, folder_videos):
+        """从 start 开始第一个包含未处理视频的文件夹索引，没有则返回文件夹数量"""
+        if isinstance(self.output_store, SqliteOutputStore):
+            index = self.output_store.next_pending_folder(start)
+            return len(folder_videos) if index is None else index
+        processed_videos = self.history_index.processed_video_names() if self.history_index else set()
+        for i in range(start, len(folder_videos)):
+            if any(video not in processed_videos for video in folder_videos[i]):
+                return i
+        return len(folder_videos)
+
+    @staticmethod
+    def case_key(folder):
+        """租约使用的病例标识：文件夹名（各工作站挂载共享存储的路径可能不同）"""
+        return os.path.basename(os.path.normpath(folder))
+
+    def heartbeat_leases(self):
+        """更新本实例持有的租约，返回已失去租约的病例列表"""
+        if self.lease_manager is None:
+            return []
+        return self.lease_manager.heartbeat()
+
+    def release_leases(self):
+        """释放本实例持有的所有租约"""
+        if self.lease_manager is not None:
+            self.lease_manager.release_all()
+
+    def get_cache_folder(self):
+        """获取当前数据集的缓存目录（<输出目录>/.cache/<数据集名>，不在交付的数据集文件夹中）"""
+        data_folder_name = self.data_folder_name or "video_annotations"
+        cache_folder = dataset_cache_folder(self.output_folder, data_folder_name)
+        os.makedirs(cache_folder, exist_ok=True)
+        return cache_folder
+
+    def get_all_video_paths(self):
+        """获取已导入的所有视频文件路径"""
+        return [os.path.join(folder, video)
+                for folder, videos in zip(self.folders, self.folder_videos)
+                for video in videos]
+
+    def get_video_metadata(self, video_path):
+        """
+        获取视频元数据，优先使用缓存，未命中时同步探测并写入缓存
+
+        Args:
+            video_path: 视频文件路径
+
+        Returns:
+            dict: 元数据字典
+        """
+        if self.metadata_cache is not None:
+            info = self.metadata_cache.get(video_path)
+            if info is not None:
+                return info
+
+        info = probe_video(video_path)
+        if self.metadata_cache is not None and info.get("size"):
+            self.metadata_cache.put(info)
+            self.metadata_cache.save()
+        return info
+
+    def update_metadata_cache(self, results):
+        """将后台预检的结果写入缓存"""
+        if self.metadata_cache is None or not results:
+            return
+        for info in results:
+            self.metadata_cache.put(info)
+        self.metadata_cache.save()
+
+    def find_duplicate_videos(self):
+        """
+        根据元数据缓存中的部分哈希和感知哈希，查找已导入视频中的重复内容和同名冲突
+
+        Returns:
+            tuple: (重复视频组列表 [{'paths', 'exact'}], 同名但内容不同的路径组列表)
+        """
+        if self.metadata_cache is None:
+            return [], []
+        infos = [self.metadata_cache.get(path) for path in self.get_all_video_paths()]
+        infos = [info for info in infos if info is not None]
+        return find_duplicates(infos), find_name_collisions(infos)
 
     def load_next_folder(self, current_index, folders, parent=None):
         """
@@ -184,99 +416,24 @@ class FileHandler(QObject):
         if not folders:
             return 0
 
-        output_data_folder = os.path.join(self.output_folder, self.data_folder_name)
-        jsonl_path = os.path.join(output_data_folder, f"{self.data_folder_name}.jsonl")
-        processed_videos = set()
-        if os.path.exists(jsonl_path):
-            try:
-                with jsonlines.open(jsonl_path, mode='r') as reader:
-                    self.output_jsonl = [entry for entry in reader]
-                for entry in self.output_jsonl:
-                    video_path = entry.get("video", "")
-                    if video_path.startswith("videos/"):
-                        processed_videos.add(video_path[7:])
-            except Exception as e:
-                print(f"查找下一个文件夹时读取jsonl失败: {str(e)}")
-                pass
-
-        next_index = len(folders)
-        for i in range(current_index + 1, len(folders)):
-            folder = folders[i]
-            has_unprocessed_video_in_folder = False
-            for file in os.listdir(folder):
-                if file.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')):
-                    if file not in processed_videos:
-                        next_index = i
-                        has_unprocessed_video_in_folder = True
-                        break
-            if has_unprocessed_video_in_folder:
-                break
-
-        return next_index
-
-    def parse_annotation_line(self, line):
-        """解析单行标注数据，更加健壮地处理各种格式"""
-        try:
-            line = line.strip()
-            if not line:
-                return None
-                
-            # 调试信息
-            print(f"正在解析标注行: {line}")
-            
-            # 确认行中包含时间范围的分隔符"-"
-            if '-' not in line:
-                print(f"警告: 标注行缺少时间范围分隔符'-': {line}")
-                return None
-                
-            # 提取时间范围和标签
-            time_range_part = line
-            label_part = ""
-            
-            # 处理带有标签的情况（用冒号分隔）
-            if ':' in line:
-                # 找到第一个"-"后面的第一个":"，确保正确分割时间范围和标签
-                dash_index = line.find('-')
-                post_dash_colon = line.find(':', dash_index)
-                
-                if post_dash_colon > dash_index:
-                    # 时间范围部分包含冒号，需要特别处理（例如 00:00:01-00:00:05: 标签）
-                    time_range_part = line[:post_dash_colon]
-                    label_part = line[post_dash_colon+1:].strip()
-                else:
-                    # 简单情况，只在时间范围后有一个冒号（例如 00:01-00:05: 标签）
-                    parts = line.split(':', 1)
-                    time_range_part = parts[0].strip()
-                    if len(parts) > 1:
-                        label_part = parts[1].strip()
-            
-            # 解析时间范围
-            if '-' in time_range_part:
-                time_parts = time_range_part.split('-', 1)
-                start_time = time_parts[0].strip()
-                end_time = time_parts[1].strip()
-                
-                # 确保时间格式有效
-                if not start_time or not end_time:
-                    print(f"警告: 无效的时间范围格式: {time_range_part}")
-                    return None
-                    
-                return {
-                    'start_time': start_time,
-                    'end_time': end_time,
-                    'label': label_part
-                }
-                    
-            return None
-        except Exception as e:
-            print(f"解析标注行时出错: {str(e)}, 行: {line}")
-            return None
+        if self.history_index is None:
+            self.history_index = self.get_output_store().history_index()
+        self.history_index.refresh()
 
+        return self._find_unprocessed_folder(current_index + 1, self.folder_videos)
 
+    def get_folder_image_paths(self, folder_index, folders=None):
+        """获取指定文件夹中的图片路径列表"""
+        folders = folders if folders is not None else self.folders
+        if folder_index < 0 or folder_index >= len(folders):
+            return []
+        folder = folders[folder_index]
+        return [os.path.join(folder, file) for file in os.listdir(folder)
+                if file.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp'))]
 
     def load_folder_by_index(self, folder_index, folders, viewing_history_entry=None, parent=None):
         """
-        按索引加载指定文件夹的数据。优先从传入的 history_entry 或 self.output_jsonl 加载标注信息。
+        按索引加载指定文件夹的数据。优先从传入的 history_entry 或历史记录索引加载标注信息。
         
         Args:
             folder_index: 文件夹索引
@@ -307,10 +464,7 @@ class FileHandler(QObject):
                 video_name = file
                 break
                 
-        image_paths = []
-        for file in os.listdir(current_folder):
-            if file.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
-                image_paths.append(os.path.join(current_folder, file))
+        image_paths = self.get_folder_image_paths(folder_index, folders)
 
         annotations = []
         video_desc = ""
@@ -318,60 +472,15 @@ class FileHandler(QObject):
         
         entry_to_load = viewing_history_entry
 
-        if not entry_to_load and video_name:
-            for entry in self.output_jsonl:
-                if entry.get("video") == f"videos/{video_name}":
-                    entry_to_load = entry
-                    break
+        if not entry_to_load and video_name and self.history_index is not None:
+            self.history_index.refresh()
+            position = self.history_index.position_of_video(f"videos/{video_name}")
+            if position >= 0:
+                entry_to_load = self.history_index.get_entry(position)
 
         if entry_to_load:
             try:
-                raw_desc = entry_to_load.get('raw_description', '')
-                if raw_desc:
-                    print(f"解析raw_description: {raw_desc[:100]}...")  # 只打印前100个字符作为调试
-                    
-                    # 提取诊断结果
-                    diag_parts = raw_desc.split('\n\n最终诊断结果:', 1)
-                    desc_content = diag_parts[0].strip()
-                    if len(diag_parts) > 1:
-                        final_diag = diag_parts[1].strip()
-                    else:
-                        desc_content = raw_desc.strip()
-                        final_diag = ""
-
-                    # 提取视频描述和标注片段
-                    anno_parts = desc_content.split('\n\n标注片段:', 1)
-                    if len(anno_parts) > 1:
-                        # 提取视频描述
-                        if '视频总描述:' in anno_parts[0]:
-                            video_desc = anno_parts[0].split('视频总描述:', 1)[1].strip()
-                        else:
-                            video_desc = anno_parts[0].strip()
-
-                        # 处理标注片段
-                        annotation_text = anno_parts[1].strip()
-                        if annotation_text:
-                            annotation_lines = annotation_text.split('\n')
-                            print(f"找到 {len(annotation_lines)} 行标注数据")
-                            
-                            for line in annotation_lines:
-                                annotation = self.parse_annotation_line(line)
-                                if annotation:
-                                    annotations.append(annotation)
-                                    
-                            print(f"成功解析 {len(annotations)} 个标注")
-                    else:
-                        # 没有标注片段部分
-                        if '视频总描述:' in desc_content:
-                            video_desc = desc_content.split('视频总描述:', 1)[1].strip()
-                        else:
-                            video_desc = desc_content
-                        annotations = []
-                else:
-                    video_desc = ""
-                    final_diag = ""
-                    annotations = []
-
+                video_desc, annotations, final_diag = parse_entry(entry_to_load)
             except Exception as e:
                 print(f"从JSONL条目解析数据时出错: {str(e)}")
                 traceback.print_exc()
@@ -437,7 +546,8 @@ class FileHandler(QObject):
                     {"from": "gpt", "value": ai_response}
                 ],
                 "duration": duration,
-                "raw_description": f"{description}\n\n最终诊断结果: {final_diagnosis}"
+                "raw_description": f"{description}\n\n最终诊断结果: {final_diagnosis}",
+                "segments": segments_from_annotations(annotations)
             }
             
             return jsonl_entry
@@ -448,29 +558,16 @@ class FileHandler(QObject):
             return None
 
     def get_video_duration(self, video_path):
-        """获取视频时长（秒）"""
+        """获取视频时长（秒），优先读取元数据缓存"""
         if not os.path.exists(video_path):
             return 0
         
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            return 0
-        
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        
-        if fps <= 0:
-            return 0
-        
-        duration = frame_count / fps
-        cap.release()
-        
-        return duration
+        return self.get_video_metadata(video_path).get("duration", 0)
 
     def save_annotation_data(self, new_entry, parent=None):
         """
-        将新的或更新的标注条目保存到输出 JSONL 文件，并复制对应的视频文件。
-        会覆盖写入整个 JSONL 文件。
+        将新的或更新的标注条目保存到工作存储，并复制对应的视频文件。
+        保存在写锁内分配 id 并追加一行（SQLite 存储为一个事务），不会重写整个 JSONL 文件。
         
         Args:
             new_entry: 要保存或更新的单个 JSONL 条目字典
@@ -510,12 +607,11 @@ class FileHandler(QObject):
             
             output_video_path = os.path.join(videos_folder, video_name)
             src_video_path = None
-            if hasattr(self, 'folders') and self.folders:
-                for folder in self.folders:
-                    potential_src = os.path.join(folder, video_name)
-                    if os.path.exists(potential_src):
-                        src_video_path = potential_src
-                        break
+            folder_index = self.find_folder_index(video_name)
+            if folder_index >= 0:
+                potential_src = os.path.join(self.folders[folder_index], video_name)
+                if os.path.exists(potential_src):
+                    src_video_path = potential_src
             
             if src_video_path:
                 if not os.path.exists(output_video_path) or os.path.getmtime(src_video_path) > os.path.getmtime(output_video_path):
@@ -528,41 +624,18 @@ class FileHandler(QObject):
                 QMessageBox.warning(parent, "警告", f"未找到源视频文件 '{video_name}' 用于复制。")
 
             jsonl_path = os.path.join(output_data_folder, f"{self.data_folder_name}.jsonl")
-            
-            existing_entries = []
-            if os.path.exists(jsonl_path):
-                try:
-                    with jsonlines.open(jsonl_path, mode='r') as reader:
-                        existing_entries = [entry for entry in reader]
-                except Exception as read_err:
-                    print(f"读取现有 JSONL 文件失败: {read_err}")
-
-            found_existing = False
-            for i, entry in enumerate(existing_entries):
-                if entry.get("video") == video_field:
-                    new_entry["id"] = entry.get("id", i + 1)
-                    existing_entries[i] = new_entry
-                    found_existing = True
-                    break
-            
-            if not found_existing:
-                new_entry["id"] = len(existing_entries) + 1
-                existing_entries.append(new_entry)
 
+            # 在写锁内分配 id 并追加到日志，多台工作站同时保存时不会互相覆盖
             try:
-                with jsonlines.open(jsonl_path, mode='w') as writer:
-                    existing_entries.sort(key=lambda x: x.get("id", float('inf')))
-                    for item in existing_entries:
-                        writer.write(item)
+                self.get_output_store().save(new_entry)
                 print(f"JSONL 数据已保存到: {jsonl_path}")
             except Exception as write_err:
                  progress.close()
                  QMessageBox.critical(parent, "错误", f"写入 JSONL 文件失败: {str(write_err)}")
                  traceback.print_exc()
                  return False
-                    
+
             progress.close()
-            self.output_jsonl = existing_entries
             return True
             
         except Exception as e:
@@ -0,0 +1,45 @@
+from collections import OrderedDict
+
+
+class DecodedFrameCache:
+    """
+    按帧号缓存已解码视频帧（numpy 数组），按字节预算淘汰最久未使用的帧。
+
+    播放和跳转时顺带解码的帧都会放入缓存，后退、逐帧步进和倒放命中缓存时
+    不需要再从关键帧重新解码。只在界面线程中使用，不加锁。
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._frames = OrderedDict()
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __contains__(self, frame_index):
+        return frame_index in self._frames
+
+    def get(self, frame_index):
+        """获取缓存的帧并标记为最近使用，未命中时返回 None"""
+        frame = self._frames.get(frame_index)
+        if frame is not None:
+            self._frames.move_to_end(frame_index)
+        return frame
+
+    def put(self, frame_index, frame):
+        """写入帧，超出预算时淘汰最久未使用的帧"""
+        if frame is None or frame.nbytes > self.max_bytes:
+            return
+        old_frame = self._frames.pop(frame_index, None)
+        if old_frame is not None:
+            self.current_bytes -= old_frame.nbytes
+        self._frames[frame_index] = frame
+        self.current_bytes += frame.nbytes
+        while self.current_bytes > self.max_bytes and self._frames:
+            _, evicted = self._frames.popitem(last=False)
+            self.current_bytes -= evicted.nbytes
+
+    def clear(self):
+        self._frames.clear()
+        self.current_bytes = 0
@@ -0,0 +1,211 @@
+import os
+import json
+import base64
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+
+SAMPLER_VERSION = 1  # 取帧或编码方式变化时递增，使旧缓存失效
+DEFAULT_FRAME_COUNT = 8
+DEFAULT_MAX_SIZE = 768  # 图像长边的最大像素数
+JPEG_QUALITY = 85
+MEMORY_CACHE_ENTRIES = 16  # 内存中保留的编码结果数
+
+
+def sample_frame_indices(frame_count, fps, count, segments=None):
+    """
+    选择要发送给模型的帧号。
+
+    Args:
+        frame_count: 视频总帧数
+        fps: 帧率
+        count: 需要的帧数 K
+        segments: (可选) [(开始毫秒, 结束毫秒)]，提供时按片段时长分配帧数并在片段内均匀取帧，
+                  片段数多于 K 时只取最长的 K 个片段各一帧；为空时在整个视频上均匀取帧
+
+    Returns:
+        list: 升序且不重复的帧号
+    """
+    if frame_count <= 0 or count <= 0:
+        return []
+    fps = fps if fps and fps > 0 else 25.0
+
+    ranges = []
+    for start_ms, end_ms in segments or []:
+        first = max(0, min(frame_count - 1, int(start_ms * fps / 1000)))
+        last = max(first + 1, min(frame_count, int(round(end_ms * fps / 1000))))
+        ranges.append((first, last))
+    if not ranges:
+        ranges = [(0, frame_count)]
+
+    if len(ranges) >= count:
+        longest = sorted(ranges, key=lambda r: r[1] - r[0], reverse=True)[:count]
+        allocation = [(r, 1) for r in sorted(longest)]
+    else:
+        # 每个片段至少一帧，其余按时长用最大余数法分配
+        total = float(sum(last - first for first, last in ranges))
+        extra = count - len(ranges)
+        shares = [extra * (last - first) / total for first, last in ranges]
+        counts = [1 + int(share) for share in shares]
+        remainder = sorted(range(len(ranges)), key=lambda i: shares[i] - int(shares[i]), reverse=True)
+        for i in remainder[:count - sum(counts)]:
+            counts[i] += 1
+        allocation = list(zip(ranges, counts))
+
+    indices = set()
+    for (first, last), n in allocation:
+        # 取 n 个等分区间的中点，避开片段两端的过渡帧
+        for i in range(n):
+            indices.add(first + int((i + 0.5) * (last - first) / n))
+    return sorted(indices)
+
+
+def encode_frames(video_path, frame_indices, max_size=DEFAULT_MAX_SIZE, quality=JPEG_QUALITY):
+    """
+    解码指定帧，缩小到长边不超过 max_size 后编码为 JPEG。
+
+    Returns:
+        list: [(帧号, base64 编码的 JPEG)]，无法读取的帧不包含在内
+    """
+    results = []
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            return results
+        position = -1  # 下一次 read() 得到的帧号，-1 表示未知
+        for frame_index in sorted(frame_indices):
+            if frame_index != position:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            ret, frame = cap.read()
+            if not ret:
+                position = -1
+                continue
+            position = frame_index + 1
+            height, width = frame.shape[:2]
+            scale = float(max_size) / max(height, width)
+            if scale < 1.0:
+                frame = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))),
+                                   interpolation=cv2.INTER_AREA)
+            ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+            if ok:
+                results.append((frame_index, base64.b64encode(buffer.tobytes()).decode("ascii")))
+    finally:
+        cap.release()
+    return results
+
+
+def image_content(payloads):
+    """把 base64 JPEG 列表转换为 OpenAI 兼容的多模态消息内容"""
+    return [{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{payload}"}}
+            for payload in payloads]
+
+
+class FrameSampler:
+    """
+    为多模态模型准备视频帧：选帧、解码、缩小并编码为 JPEG。
+
+    不同帧的解码和编码在线程池中并行执行（OpenCV 在这些操作中释放 GIL），
+    每个工作线程使用自己的 VideoCapture。编码结果按 (视频, 帧号, 尺寸, 质量) 缓存在内存和磁盘，
+    重复生成时不再解码和编码；视频大小或修改时间变化后缓存失效。
+    """
+
+    def __init__(self, cache_folder=None, max_workers=None):
+        self.cache_folder = cache_folder
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self._memory = OrderedDict()
+
+    def set_cache_folder(self, cache_folder):
+        self.cache_folder = cache_folder
+
+    @staticmethod
+    def _signature(video_path):
+        stat = os.stat(video_path)
+        return [stat.st_size, stat.st_mtime]
+
+    @staticmethod
+    def _cache_key(video_path, frame_indices, max_size, quality):
+        text = json.dumps([SAMPLER_VERSION, os.path.normcase(os.path.abspath(video_path)),
+                           list(frame_indices), max_size, quality])
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _load(self, key, signature):
+        entry = self._memory.get(key)
+        if entry is None and self.cache_folder:
+            try:
+                with open(os.path.join(self.cache_folder, f"{key}.json"), 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = None
+        if entry is None or entry.get("signature") != signature:
+            return None
+        self._remember(key, entry)
+        return entry["frames"]
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > MEMORY_CACHE_ENTRIES:
+            self._memory.popitem(last=False)
+
+    def _save(self, key, entry):
+        self._remember(key, entry)
+        if not self.cache_folder:
+            return
+        try:
+            os.makedirs(self.cache_folder, exist_ok=True)
+            path = os.path.join(self.cache_folder, f"{key}.json")
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"保存视频帧缓存失败: {e}")
+
+    def _encode_parallel(self, video_path, frame_indices, max_size, quality):
+        """把帧号分成连续的几组，每组在一个线程中解码编码"""
+        workers = max(1, min(self.max_workers, len(frame_indices)))
+        size = (len(frame_indices) + workers - 1) // workers
+        groups = [frame_indices[i:i + size] for i in range(0, len(frame_indices), size)]
+        with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+            encoded = executor.map(lambda group: encode_frames(video_path, group, max_size, quality), groups)
+            return [payload for group in encoded for _, payload in group]
+
+    def sample(self, video_path, count=DEFAULT_FRAME_COUNT, max_size=DEFAULT_MAX_SIZE,
+               segments=None, quality=JPEG_QUALITY):
+        """
+        获取视频的 K 帧 JPEG（base64），优先使用缓存。
+
+        Args:
+            video_path: 视频路径
+            count: 帧数 K
+            max_size: 图像长边的最大像素数
+            segments: (可选) [(开始毫秒, 结束毫秒)]，按片段取帧
+            quality: JPEG 质量
+
+        Returns:
+            list: 按时间顺序的 base64 JPEG 字符串，无法读取视频时为空列表
+        """
+        try:
+            signature = self._signature(video_path)
+        except OSError as e:
+            print(f"无法访问视频: {video_path}, {e}")
+            return []
+
+        cap = cv2.VideoCapture(video_path)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+        fps = cap.get(cv2.CAP_PROP_FPS) if cap.isOpened() else 0
+        cap.release()
+        frame_indices = sample_frame_indices(frame_count, fps, count, segments)
+        if not frame_indices:
+            return []
+
+        key = self._cache_key(video_path, frame_indices, max_size, quality)
+        frames = self._load(key, signature)
+        if frames is not None:
+            return frames
+
+        frames = self._encode_parallel(video_path, frame_indices, max_size, quality)
+        if frames:
+            self._save(key, {"signature": signature, "frames": frames})
+        return frames
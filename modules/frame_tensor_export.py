@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import cv2
+import numpy as np
+from .dataset_export import iter_jsonl, validate_entry
+from .frame_sampler import sample_frame_indices
+from .video_metadata import run_in_process_pool
+
+TENSOR_FILE = "frames.npy"
+INDEX_FILE = "index.jsonl"
+MANIFEST_FILE = "frames_manifest.json"
+SEEK_DISTANCE = 48  # 目标帧与当前位置相差不超过该帧数时顺序 grab()，否则定位
+
+
+def resize_and_crop(frame, width, height):
+    """等比缩放到覆盖目标尺寸后居中裁剪，不改变画面比例"""
+    src_height, src_width = frame.shape[:2]
+    scale = max(float(width) / src_width, float(height) / src_height)
+    scaled_width = max(width, int(round(src_width * scale)))
+    scaled_height = max(height, int(round(src_height * scale)))
+    interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+    frame = cv2.resize(frame, (scaled_width, scaled_height), interpolation=interpolation)
+    x = (scaled_width - width) // 2
+    y = (scaled_height - height) // 2
+    return frame[y:y + height, x:x + width]
+
+
+def extract_entry_frames(task):
+    """
+    解码一个条目的采样帧并写入共享的 .npy 文件中对应的行。该函数在子进程中执行，因此必须是模块级函数。
+
+    Args:
+        task: dict，包含 tensor_path、row、video_path、frames、width、height、segments
+
+    Returns:
+        dict: row、ok、error、valid（成功写入的帧数）、frame_indices、times_ms
+    """
+    result = {"row": task["row"], "ok": False, "error": "", "valid": 0, "frame_indices": [], "times_ms": []}
+    cap = cv2.VideoCapture(task["video_path"])
+    try:
+        if not cap.isOpened():
+            result["error"] = "无法打开视频"
+            return result
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_indices = sample_frame_indices(frame_count, fps, task["frames"], task.get("segments"))
+        if not frame_indices:
+            result["error"] = "无法获取视频帧数"
+            return result
+
+        # 各进程以读写方式映射同一个文件，只写自己的行
+        tensor = np.load(task["tensor_path"], mmap_mode="r+")
+        row = tensor[task["row"]]
+        position = 0
+        for frame_index in frame_indices[:tensor.shape[1]]:
+            if frame_index < position or frame_index - position > SEEK_DISTANCE:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+                position = frame_index
+            while position < frame_index and cap.grab():
+                position += 1
+            ret, frame = cap.read()
+            if not ret:
+                break
+            position = frame_index + 1
+            row[result["valid"]] = resize_and_crop(frame, task["width"], task["height"])
+            result["frame_indices"].append(frame_index)
+            result["times_ms"].append(int(round(cap.get(cv2.CAP_PROP_POS_MSEC))))
+            result["valid"] += 1
+        tensor.flush()
+        del row, tensor
+
+        if result["valid"] == 0:
+            result["error"] = "无法解码视频帧"
+        else:
+            result["ok"] = True
+    except Exception as e:
+        result["error"] = f"提取视频帧时出错: {e}"
+    finally:
+        cap.release()
+    return result
+
+
+def export_frame_tensors(jsonl_path, videos_folder, output_folder, frames=16, width=224, height=224,
+                         sampling="uniform", max_workers=None):
+    """
+    为每个标注条目提取固定数量、固定尺寸的帧，写入一个内存映射的 .npy 文件，
+    训练时可直接以 mmap 方式读取，无需每个 epoch 重新解码视频。
+
+    输出目录中包含：
+      - frames.npy：形状为 (条目数, frames, height, width, 3) 的 uint8 数组（BGR）
+      - index.jsonl：原条目加上 frame_tensor 字段（行号、字节偏移、有效帧数、帧号和时间戳）
+      - frames_manifest.json：数组形状、数据偏移和无效条目列表
+
+    帧数不足的条目其余帧为 0；无法读取的条目对应的行全为 0，且不写入 index.jsonl。
+
+    Args:
+        jsonl_path: 输出 JSONL 文件路径
+        videos_folder: 视频文件夹路径
+        output_folder: 输出目录
+        frames: 每个条目的帧数
+        width, height: 帧尺寸（等比缩放后居中裁剪）
+        sampling: "uniform" 在整个视频上均匀取帧，"segments" 按条目的标注片段取帧
+        max_workers: 进程数
+
+    Returns:
+        dict: 清单内容
+    """
+    started = time.time()
+    os.makedirs(output_folder, exist_ok=True)
+
+    # 1. 读取并校验条目
+    entries = []
+    invalid_entries = []
+    for line_number, entry, error in iter_jsonl(jsonl_path):
+        if not error:
+            error = validate_entry(entry, videos_folder)
+        if error:
+            invalid_entries.append({"line": line_number, "error": error})
+        else:
+            entries.append(entry)
+    print(f"读取 {len(entries) + len(invalid_entries)} 条，校验通过 {len(entries)} 条")
+
+    # 2. 预先分配整个数组，子进程按行写入
+    tensor_path = os.path.join(output_folder, TENSOR_FILE)
+    shape = (len(entries), frames, height, width, 3)
+    tensor = np.lib.format.open_memmap(tensor_path, mode="w+", dtype=np.uint8, shape=shape)
+    data_offset = tensor.offset
+    del tensor
+    row_bytes = frames * height * width * 3
+
+    tasks = []
+    for row, entry in enumerate(entries):
+        segments = None
+        if sampling == "segments" and entry.get("segments"):
+            segments = [(segment["start_ms"], segment["end_ms"]) for segment in entry["segments"]]
+        tasks.append({"tensor_path": tensor_path, "row": row,
+                      "video_path": os.path.join(videos_folder, entry["video"][7:]),
+                      "frames": frames, "width": width, "height": height, "segments": segments})
+
+    # 3. 在进程池中并行提取
+    def report(done, total, result):
+        if done % 10 == 0 or done == total:
+            print(f"已提取 {done}/{total}")
+
+    results = {result["row"]: result for result in run_in_process_pool(
+        extract_entry_frames, tasks, max_workers=max_workers, progress_callback=report)}
+
+    # 4. 按行号写出带偏移索引的 JSONL
+    exported = 0
+    with open(os.path.join(output_folder, INDEX_FILE), 'w', encoding='utf-8') as f:
+        for row, entry in enumerate(entries):
+            result = results.get(row)
+            if not result or not result["ok"]:
+                reason = result["error"] if result else "子进程出错"
+                invalid_entries.append({"id": entry.get("id"), "video": entry["video"], "error": reason})
+                continue
+            entry = dict(entry)
+            entry["frame_tensor"] = {
+                "file": TENSOR_FILE,
+                "row": row,
+                "offset": data_offset + row * row_bytes,
+                "nbytes": row_bytes,
+                "valid": result["valid"],
+                "frame_indices": result["frame_indices"],
+                "times_ms": result["times_ms"]
+            }
+            f.write(json.dumps(entry, ensure_ascii=False))
+            f.write("\n")
+            exported += 1
+
+    manifest = {
+        "source": os.path.abspath(jsonl_path),
+        "videos_folder": os.path.abspath(videos_folder),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "file": TENSOR_FILE,
+        "dtype": "uint8",
+        "shape": list(shape),
+        "layout": "NTHWC",
+        "color": "BGR",
+        "offset": data_offset,
+        "row_bytes": row_bytes,
+        "sampling": sampling,
+        "total_entries": exported,
+        "invalid_entries": invalid_entries
+    }
+    with open(os.path.join(output_folder, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    print(f"导出完成: {exported} 条，{len(invalid_entries)} 条无效，用时 {time.time() - started:.1f} 秒")
+    return manifest
+
+
+def load_frame_tensors(output_folder):
+    """
+    以只读内存映射方式打开导出的帧数组和索引，供训练数据加载器使用（不复制数据）
+
+    Returns:
+        tuple: (np.memmap 数组, 索引条目列表)
+    """
+    tensor = np.load(os.path.join(output_folder, TENSOR_FILE), mmap_mode="r")
+    index = [entry for _, entry, error in iter_jsonl(os.path.join(output_folder, INDEX_FILE)) if not error]
+    return tensor, index
@@ -174,12 +174,14 @@ class HelpDialog(QDialog):
         features = [
             ("视频播放控制", "- **播放/暂停**: 点击播放按钮或按空格键。\n"
                           "- **步进**: 点击前进/后退按钮或按左右箭头键 (默认0.5秒)。\n"
+                          "- **逐帧**: 点击上一帧/下一帧按钮，或按 , / . 键 (Shift+左右箭头键)。\n"
                           "- **进度条**: 拖动滑块跳转到视频任意位置。\n"
-                          "- **变速播放**: 使用下拉菜单选择 0.1x 到 2.0x 的播放速度。\n"
+                          "- **变速播放**: 使用下拉菜单选择 0.1x 到 2.0x 的播放速度；倒放 0.5x/1.0x 逐帧倒序播放；4x、8x、16x（含倒放）为快速浏览，只显示关键帧（需要安装 ffmpeg，否则跳帧显示）。\n"
                           "- **缩放**: 使用按钮或 Ctrl+鼠标滚轮/Ctrl+ +/- 键进行缩放，Ctrl+鼠标中键/Ctrl+0 重置。"),
 
             ("片段标注", "- **标记**: 使用剪刀按钮(✂)或按 Ctrl+D 两次标记片段起止时间。\n"
                       "- **添加/编辑/删除**: 在弹窗或列表中进行操作。\n"
+                      "- **建议片段**: 导入后在后台分析镜头切换和运动变化，时间轴上以虚线标出建议边界并显示运动强度曲线，右键建议片段可直接采纳。\n"
                       "- **时间格式**: 时间精确到毫秒 (HH:MM:SS.fff)。"),
 
             ("图片查看", "- **多图浏览**: 若文件夹含多张图片，可通过按钮或左右箭头键翻页。\n"
@@ -187,15 +189,18 @@ class HelpDialog(QDialog):
 
             ("数据管理", "- **导入**: 支持导入包含多层子文件夹的数据集。\n"
                        "- **输出**: 自动在指定的输出文件夹下创建与导入文件夹同名的子目录，存放处理后的视频 (videos/ 目录) 和 JSONL 标注文件。\n"
+                       "- **重复检查**: 导入预检时为每个视频计算部分文件哈希和感知哈希，提示改名或重新编码的重复视频，以及文件名相同但内容不同（保存时会互相覆盖）的视频。\n"
                        "- **自动续标**: 程序会记录已处理的视频，\"确定保存\" 后自动加载下一个未处理的。\n"
+                       "- **多人协作**: 多台电脑使用同一共享输出目录时，每个实例通过输出目录下 .cache 中的租约文件领取不同的病例，互不重复；租约每分钟续期，程序异常退出 5 分钟后可被其他人接手。\n"
                        "- **历史回溯**: 可以方便地查看和修改已保存的标注记录。"),
 
             ("AI集成", "- **模型调用**: 点击 \"生成标注数据\" 按钮，调用配置的AI模型进行分析。\n"
+                     "- **视觉输入**: 在模型参数设置中启用后，会从视频（或各标注片段）中均匀选取若干帧，缩小并编码为 JPEG 随请求发送，需要模型支持图像输入；编码结果会被缓存，重复生成不会重新解码。\n"
                      "- **结果展示**: 思维链和最终答案会显示在对应文本框中，并可编辑。\n"
                      "- **数据保存**: AI结果会随其他标注信息一同保存在 JSONL 文件中。"),
 
             ("参数设置", "- **模型参数**: 在工具栏设置 (齿轮图标) 中配置 API Base URL、模型名称、API密钥、系统提示语、用户提示语模板 (用于AI分析) 和人类提问模板 (用于JSONL输出)。\n"
-                        "- **输出文件夹**: 在工具栏设置 (文件夹图标) 中指定保存结果的位置。\n"
+                        "- **输出文件夹**: 在工具栏设置 (文件夹图标) 中指定保存结果的位置；单机处理大量病例时可把 \"工作存储\" 改为 SQLite（数据库只能放在本机磁盘，多台电脑共享目录时请使用 JSONL）。\n"
                         "- **诊断标签**: 在工具栏设置 (扳手图标) 中添加、编辑、删除或恢复默认的诊断标签列表。")
         ]
 
@@ -242,6 +247,8 @@ class HelpDialog(QDialog):
             ("空格键", "播放 / 暂停 视频"),
             ("左箭头", f"视频后退 {self.parent().video_player.step_size if self.parent() else 0.5} 秒"),
             ("右箭头", f"视频前进 {self.parent().video_player.step_size if self.parent() else 0.5} 秒"),
+            (", 或 Shift+左箭头", "视频后退一帧"),
+            (". 或 Shift+右箭头", "视频前进一帧"),
             ("Ctrl + D", "标记视频片段开始 / 结束时间 (点击两次)"),
             ("Ctrl + 鼠标滚轮向上", "放大视频"),
             ("Ctrl + +", "放大视频"),
@@ -0,0 +1,190 @@
+from PyQt5.QtCore import Qt, pyqtSignal, QAbstractListModel, QModelIndex, QVariant
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QListView,
+                             QPushButton, QSpinBox, QLabel, QAbstractItemView)
+
+
+class HistoryListModel(QAbstractListModel):
+    """历史记录列表模型，数据来自 JSONL 偏移索引，按批次懒加载行"""
+
+    FETCH_BATCH_SIZE = 200
+    PositionRole = Qt.UserRole + 1  # 行对应的历史记录位置
+
+    def __init__(self, history_index=None, parent=None):
+        super().__init__(parent)
+        self.history_index = history_index
+        self.positions = []  # 当前过滤条件下的历史记录位置
+        self.loaded_count = 0
+        self.filter_text = ""
+
+    def set_history_index(self, history_index):
+        """切换数据来源并重新加载"""
+        self.history_index = history_index
+        self.reload()
+
+    def reload(self):
+        """刷新索引并按当前过滤条件重建行"""
+        self.beginResetModel()
+        if self.history_index is not None:
+            self.history_index.refresh()
+        self.positions = self._filtered_positions()
+        self.loaded_count = min(self.FETCH_BATCH_SIZE, len(self.positions))
+        self.endResetModel()
+
+    def set_filter(self, text):
+        """按视频名或诊断结果过滤"""
+        self.filter_text = text.strip().lower()
+        self.reload()
+
+    def _filtered_positions(self):
+        if self.history_index is None:
+            return []
+        if not self.filter_text:
+            return list(range(len(self.history_index)))
+        return [i for i, record in enumerate(self.history_index.records)
+                if self.filter_text in record.video.lower() or self.filter_text in record.diagnosis.lower()]
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.loaded_count
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return self.loaded_count < len(self.positions)
+
+    def fetchMore(self, parent=QModelIndex()):
+        self.ensure_loaded(self.loaded_count + self.FETCH_BATCH_SIZE - 1)
+
+    def ensure_loaded(self, row):
+        """确保行数至少加载到 row（用于跳转到尚未加载的行）"""
+        target = min(row + 1, len(self.positions))
+        if target <= self.loaded_count:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded_count, target - 1)
+        self.loaded_count = target
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not (0 <= index.row() < self.loaded_count):
+            return QVariant()
+
+        position = self.positions[index.row()]
+        record = self.history_index.get_record(position)
+        if record is None:
+            return QVariant()
+
+        video_name = record.video[7:] if record.video.startswith("videos/") else record.video
+        if role == Qt.DisplayRole:
+            entry_id = record.entry_id if record.entry_id is not None else "?"
+            return f"#{entry_id}  {video_name}  —  {record.diagnosis}"
+        if role == Qt.ToolTipRole:
+            return f"序号: {position + 1}\n视频: {video_name}\n诊断: {record.diagnosis}"
+        if role == self.PositionRole:
+            return position
+        return QVariant()
+
+    def row_of_position(self, position):
+        """返回历史记录位置在当前过滤结果中的行号，不存在时返回 -1"""
+        if not self.filter_text:
+            return position if 0 <= position < len(self.positions) else -1
+        try:
+            return self.positions.index(position)
+        except ValueError:
+            return -1
+
+
+class HistoryBrowser(QWidget):
+    """历史记录浏览面板，支持搜索、按序号跳转和双击打开"""
+
+    entry_activated = pyqtSignal(int)  # 打开历史记录信号(历史记录位置)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.model = HistoryListModel(parent=self)
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(5, 5, 5, 5)
+        layout.setSpacing(6)
+
+        # 搜索框
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("按视频名或诊断结果搜索...")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(self.model.set_filter)
+        self.search_edit.textChanged.connect(self.update_count_label)
+        layout.addWidget(self.search_edit)
+
+        # 跳转控件
+        jump_layout = QHBoxLayout()
+        jump_layout.addWidget(QLabel("跳转到第"))
+        self.jump_spin = QSpinBox()
+        self.jump_spin.setMinimum(1)
+        self.jump_spin.setMaximum(1)
+        jump_layout.addWidget(self.jump_spin)
+        jump_layout.addWidget(QLabel("条"))
+        self.jump_button = QPushButton("打开")
+        self.jump_button.clicked.connect(self.jump_to_entry)
+        jump_layout.addWidget(self.jump_button)
+        jump_layout.addStretch()
+        layout.addLayout(jump_layout)
+
+        # 列表视图：行高一致，只绘制可见行
+        self.list_view = QListView()
+        self.list_view.setModel(self.model)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.list_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.list_view.activated.connect(self.handle_activated)  # 回车、双击（或平台的单击激活）都会触发
+        layout.addWidget(self.list_view)
+
+        self.count_label = QLabel("共 0 条")
+        self.count_label.setStyleSheet("color: #7f8c8d;")
+        layout.addWidget(self.count_label)
+
+    def set_history_index(self, history_index):
+        """设置历史记录索引"""
+        self.model.set_history_index(history_index)
+        self.update_count_label()
+
+    def refresh(self):
+        """历史记录文件变化后刷新列表"""
+        self.model.reload()
+        self.update_count_label()
+
+    def update_count_label(self):
+        total = len(self.model.history_index) if self.model.history_index is not None else 0
+        matched = len(self.model.positions)
+        self.jump_spin.setMaximum(max(1, total))
+        if self.model.filter_text:
+            self.count_label.setText(f"匹配 {matched} 条 / 共 {total} 条")
+        else:
+            self.count_label.setText(f"共 {total} 条")
+
+    def handle_activated(self, index):
+        position = index.data(HistoryListModel.PositionRole)
+        if position is not None:
+            self.entry_activated.emit(position)
+
+    def jump_to_entry(self):
+        """按序号直接打开历史记录"""
+        if self.model.history_index is None or len(self.model.history_index) == 0:
+            return
+        position = self.jump_spin.value() - 1
+        if self.model.filter_text and self.model.row_of_position(position) < 0:
+            self.search_edit.clear()
+        self.select_position(position)
+        self.entry_activated.emit(position)
+
+    def select_position(self, position):
+        """在列表中选中并滚动到指定历史记录"""
+        row = self.model.row_of_position(position)
+        if row < 0:
+            self.list_view.clearSelection()
+            return
+        self.model.ensure_loaded(row)
+        index = self.model.index(row)
+        self.list_view.setCurrentIndex(index)
+        self.list_view.scrollTo(index, QAbstractItemView.PositionAtCenter)
@@ -0,0 +1,118 @@
+import os
+import json
+from collections import namedtuple
+
+# 历史记录摘要：条目id、所在文件、行偏移、视频字段、诊断结果
+HistoryRecord = namedtuple("HistoryRecord", ["entry_id", "path", "offset", "video", "diagnosis"])
+
+
+def extract_diagnosis(entry):
+    """从条目的 raw_description 中提取最终诊断结果"""
+    raw_desc = entry.get("raw_description", "") or ""
+    parts = raw_desc.split("最终诊断结果:", 1)
+    return parts[1].strip() if len(parts) > 1 else ""
+
+
+class JsonlHistoryIndex:
+    """
+    JSONL 历史记录的偏移索引。只在文件变化时扫描一次，记录每条记录的字节偏移，
+    按 id 排序后即可随机访问任意一条历史记录，无需每次重新读取整个文件。
+    """
+
+    def __init__(self, jsonl_paths):
+        if isinstance(jsonl_paths, str):
+            jsonl_paths = [jsonl_paths]
+        self.jsonl_paths = list(jsonl_paths)
+        self.records = []
+        self._position_by_video = {}
+        self._signature = None
+
+    def _file_signature(self):
+        signature = []
+        for path in self.jsonl_paths:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def refresh(self):
+        """文件有变化时重建索引，返回是否发生了重建"""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return False
+        self.rebuild()
+        self._signature = signature
+        return True
+
+    def rebuild(self):
+        """扫描 JSONL 文件，重建偏移索引。同一视频出现多次时以最后一次为准"""
+        latest_by_video = {}
+        order = 0
+        for path in self.jsonl_paths:
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    offset = f.tell()
+                    for line in iter(f.readline, b''):
+                        line_offset = offset
+                        offset += len(line)
+                        if not line.strip():
+                            continue
+                        try:
+                            entry = json.loads(line)
+                        except ValueError as e:
+                            print(f"跳过无法解析的历史记录行 ({path}@{line_offset}): {e}")
+                            continue
+                        entry_id = entry.get("id")
+                        record = HistoryRecord(
+                            entry_id if isinstance(entry_id, int) else None,
+                            path,
+                            line_offset,
+                            entry.get("video", ""),
+                            extract_diagnosis(entry)
+                        )
+                        latest_by_video[record.video] = (order, record)
+                        order += 1
+            except Exception as e:
+                print(f"建立历史记录索引失败 ({path}): {e}")
+
+        # 与原有逻辑一致：按 id 排序，缺少 id 的排在最后，其余保持文件顺序
+        ordered = sorted(
+            latest_by_video.values(),
+            key=lambda item: (item[1].entry_id is None, item[1].entry_id or 0, item[0])
+        )
+        self.records = [record for _, record in ordered]
+        self._position_by_video = {record.video: i for i, record in enumerate(self.records)}
+
+    def __len__(self):
+        return len(self.records)
+
+    def get_record(self, index):
+        """获取指定位置的历史记录摘要"""
+        if 0 <= index < len(self.records):
+            return self.records[index]
+        return None
+
+    def get_entry(self, index):
+        """按位置读取完整的历史记录条目，只读取对应的一行"""
+        record = self.get_record(index)
+        if record is None:
+            return None
+        try:
+            with open(record.path, 'rb') as f:
+                f.seek(record.offset)
+                return json.loads(f.readline())
+        except Exception as e:
+            print(f"读取历史记录失败 ({record.path}@{record.offset}): {e}")
+            return None
+
+    def position_of_video(self, video_field):
+        """返回视频字段对应的历史记录位置，不存在时返回 -1"""
+        return self._position_by_video.get(video_field, -1)
+
+    def processed_video_names(self):
+        """返回已保存过的视频文件名集合"""
+        return {record.video[7:] for record in self.records if record.video.startswith("videos/")}
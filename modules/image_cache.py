@@ -0,0 +1,172 @@
+import threading
+from collections import OrderedDict
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QSize, pyqtSignal
+from PyQt5.QtGui import QImageReader
+
+
+MAX_MIP_LEVEL = 4  # 最多缩小到原图的 1/16
+
+
+def mip_level_for_scale(scale):
+    """
+    根据显示缩放比例选择解码层级：第 L 层的分辨率为原图的 1/2^L，
+    选择分辨率不低于显示需要的最小层级。
+    """
+    level = 0
+    while level < MAX_MIP_LEVEL and scale <= 1.0 / (2 ** (level + 1)):
+        level += 1
+    return level
+
+
+def level_scale(level):
+    """解码层级对应的缩放比例"""
+    return 1.0 / (2 ** level)
+
+
+def decode_image(image_path, level=0):
+    """
+    使用 QImageReader 解码图片，level > 0 时通过 setScaledSize 直接解码为缩小的图片
+    （JPEG 会在 DCT 阶段完成缩放，无需先解码完整原图）。QImage 可以在工作线程中安全创建，
+    QPixmap 只能在界面线程中由 QImage 转换得到。
+
+    Args:
+        image_path: 图片路径
+        level: 解码层级，分辨率为原图的 1/2^level
+
+    Returns:
+        QImage: 解码得到的图片，失败时为空图片
+    """
+    reader = QImageReader(image_path)
+    reader.setAutoTransform(True)  # 按 EXIF 方向自动旋转
+    if level > 0:
+        original_size = reader.size()
+        if original_size.isValid():
+            scale = level_scale(level)
+            reader.setScaledSize(QSize(max(1, round(original_size.width() * scale)),
+                                       max(1, round(original_size.height() * scale))))
+    image = reader.read()
+    if image.isNull():
+        print(f"解码图片失败: {image_path}, {reader.errorString()}")
+    return image
+
+
+class DecodedImageCache:
+    """按字节预算淘汰的已解码图片 LRU 缓存，可在多个线程中访问"""
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """获取缓存的图片并标记为最近使用，未命中时返回 None"""
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+            return image
+
+    def contains(self, key):
+        with self._lock:
+            return key in self._images
+
+    def get_best(self, image_path, level):
+        """
+        获取分辨率不低于 level 层级的缓存图片，优先选择最接近的层级
+
+        Returns:
+            tuple: (QImage, 层级)，未命中时返回 (None, level)
+        """
+        for candidate in range(level, -1, -1):
+            image = self.get((image_path, candidate))
+            if image is not None:
+                return image, candidate
+        return None, level
+
+    def put(self, key, image):
+        """写入图片，超出预算时淘汰最久未使用的图片"""
+        if image is None or image.isNull():
+            return
+        size = image.sizeInBytes()
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old_image = self._images.pop(key, None)
+            if old_image is not None:
+                self.current_bytes -= old_image.sizeInBytes()
+            self._images[key] = image
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._images:
+                _, evicted = self._images.popitem(last=False)
+                self.current_bytes -= evicted.sizeInBytes()
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self.current_bytes = 0
+
+
+class _DecodeSignals(QObject):
+    """QRunnable 不能直接定义信号，借助 QObject 转发"""
+    decoded = pyqtSignal(str)
+
+
+class _DecodeTask(QRunnable):
+    """在线程池中按指定层级解码一张图片并写入缓存"""
+
+    def __init__(self, image_path, level, cache, signals):
+        super().__init__()
+        self.image_path = image_path
+        self.level = level
+        self.cache = cache
+        self.signals = signals
+
+    def run(self):
+        key = (self.image_path, self.level)
+        if not self.cache.contains(key):
+            self.cache.put(key, decode_image(self.image_path, self.level))
+        self.signals.decoded.emit(self.image_path)
+
+
+class ImagePrefetcher(QObject):
+    """在后台线程中预解码当前图片前后若干张图片"""
+
+    def __init__(self, cache, radius=3, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.radius = radius
+        self.pending = set()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+        self.signals = _DecodeSignals()
+        self.signals.decoded.connect(self._on_decoded)
+
+    def prefetch_around(self, image_paths, center_index, level=0):
+        """按距离由近到远预取 center_index 前后 radius 张图片的指定层级"""
+        # 丢弃尚未开始的旧任务，优先处理新位置附近的图片
+        self.pool.clear()
+        self.pending.clear()
+        for distance in range(1, self.radius + 1):
+            for index in (center_index + distance, center_index - distance):
+                if 0 <= index < len(image_paths):
+                    self._schedule(image_paths[index], level, priority=self.radius - distance)
+
+    def _schedule(self, image_path, level, priority=0):
+        if image_path in self.pending or self.cache.get_best(image_path, level)[0] is not None:
+            return
+        self.pending.add(image_path)
+        self.pool.start(_DecodeTask(image_path, level, self.cache, self.signals), priority)
+
+    def _on_decoded(self, image_path):
+        self.pending.discard(image_path)
+
+    def cancel(self):
+        """取消尚未开始的预取任务"""
+        self.pool.clear()
+        self.pending.clear()
+
+    def shutdown(self):
+        """取消排队的任务并等待正在执行的任务结束（窗口关闭前调用）"""
+        self.cancel()
+        self.pool.waitForDone()
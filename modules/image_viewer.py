@@ -1,8 +1,132 @@
 import os
-from PyQt5.QtCore import Qt, pyqtSignal
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QLabel, 
-                            QScrollArea, QHBoxLayout, QPushButton, QToolBar)
-from PyQt5.QtGui import QImage, QPixmap, QTransform, QIcon
+from collections import OrderedDict
+from PyQt5.QtCore import Qt, pyqtSignal, QTimer, QRect, QSize
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QLabel, QGraphicsView, QGraphicsScene,
+                            QGraphicsPixmapItem, QHBoxLayout, QPushButton, QToolBar,
+                            QListWidget, QListWidgetItem, QListView)
+from PyQt5.QtGui import QImage, QPixmap, QTransform, QIcon, QColor, QFont
+from .image_cache import (DecodedImageCache, ImagePrefetcher, decode_image,
+                          mip_level_for_scale, level_scale)
+from .thumbnail_cache import ThumbnailLoader
+
+
+class TiledImageView(QGraphicsView):
+    """
+    分块渲染的图片视图。图片被切成若干图块放入场景，缩放和旋转只修改视图变换，
+    Qt 只绘制可见区域内的图块，不会生成放大或旋转后的整张位图。
+    """
+
+    TILE_SIZE = 1024
+    TILE_OVERLAP = 2  # 图块之间少量重叠，避免平滑缩放时出现接缝
+    MAX_CACHED_TILE_SETS = 3
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setScene(QGraphicsScene(self))
+        self.setAlignment(Qt.AlignCenter)
+        self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.setTransformationAnchor(QGraphicsView.NoAnchor)
+        self.setViewportUpdateMode(QGraphicsView.SmartViewportUpdate)
+        self.setBackgroundBrush(QColor("#f8f8f8"))
+        self.tile_items = []
+        self.tile_cache = OrderedDict()  # (图片路径, 层级) -> [(QPixmap, x, y)]
+
+        # 连续缩放时先用快速缩放，停止操作后再切换为平滑缩放
+        self.smooth_timer = QTimer(self)
+        self.smooth_timer.setSingleShot(True)
+        self.smooth_timer.setInterval(150)
+        self.smooth_timer.timeout.connect(lambda: self.set_smooth(True))
+
+    def _build_tiles(self, image):
+        """把 QImage 切分为图块并转换为 QPixmap（只能在界面线程中进行）"""
+        tiles = []
+        step = self.TILE_SIZE
+        for y in range(0, image.height(), step):
+            for x in range(0, image.width(), step):
+                rect = QRect(x, y, step + self.TILE_OVERLAP, step + self.TILE_OVERLAP).intersected(image.rect())
+                tiles.append((QPixmap.fromImage(image.copy(rect)), x, y))
+        return tiles
+
+    def set_image(self, key, image, scale):
+        """
+        显示图片
+
+        Args:
+            key: 图块缓存键，通常为 (图片路径, 解码层级)
+            image: 解码后的 QImage
+            scale: 解码图片相对原图的缩放比例，场景坐标始终以原图像素为单位
+        """
+        tiles = self.tile_cache.get(key)
+        if tiles is None:
+            tiles = self._build_tiles(image)
+            self.tile_cache[key] = tiles
+            while len(self.tile_cache) > self.MAX_CACHED_TILE_SETS:
+                self.tile_cache.popitem(last=False)
+        else:
+            self.tile_cache.move_to_end(key)
+
+        self.scene().clear()
+        self.tile_items = []
+        item_scale = 1.0 / scale
+        for pixmap, x, y in tiles:
+            item = QGraphicsPixmapItem(pixmap)
+            item.setScale(item_scale)
+            item.setPos(x * item_scale, y * item_scale)
+            item.setTransformationMode(Qt.SmoothTransformation)
+            self.scene().addItem(item)
+            self.tile_items.append(item)
+        self.scene().setSceneRect(0, 0, image.width() * item_scale, image.height() * item_scale)
+
+    def show_message(self, text):
+        """清空图片并显示提示文字"""
+        self.scene().clear()
+        self.tile_items = []
+        text_item = self.scene().addSimpleText(text, QFont("", 12))
+        self.scene().setSceneRect(text_item.boundingRect())
+        self.resetTransform()
+
+    def clear_image(self):
+        """清空图片和图块缓存"""
+        self.scene().clear()
+        self.tile_items = []
+        self.tile_cache.clear()
+
+    def set_smooth(self, smooth):
+        """切换图块的平滑缩放"""
+        mode = Qt.SmoothTransformation if smooth else Qt.FastTransformation
+        for item in self.tile_items:
+            item.setTransformationMode(mode)
+
+    def apply_view_transform(self, zoom, angle, anchor=None, interactive=False):
+        """
+        设置缩放和旋转，保持锚点（默认视口中心）下的图片位置不变
+
+        Args:
+            zoom: 相对原图的缩放比例
+            angle: 旋转角度
+            anchor: (可选) 视口坐标中的锚点
+            interactive: 是否为连续操作，连续操作期间暂时关闭平滑缩放
+        """
+        if anchor is None:
+            anchor = self.viewport().rect().center()
+        scene_anchor = self.mapToScene(anchor)
+
+        transform = QTransform()
+        transform.rotate(angle)
+        transform.scale(zoom, zoom)
+        self.setTransform(transform)
+
+        # 调整滚动条，使锚点对应的场景位置回到原来的视口位置
+        delta = self.mapFromScene(scene_anchor) - anchor
+        self.horizontalScrollBar().setValue(self.horizontalScrollBar().value() + delta.x())
+        self.verticalScrollBar().setValue(self.verticalScrollBar().value() + delta.y())
+
+        if interactive:
+            self.set_smooth(False)
+            self.smooth_timer.start()
+        else:
+            self.set_smooth(True)
+
 
 class ImageViewer(QWidget):
     """
@@ -20,7 +144,18 @@ class ImageViewer(QWidget):
         # 图片操作属性
         self.current_zoom = 0.5  # 默认缩放为0.5倍
         self.rotation_angle = 0
-        self.original_pixmap = None
+        self.original_image = None  # 当前显示图片的解码结果(QImage)
+        self.current_image_path = ""
+        self.decoded_level = 0  # 当前显示图片的解码层级，分辨率为原图的 1/2^level
+        
+        # 已解码图片缓存和前后图片预取
+        self.image_cache = DecodedImageCache()
+        self.prefetcher = ImagePrefetcher(self.image_cache, radius=3, parent=self)
+        
+        # 缩略图加载器，缩略图持久化缓存由主窗口在导入数据后设置
+        self.thumbnail_loader = ThumbnailLoader(self)
+        self.thumbnail_loader.thumbnail_ready.connect(self.set_thumbnail)
+        self.thumbnail_items = {}  # 图片路径 -> 缩略图列表项
         
         self.setup_ui()
         
@@ -128,28 +263,15 @@ class ImageViewer(QWidget):
         layout.addWidget(toolbar)
         
         # 图片显示区域
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setAlignment(Qt.AlignCenter)
-        self.scroll_area.setStyleSheet("""
-            QScrollArea {
+        self.image_view = TiledImageView()
+        self.image_view.setStyleSheet("""
+            QGraphicsView {
                 background-color: #f5f5f5; 
                 border: 1px solid #ddd; 
                 border-radius: 6px;
             }
         """)
-        
-        self.image_label = QLabel()
-        self.image_label.setAlignment(Qt.AlignCenter)
-        self.image_label.setStyleSheet("""
-            QLabel {
-                background-color: #f8f8f8; 
-                border-radius: 4px;
-            }
-        """)
-        
-        self.scroll_area.setWidget(self.image_label)
-        layout.addWidget(self.scroll_area)
+        layout.addWidget(self.image_view)
         
         # 控制区域
         controls_layout = QHBoxLayout()
@@ -211,6 +333,32 @@ class ImageViewer(QWidget):
         controls_layout.addWidget(self.next_button)
         
         layout.addLayout(controls_layout)
+        
+        # 缩略图条，点击直接跳转到对应图片
+        self.thumbnail_strip = QListWidget()
+        self.thumbnail_strip.setViewMode(QListView.IconMode)
+        self.thumbnail_strip.setFlow(QListView.LeftToRight)
+        self.thumbnail_strip.setWrapping(False)
+        self.thumbnail_strip.setMovement(QListView.Static)
+        self.thumbnail_strip.setUniformItemSizes(True)
+        self.thumbnail_strip.setIconSize(QSize(96, 96))
+        self.thumbnail_strip.setFixedHeight(145)
+        self.thumbnail_strip.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        self.thumbnail_strip.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.thumbnail_strip.setStyleSheet("""
+            QListWidget {
+                background-color: #f0f0f0;
+                border: 1px solid #ddd;
+                border-radius: 6px;
+            }
+            QListWidget::item:selected {
+                background-color: #d0e4f7;
+                border: 2px solid #2196F3;
+            }
+        """)
+        self.thumbnail_strip.currentRowChanged.connect(self.show_image_at)
+        layout.addWidget(self.thumbnail_strip)
+        
         self.setLayout(layout)
         
         # 初始状态下禁用按钮
@@ -218,19 +366,19 @@ class ImageViewer(QWidget):
         
         # 设置快捷键和鼠标滚轮事件
         self.setFocusPolicy(Qt.StrongFocus)
-        self.scroll_area.viewport().installEventFilter(self)
+        self.image_view.viewport().installEventFilter(self)
         
     def eventFilter(self, source, event):
         """监听鼠标滚轮事件"""
-        if (source is self.scroll_area.viewport() and 
+        if (source is self.image_view.viewport() and 
             event.type() == event.Wheel and 
             event.modifiers() == Qt.ControlModifier):
             
             delta = event.angleDelta().y()
             if delta > 0:
-                self.zoom_in()
+                self.zoom_in(anchor=event.pos(), interactive=True)
             else:
-                self.zoom_out()
+                self.zoom_out(anchor=event.pos(), interactive=True)
             return True
             
         return super().eventFilter(source, event)
@@ -256,13 +404,14 @@ class ImageViewer(QWidget):
         """加载图片列表"""
         self.image_paths = [path for path in image_paths if self.is_image_file(path)]
         self.current_index = -1
+        self.prefetcher.cancel()
+        self.populate_thumbnail_strip()
         
         if self.image_paths:
             self.current_index = 0
             self.show_current_image()
         else:
-            self.image_label.clear()
-            self.image_label.setText("没有可显示的图片")
+            self.image_view.show_message("没有可显示的图片")
             self.count_label.setText("0/0")
             
         self.update_buttons()
@@ -281,7 +430,48 @@ class ImageViewer(QWidget):
             self.load_image(image_path)
             self.count_label.setText(f"{self.current_index + 1}/{len(self.image_paths)}")
             self.image_changed.emit(self.current_index)
+            self.thumbnail_strip.blockSignals(True)
+            self.thumbnail_strip.setCurrentRow(self.current_index)
+            self.thumbnail_strip.blockSignals(False)
+            self.prefetcher.prefetch_around(self.image_paths, self.current_index,
+                                            mip_level_for_scale(self.current_zoom))
             
+    def show_image_at(self, index):
+        """跳转到指定索引的图片"""
+        if 0 <= index < len(self.image_paths) and index != self.current_index:
+            self.current_index = index
+            self.show_current_image()
+            self.update_buttons()
+
+    def set_thumbnail_cache(self, cache):
+        """设置缩略图持久化缓存"""
+        self.thumbnail_loader.set_cache(cache)
+
+    def prefetch_thumbnails(self, image_paths):
+        """在后台预生成缩略图（例如下一个病例的图片）"""
+        self.thumbnail_loader.prefetch([path for path in image_paths if self.is_image_file(path)])
+
+    def populate_thumbnail_strip(self):
+        """为当前图片列表创建缩略图占位项并在后台加载缩略图"""
+        self.thumbnail_strip.blockSignals(True)
+        self.thumbnail_strip.clear()
+        self.thumbnail_items = {}
+        for i, image_path in enumerate(self.image_paths):
+            item = QListWidgetItem(str(i + 1))
+            item.setToolTip(os.path.basename(image_path))
+            item.setSizeHint(QSize(104, 120))
+            item.setTextAlignment(Qt.AlignCenter)
+            self.thumbnail_strip.addItem(item)
+            self.thumbnail_items[image_path] = item
+        self.thumbnail_strip.blockSignals(False)
+        self.thumbnail_loader.load(self.image_paths)
+
+    def set_thumbnail(self, image_path, image):
+        """缩略图加载完成后更新对应的列表项"""
+        item = self.thumbnail_items.get(image_path)
+        if item is not None:
+            item.setIcon(QIcon(QPixmap.fromImage(image)))
+
     def load_image(self, image_path):
         """加载并显示图片"""
         # 重置缩放为默认值(0.5)和旋转角度
@@ -289,66 +479,75 @@ class ImageViewer(QWidget):
         self.rotation_angle = 0
         
         if not os.path.exists(image_path):
-            self.image_label.setText(f"图片不存在: {image_path}")
+            self.original_image = None
+            self.image_view.show_message(f"图片不存在: {image_path}")
             return
             
-        # 加载图片
-        self.original_pixmap = QPixmap(image_path)
-        if self.original_pixmap.isNull():
-            self.image_label.setText(f"无法加载图片: {image_path}")
+        self.current_image_path = image_path
+        if not self.load_decoded_level(mip_level_for_scale(self.current_zoom)):
+            self.original_image = None
+            self.image_view.show_message(f"无法加载图片: {image_path}")
             return
             
         # 显示图片
         self.update_image_display()
         
-    def update_image_display(self):
-        """根据当前的缩放和旋转更新图片显示"""
-        if self.original_pixmap is None:
-            return
+    def load_decoded_level(self, level):
+        """
+        按解码层级加载当前图片，优先使用已解码（或已预取）的图片，只在界面线程中转换为图块
 
-        # 创建变换
-        transform = QTransform()
-        transform.rotate(self.rotation_angle)
-
-        # 应用变换
-        rotated_pixmap = self.original_pixmap.transformed(transform, Qt.SmoothTransformation)
-
-        # 应用缩放
-        scaled_size = rotated_pixmap.size() * self.current_zoom
-        if scaled_size.width() > 0 and scaled_size.height() > 0:
-            scaled_pixmap = rotated_pixmap.scaled(
-                scaled_size, 
-                Qt.KeepAspectRatio, 
-                Qt.SmoothTransformation
-            )
-
-            self.image_label.setPixmap(scaled_pixmap)
-            self.image_label.resize(scaled_pixmap.size())
+        Returns:
+            bool: 是否加载成功
+        """
+        image, cached_level = self.image_cache.get_best(self.current_image_path, level)
+        if image is None:
+            image = decode_image(self.current_image_path, level)
+            self.image_cache.put((self.current_image_path, level), image)
+            cached_level = level
+        if image.isNull():
+            return False
+        self.original_image = image
+        self.decoded_level = cached_level
+        self.image_view.set_image((self.current_image_path, cached_level), image, level_scale(cached_level))
+        return True
+
+    def ensure_resolution(self):
+        """放大超过当前解码层级的分辨率时，重新解码更高分辨率的图片"""
+        required_level = mip_level_for_scale(self.current_zoom)
+        if required_level < self.decoded_level:
+            self.load_decoded_level(required_level)
+
+    def update_image_display(self, anchor=None, interactive=False):
+        """根据当前的缩放和旋转更新视图变换（不重新生成位图）"""
+        if self.original_image is None:
+            return
+        self.image_view.apply_view_transform(self.current_zoom, self.rotation_angle, anchor, interactive)
             
-    def zoom_in(self):
+    def zoom_in(self, anchor=None, interactive=False):
         """放大图片"""
-        if self.original_pixmap is None:
+        if self.original_image is None:
             return
         self.current_zoom *= 1.25  # 放大25%
-        self.update_image_display()
+        self.ensure_resolution()
+        self.update_image_display(anchor, interactive)
 
-    def zoom_out(self):
+    def zoom_out(self, anchor=None, interactive=False):
         """缩小图片"""
-        if self.original_pixmap is None:
+        if self.original_image is None:
             return
         self.current_zoom *= 0.8  # 缩小20%
-        self.update_image_display()
+        self.update_image_display(anchor, interactive)
 
     def rotate_image(self):
         """旋转图片90度"""
-        if self.original_pixmap is None:
+        if self.original_image is None:
             return
         self.rotation_angle = (self.rotation_angle + 90) % 360
         self.update_image_display()
         
     def reset_image(self):
         """重置图片缩放和旋转"""
-        if self.original_pixmap is None:
+        if self.original_image is None:
             return
         self.current_zoom = 0.5  # 重置为默认缩放比例(0.5倍)
         self.rotation_angle = 0
@@ -371,7 +570,7 @@ class ImageViewer(QWidget):
     def update_buttons(self):
         """更新按钮状态"""
         has_images = len(self.image_paths) > 0
-        has_current_image = has_images and self.original_pixmap is not None
+        has_current_image = has_images and self.original_image is not None
         
         self.prev_button.setEnabled(has_images and self.current_index > 0)
         self.next_button.setEnabled(has_images and self.current_index < len(self.image_paths) - 1)
@@ -380,11 +579,20 @@ class ImageViewer(QWidget):
         self.rotate_button.setEnabled(has_current_image)
         self.reset_button.setEnabled(has_current_image)
         
+    def shutdown(self):
+        """停止后台解码和缩略图任务"""
+        self.prefetcher.shutdown()
+        self.thumbnail_loader.shutdown()
+
     def clear(self):
         """清除所有图片"""
         self.image_paths = []
         self.current_index = -1
-        self.original_pixmap = None
-        self.image_label.clear()
+        self.original_image = None
+        self.current_image_path = ""
+        self.prefetcher.cancel()
+        self.image_view.clear_image()
+        self.thumbnail_strip.clear()
+        self.thumbnail_items = {}
         self.count_label.setText("0/0")
         self.update_buttons()
\ No newline at end of file
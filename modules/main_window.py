@@ -1,16 +1,15 @@
 import os
 import json
-import jsonlines
 import traceback
 import sys
-from PyQt5.QtCore import Qt, pyqtSignal, QSize, QRect, QSettings
+from PyQt5.QtCore import Qt, pyqtSignal, QSize, QRect, QSettings, QTimer
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QLabel, QPushButton, QLineEdit, QTextEdit, 
-                             QListWidget, QListWidgetItem, QFileDialog, 
+                             QListWidget, QFileDialog, 
                              QMessageBox, QTabWidget, QSplitter, QGroupBox,
                              QDialog, QDialogButtonBox, QFormLayout, QComboBox, QInputDialog,
                              QAction, QToolBar, QStatusBar, QApplication, QFrame, QCheckBox,
-                             QScrollArea)
+                             QScrollArea, QDockWidget, QListView)
 from PyQt5.QtGui import QIcon, QFont, QColor, QPalette
 
 # 导入模块前添加资源路径处理函数
@@ -22,10 +21,14 @@ def resource_path(relative_path):
 
 from .video_player import VideoPlayer
 from .image_viewer import ImageViewer
-from .annotation_manager import AnnotationManager, AnnotationDialog
+from .annotation_manager import AnnotationManager, AnnotationDialog, AnnotationListModel
 from .api_handler import APIHandler, ModelSettingsDialog
 from .help_dialog import HelpDialog
-from .file_handler import FileHandler
+from .file_handler import FileHandler, MetadataProbeThread, SceneAnalysisThread
+from .work_leases import HEARTBEAT_INTERVAL
+from .history_browser import HistoryBrowser
+from .annotation_format import format_time_ms, split_diagnoses
+from .thumbnail_cache import ThumbnailCache
 
 
 class OutputFolderDialog(QDialog):
@@ -38,6 +41,7 @@ class OutputFolderDialog(QDialog):
         
         # 加载用户设置，使用resource_path
         self.settings_file = resource_path("config/output_folder_config.json")
+        self.storage_backend = "jsonl"
         self.load_settings()
         
         self.setWindowTitle("输出文件夹设置")
@@ -71,6 +75,13 @@ class OutputFolderDialog(QDialog):
         folder_layout.addWidget(browse_button)
         
         form_layout.addRow("当前输出文件夹:", folder_layout)
+
+        # 工作存储类型
+        self.backend_combo = QComboBox()
+        self.backend_combo.addItem("JSONL（可放在共享目录，多台电脑协作）", "jsonl")
+        self.backend_combo.addItem("SQLite WAL（仅限本机，大数据集读写更快）", "sqlite")
+        self.backend_combo.setCurrentIndex(max(0, self.backend_combo.findData(self.storage_backend)))
+        form_layout.addRow("工作存储:", self.backend_combo)
         layout.addLayout(form_layout)
         
         # 恢复默认按钮
@@ -118,6 +129,10 @@ class OutputFolderDialog(QDialog):
     def get_selected_folder(self):
         """获取选择的文件夹路径"""
         return self.folder_edit.text()
+
+    def get_selected_backend(self):
+        """获取选择的工作存储类型"""
+        return self.backend_combo.currentData()
         
     def load_settings(self):
         """加载设置"""
@@ -129,6 +144,7 @@ class OutputFolderDialog(QDialog):
                         self.current_folder = settings["output_folder"]
                     else:
                         self.current_folder = self.default_folder
+                    self.storage_backend = settings.get("storage_backend", "jsonl")
             except:
                 self.current_folder = self.default_folder
         else:
@@ -136,9 +152,9 @@ class OutputFolderDialog(QDialog):
             os.makedirs(os.path.dirname(self.settings_file), exist_ok=True)
             self.current_folder = self.default_folder
             
-    def save_settings(self, folder_path):
+    def save_settings(self, folder_path, storage_backend="jsonl"):
         """保存设置"""
-        settings = {"output_folder": folder_path}
+        settings = {"output_folder": folder_path, "storage_backend": storage_backend}
         try:
             with open(self.settings_file, 'w', encoding='utf-8') as f:
                 json.dump(settings, f, ensure_ascii=False, indent=4)
@@ -506,11 +522,19 @@ class MainWindow(QMainWindow):
         self.folders = []
         self.current_video_path = ""
         self.current_images = []
-        self.annotations = []
         
         # 新增状态：用于历史记录导航
         self.viewing_history_index = None
 
+        # 后台视频元数据预检线程
+        self.metadata_probe_thread = None
+        # 后台镜头/运动分析线程
+        self.scene_analysis_thread = None
+        # 定期更新病例租约的心跳，避免其他工作站接手正在处理的病例
+        self.lease_timer = QTimer(self)
+        self.lease_timer.timeout.connect(self.heartbeat_leases)
+        self.lease_timer.start(HEARTBEAT_INTERVAL * 1000)
+
         # 初始化文件处理器、API处理器和标注管理器
         self.file_handler = FileHandler()
         self.api_handler = APIHandler()
@@ -554,14 +578,14 @@ class MainWindow(QMainWindow):
                 margin-top: 1ex; /* leave space at the top for the title */
                 font-size: {default_font_size}pt; /* GroupBox 内其他控件字体大小 */
             }}
-            QListWidget {{
+            QListWidget, QListView#annotationList {{
                 border: 1px solid #ddd;
                 border-radius: 4px;
                 background-color: white;
                 padding: 4px;
                 font-size: {large_font_size}pt;
             }}
-            QListWidget::item {{
+            QListWidget::item, QListView#annotationList::item {{
                 padding: 8px;
                 border-bottom: 1px solid #eee;
             }}
@@ -654,9 +678,13 @@ class MainWindow(QMainWindow):
         annotation_layout = QVBoxLayout()
         annotation_layout.setContentsMargins(10, 15, 10, 10) # 顶部边距调整以适应标题
         
-        self.annotation_list = QListWidget()
-        self.annotation_list.setSelectionMode(QListWidget.SingleSelection)
-        self.annotation_list.itemDoubleClicked.connect(self.edit_annotation)
+        self.annotation_list_model = AnnotationListModel(self.annotation_manager, self)
+        self.annotation_list = QListView()
+        self.annotation_list.setObjectName("annotationList")
+        self.annotation_list.setModel(self.annotation_list_model)
+        self.annotation_list.setSelectionMode(QListView.SingleSelection)
+        self.annotation_list.setEditTriggers(QListView.NoEditTriggers)
+        self.annotation_list.doubleClicked.connect(self.edit_annotation)
         self.annotation_list.setMinimumHeight(120)
         annotation_layout.addWidget(self.annotation_list)
         
@@ -814,6 +842,16 @@ class MainWindow(QMainWindow):
         
         self.setCentralWidget(central_widget)
         
+        # 历史记录浏览面板
+        self.history_browser = HistoryBrowser()
+        self.history_dock = QDockWidget("历史记录", self)
+        self.history_dock.setWidget(self.history_browser)
+        self.history_dock.setAllowedAreas(Qt.LeftDockWidgetArea | Qt.RightDockWidgetArea)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.history_dock)
+        self.history_dock.hide()
+        self.history_action.toggled.connect(self.history_dock.setVisible)
+        self.history_dock.visibilityChanged.connect(self.history_action.setChecked)
+        
         # 底部状态栏
         self.statusBar = QStatusBar()
         
@@ -836,6 +874,20 @@ class MainWindow(QMainWindow):
         import_action.triggered.connect(self.import_folder)
         toolbar.addAction(import_action)
         
+        # 导入后预检视频元数据开关
+        self.probe_action = QAction("导入后预检视频", self)
+        self.probe_action.setCheckable(True)
+        self.probe_action.setChecked(True)
+        self.probe_action.setStatusTip("导入后在后台并行检查所有视频的时长和编码，提前发现损坏文件")
+        toolbar.addAction(self.probe_action)
+
+        # 导入后分析镜头/运动变化开关
+        self.analysis_action = QAction("导入后分析镜头", self)
+        self.analysis_action.setCheckable(True)
+        self.analysis_action.setChecked(True)
+        self.analysis_action.setStatusTip("导入后在后台分析视频的镜头切换和运动变化，在时间轴上给出建议片段")
+        toolbar.addAction(self.analysis_action)
+        
         toolbar.addSeparator()
         
         # 当前文件夹信息
@@ -855,6 +907,12 @@ class MainWindow(QMainWindow):
         self.current_folder_btn.setEnabled(False)
         toolbar.addWidget(self.current_folder_btn)
         
+        # 历史记录浏览面板开关
+        self.history_action = QAction("历史记录浏览", self)
+        self.history_action.setCheckable(True)
+        self.history_action.setStatusTip("打开历史记录列表，可搜索、跳转并直接打开任意一条已保存数据")
+        toolbar.addAction(self.history_action)
+        
         toolbar.addSeparator()
         
         # 模型参数设置按钮
@@ -885,9 +943,16 @@ class MainWindow(QMainWindow):
         """设置信号连接"""
         # 关联视频片段标记信号
         self.video_player.segment_marked.connect(self.handle_segment_marked)
+        self.video_player.time_changed.connect(self.highlight_current_segments)
+        self.video_player.timeline.set_annotation_manager(self.annotation_manager)
+        self.video_player.timeline.segment_clicked.connect(self.select_annotation_row)
+        self.video_player.timeline.suggestion_accepted.connect(self.accept_suggestion)
+        
+        # 关联历史记录浏览面板
+        self.history_browser.entry_activated.connect(self.open_history_entry_from_browser)
         
         # 关联标注管理器信号
-        self.annotation_manager.annotation_changed.connect(self.update_annotation_list_from_manager)
+        self.annotation_manager.annotation_changed.connect(self.handle_annotation_changed)
         self.description_edit.textChanged.connect(self.mark_data_modified)
         self.thinking_chain_edit.textChanged.connect(self.mark_data_modified)
         self.ai_answer_edit.textChanged.connect(self.mark_data_modified)
@@ -903,13 +968,12 @@ class MainWindow(QMainWindow):
     def update_ui_state(self, folder_loaded=False):
         """更新UI状态"""
         self.add_annotation_button.setEnabled(folder_loaded)
-        self.edit_annotation_button.setEnabled(folder_loaded and self.annotation_list.count() > 0)
-        self.delete_annotation_button.setEnabled(folder_loaded and self.annotation_list.count() > 0)
+        self.edit_annotation_button.setEnabled(folder_loaded and self.annotation_manager.count() > 0)
+        self.delete_annotation_button.setEnabled(folder_loaded and self.annotation_manager.count() > 0)
         self.generate_button.setEnabled(folder_loaded)
         self.save_button.setEnabled(folder_loaded)
 
-        can_go_back = self.file_handler.output_jsonl and (self.viewing_history_index is None or self.viewing_history_index > 0)
-        self.prev_folder_btn.setEnabled(bool(self.file_handler.output_jsonl) and len(self.file_handler.output_jsonl) > 0)
+        self.prev_folder_btn.setEnabled(self.file_handler.get_history_count() > 0)
         self.current_folder_btn.setEnabled(self.viewing_history_index is not None)
 
     def reset_ui_to_initial_state(self):
@@ -917,14 +981,13 @@ class MainWindow(QMainWindow):
         self.current_folder_index = -1
         self.current_video_path = ""
         self.current_images = []
-        self.annotations = []
         self.viewing_history_index = None
         self.data_modified = False
 
         self.video_player.clear()
         self.image_viewer.clear()
         self.annotation_manager.set_annotations([])
-        self.annotation_list.clear()
+        self.apply_scene_analysis(None)
         self.description_edit.clear()
         self.diagnosis_selector.set_selected_diagnoses([])
         self.thinking_chain_edit.clear()
@@ -939,10 +1002,17 @@ class MainWindow(QMainWindow):
 
         self.reset_ui_to_initial_state()
 
-        folders_list, start_index, loaded_jsonl = self.file_handler.import_folder(self)
+        folders_list, start_index = self.file_handler.import_folder(self)
         
+        self.history_browser.set_history_index(self.file_handler.history_index)
         if folders_list:
             self.folders = folders_list
+            self.image_viewer.set_thumbnail_cache(
+                ThumbnailCache(os.path.join(self.file_handler.get_cache_folder(), "thumbnails.sqlite")))
+            self.video_player.set_pts_cache_folder(os.path.join(self.file_handler.get_cache_folder(), "pts"))
+            self.api_handler.set_frame_cache_folder(os.path.join(self.file_handler.get_cache_folder(), "frames"))
+            if self.probe_action.isChecked():
+                self.start_metadata_probe()
             
             if start_index >= len(self.folders):
                 QMessageBox.information(self, "提示", "所有文件夹似乎都已处理完毕。您可以查看历史记录或重新导入。")
@@ -950,9 +1020,150 @@ class MainWindow(QMainWindow):
                 self.update_ui_state(False)
             else:
                 self.load_folder(start_index)
+            if self.analysis_action.isChecked():
+                self.start_scene_analysis()
         else:
              self.reset_ui_to_initial_state()
 
+    def start_metadata_probe(self):
+        """在后台进程池中预检尚未缓存的视频元数据"""
+        self.stop_metadata_probe()
+
+        video_paths = self.file_handler.get_all_video_paths()
+        pending_paths = self.file_handler.metadata_cache.missing(video_paths)
+        if not pending_paths:
+            self.report_bad_videos(video_paths)
+            self.report_duplicate_videos()
+            return
+
+        self.metadata_probe_thread = MetadataProbeThread(pending_paths, parent=self)
+        self.metadata_probe_thread.progress.connect(
+            lambda done, total: self.statusBar.showMessage(f"正在预检视频元数据: {done}/{total}"))
+        self.metadata_probe_thread.probe_finished.connect(self.handle_metadata_probe_finished)
+        self.metadata_probe_thread.start()
+
+    def stop_metadata_probe(self):
+        """停止正在运行的预检线程"""
+        if self.metadata_probe_thread is not None:
+            self.metadata_probe_thread.probe_finished.disconnect()
+            self.metadata_probe_thread.stop()
+            self.metadata_probe_thread.wait()
+            self.metadata_probe_thread = None
+
+    def handle_metadata_probe_finished(self, results):
+        """预检完成后写入缓存并提示不可用的视频"""
+        self.metadata_probe_thread = None
+        self.file_handler.update_metadata_cache(results)
+        self.statusBar.showMessage(f"视频元数据预检完成，共 {len(results)} 个视频", 3000)
+        self.report_bad_videos(self.file_handler.get_all_video_paths())
+        self.report_duplicate_videos()
+
+    def start_scene_analysis(self):
+        """在后台进程池中分析尚未缓存的视频，当前视频优先"""
+        self.stop_scene_analysis()
+
+        video_paths = self.file_handler.get_all_video_paths()
+        if self.current_video_path in video_paths:
+            video_paths.remove(self.current_video_path)
+            video_paths.insert(0, self.current_video_path)
+
+        self.scene_analysis_thread = SceneAnalysisThread(video_paths, self.file_handler.analysis_cache, parent=self)
+        self.scene_analysis_thread.progress.connect(
+            lambda done, total: self.statusBar.showMessage(f"正在分析镜头变化: {done}/{total}"))
+        self.scene_analysis_thread.video_analyzed.connect(self.handle_video_analyzed)
+        self.scene_analysis_thread.analysis_finished.connect(self.handle_scene_analysis_finished)
+        self.scene_analysis_thread.start()
+
+    def stop_scene_analysis(self):
+        """停止正在运行的镜头分析线程"""
+        if self.scene_analysis_thread is not None:
+            self.scene_analysis_thread.video_analyzed.disconnect()
+            self.scene_analysis_thread.analysis_finished.disconnect()
+            self.scene_analysis_thread.stop()
+            self.scene_analysis_thread.wait()
+            self.scene_analysis_thread = None
+
+    def handle_video_analyzed(self, result):
+        """单个视频分析完成，是当前视频时立即显示建议片段"""
+        if self.current_video_path and os.path.normcase(os.path.abspath(result.get("path", ""))) == \
+                os.path.normcase(os.path.abspath(self.current_video_path)):
+            self.apply_scene_analysis(result)
+
+    def handle_scene_analysis_finished(self, count):
+        self.scene_analysis_thread = None
+        if count:
+            self.statusBar.showMessage(f"镜头分析完成，共 {count} 个视频", 3000)
+
+    def apply_scene_analysis(self, result):
+        """把分析结果显示为建议片段和运动强度曲线，没有结果时清除"""
+        if result and result.get("ok"):
+            self.annotation_manager.set_suggestions(result.get("suggestions", []))
+            self.video_player.timeline.set_motion_curve(result.get("times_ms", []), result.get("motion", []))
+        else:
+            self.annotation_manager.set_suggestions([])
+            self.video_player.timeline.set_motion_curve([], [])
+
+    def accept_suggestion(self, index):
+        """采纳建议片段：以其起止时间打开标注对话框"""
+        suggestions = self.annotation_manager.get_suggestions()
+        if 0 <= index < len(suggestions):
+            suggestion = suggestions[index]
+            self.handle_segment_marked(format_time_ms(suggestion.start_ms), format_time_ms(suggestion.end_ms), "")
+
+    def report_bad_videos(self, video_paths):
+        """提示无法读取、已损坏或帧率为0的视频"""
+        bad_videos = self.file_handler.metadata_cache.bad_videos(video_paths)
+        if not bad_videos:
+            return
+        lines = [f"{os.path.basename(info['path'])}: {info.get('error', '')}" for info in bad_videos[:20]]
+        if len(bad_videos) > 20:
+            lines.append(f"... 另有 {len(bad_videos) - 20} 个")
+        QMessageBox.warning(self, "视频预检", f"发现 {len(bad_videos)} 个无法正常读取的视频:\n" + "\n".join(lines))
+
+    def report_duplicate_videos(self):
+        """提示内容重复（改名或重新编码）的视频，以及文件名相同但内容不同、保存时会互相覆盖的视频"""
+        duplicates, collisions = self.file_handler.find_duplicate_videos()
+        if not duplicates and not collisions:
+            return
+
+        def relative(path):
+            return os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path))
+
+        lines = []
+        if duplicates:
+            lines.append(f"发现 {len(duplicates)} 组内容相同的视频（可能会被重复标注）:")
+            for group in duplicates[:10]:
+                kind = "文件相同" if group["exact"] else "画面相同"
+                lines.append(f"  [{kind}] " + ", ".join(relative(path) for path in group["paths"]))
+            if len(duplicates) > 10:
+                lines.append(f"  ... 另有 {len(duplicates) - 10} 组")
+        if collisions:
+            lines.append(f"发现 {len(collisions)} 组文件名相同但内容不同的视频（保存到 videos/ 时会互相覆盖）:")
+            for group in collisions[:10]:
+                lines.append("  " + ", ".join(relative(path) for path in group))
+            if len(collisions) > 10:
+                lines.append(f"  ... 另有 {len(collisions) - 10} 组")
+        QMessageBox.warning(self, "重复视频检查", "\n".join(lines))
+
+    def heartbeat_leases(self):
+        """更新租约心跳；租约因长时间无心跳被其他工作站接手时提示"""
+        lost = self.file_handler.heartbeat_leases()
+        if lost:
+            QMessageBox.warning(self, "租约已失效",
+                                f"文件夹 {', '.join(lost)} 的租约已过期并被其他工作站接手，"
+                                "保存前请确认没有重复标注。")
+
+    def closeEvent(self, event):
+        """关闭窗口前停止后台任务"""
+        self.stop_metadata_probe()
+        self.stop_scene_analysis()
+        self.lease_timer.stop()
+        self.file_handler.release_leases()
+        self.file_handler.close_output_store()
+        self.image_viewer.shutdown()
+        self.video_player.shutdown()
+        super().closeEvent(event)
+
     def open_model_settings(self):
         """打开模型参数设置对话框"""
         dialog = ModelSettingsDialog(self.api_handler, self)
@@ -986,18 +1197,21 @@ class MainWindow(QMainWindow):
         self.current_folder_index = folder_idx
         self.current_video_path = video_path
         self.current_images = images
-        self.annotations = annotations
 
         self.video_player.load_video(video_path)
+        self.apply_scene_analysis(
+            self.file_handler.analysis_cache.load(video_path) if self.file_handler.analysis_cache else None)
         if images:
             self.image_viewer.load_images(images)
         else:
             self.image_viewer.clear()
 
-        self.annotation_manager.set_annotations(self.annotations)
-        self.update_annotation_list()  # 添加这一行来直接更新UI
+        # 在后台预生成下一个文件夹的缩略图
+        self.image_viewer.prefetch_thumbnails(self.file_handler.get_folder_image_paths(folder_idx + 1))
+
+        self.annotation_manager.set_annotations(annotations)
         self.description_edit.setPlainText(video_desc or "")
-        diagnoses = [d.strip() for d in final_diag.split(',') if d.strip()]
+        diagnoses = split_diagnoses(final_diag)
         self.diagnosis_selector.set_selected_diagnoses(diagnoses)
 
         ai_thinking = ""
@@ -1019,10 +1233,12 @@ class MainWindow(QMainWindow):
         folder_name = os.path.basename(self.folders[self.current_folder_index])
         status_prefix = ""
         if self.viewing_history_index is not None:
-             history_count = len(self.file_handler.output_jsonl)
+             history_count = self.file_handler.get_history_count()
              status_prefix = f"历史记录 {self.viewing_history_index + 1}/{history_count}: "
         self.folder_info_label.setText(f"当前: {folder_name}")
         self.statusBar.showMessage(f"{status_prefix}{os.path.basename(video_path)}")
+        if self.viewing_history_index is not None:
+            self.history_browser.select_position(self.viewing_history_index)
 
         self.data_modified = False
         self.update_ui_state(True)
@@ -1051,7 +1267,7 @@ class MainWindow(QMainWindow):
 
         current_entry_data = self.file_handler.generate_annotation_data(
             self.current_video_path,
-            self.annotations,
+            self.annotation_manager.get_annotations(),
             video_description,
             final_diagnosis,
             thinking_chain,
@@ -1075,6 +1291,7 @@ class MainWindow(QMainWindow):
                                        self.file_handler.data_folder_name,
                                        f"{self.file_handler.data_folder_name}.jsonl")
              QMessageBox.information(self, "保存成功", f"标注数据已成功保存到: {jsonl_path_save}")
+             self.history_browser.refresh()
 
         current_logical_index = self.current_folder_index
         if self.viewing_history_index is not None:
@@ -1092,55 +1309,62 @@ class MainWindow(QMainWindow):
 
     def load_previous_history_entry(self):
         """加载上一个已保存的历史记录"""
-        output_data_folder = os.path.join(self.file_handler.output_folder, self.file_handler.data_folder_name)
-        jsonl_path = os.path.join(output_data_folder, f"{self.file_handler.data_folder_name}.jsonl")
-
-        if not os.path.exists(jsonl_path):
+        history_index = self.file_handler.history_index
+        if history_index is None or not self.file_handler.has_saved_entries():
             QMessageBox.information(self, "无历史记录", "未找到已保存的标注文件。")
             return
 
-        try:
-            with jsonlines.open(jsonl_path, mode='r') as reader:
-                self.file_handler.output_jsonl = [entry for entry in reader]
-                self.file_handler.output_jsonl.sort(key=lambda x: x.get("id", float('inf')))
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"加载历史记录文件失败: {str(e)}")
-            return
-
-        if not self.file_handler.output_jsonl:
+        history_index.refresh()
+        if len(history_index) == 0:
             QMessageBox.information(self, "无历史记录", "标注文件为空。")
             return
 
         if self.viewing_history_index is None:
-            self.viewing_history_index = len(self.file_handler.output_jsonl) - 1
+            self.viewing_history_index = len(history_index) - 1
         else:
-            self.viewing_history_index -= 1
+            self.viewing_history_index = min(self.viewing_history_index - 1, len(history_index) - 1)
 
         if self.viewing_history_index < 0:
             self.viewing_history_index = 0
             QMessageBox.information(self, "提示", "已经是第一条历史记录。")
 
-        history_entry = self.file_handler.output_jsonl[self.viewing_history_index]
+        self.open_history_entry(self.viewing_history_index)
+
+    def open_history_entry_from_browser(self, history_position):
+        """从历史记录浏览面板打开指定记录"""
+        if self.data_modified and self.current_video_path:
+            reply = QMessageBox.question(self, "确认操作",
+                                        "当前数据有未保存的修改，切换将丢失这些修改。是否继续？",
+                                        QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply == QMessageBox.No:
+                return
+        self.open_history_entry(history_position)
+
+    def open_history_entry(self, history_position):
+        """按历史记录索引中的位置打开一条已保存的数据"""
+        history_entry = self.file_handler.history_index.get_entry(history_position)
+        if history_entry is None:
+            QMessageBox.warning(self, "错误", f"读取历史记录 {history_position + 1} 失败。")
+            self.viewing_history_index = None
+            self.update_ui_state(False)
+            return
+
         video_field = history_entry.get("video", "")
         if not video_field.startswith("videos/"):
-            QMessageBox.warning(self, "错误", f"历史记录 {self.viewing_history_index + 1} 视频格式错误。")
+            QMessageBox.warning(self, "错误", f"历史记录 {history_position + 1} 视频格式错误。")
             self.viewing_history_index = None
             self.update_ui_state(False)
             return
         video_name = video_field[7:]
 
-        input_folder_index = -1
-        for i, folder in enumerate(self.folders):
-            if video_name in os.listdir(folder):
-                input_folder_index = i
-                break
-
+        input_folder_index = self.file_handler.find_folder_index(video_name)
         if input_folder_index == -1:
             QMessageBox.warning(self, "错误", f"未在输入文件夹中找到与历史记录视频 '{video_name}' 匹配的文件。")
             self.viewing_history_index = None
             self.update_ui_state(False)
             return
 
+        self.viewing_history_index = history_position
         self.load_folder(input_folder_index, history_entry=history_entry)
 
     def return_to_current_folder(self):
@@ -1194,12 +1418,13 @@ class MainWindow(QMainWindow):
         finally:
             self.is_handling_annotation = False
             
-    def update_annotation_list_from_manager(self, annotations):
-        """从标注管理器更新标注列表UI和内部状态"""
-        self.annotations = annotations
-        self.update_annotation_list()
+    def handle_annotation_changed(self):
+        """标注变更后更新按钮状态和当前时刻的高亮（列表本身由模型按行更新）"""
         self.mark_data_modified()
-        self.update_ui_state(bool(self.current_video_path))
+        has_annotations = bool(self.current_video_path) and self.annotation_manager.count() > 0
+        self.edit_annotation_button.setEnabled(has_annotations)
+        self.delete_annotation_button.setEnabled(has_annotations)
+        self.highlight_current_segments(self.video_player.get_current_time_ms())
 
     def add_annotation(self):
         """手动添加标注"""
@@ -1225,21 +1450,20 @@ class MainWindow(QMainWindow):
         if was_playing:
              self.video_player.play_video()
 
-    def edit_annotation(self, item):
+    def edit_annotation(self, model_index):
         """编辑标注项"""
-        index = self.annotation_list.row(item)
-        self._edit_annotation_at_index(index)
+        self._edit_annotation_at_index(model_index.row())
 
     def edit_selected_annotation(self):
         """编辑选中的标注"""
-        items = self.annotation_list.selectedItems()
-        if items:
-            index = self.annotation_list.row(items[0])
-            self._edit_annotation_at_index(index)
+        rows = self.annotation_list.selectionModel().selectedRows()
+        if rows:
+            self._edit_annotation_at_index(rows[0].row())
 
     def _edit_annotation_at_index(self, index):
         """实际执行编辑标注的逻辑"""
-        if index < 0 or index >= len(self.annotations):
+        annotation = self.annotation_manager.get_annotation(index)
+        if annotation is None:
              return
 
         was_playing = False
@@ -1247,7 +1471,6 @@ class MainWindow(QMainWindow):
              was_playing = True
              self.video_player.pause_video()
 
-        annotation = self.annotations[index]
         dialog = AnnotationDialog(
             annotation["start_time"],
             annotation["end_time"],
@@ -1271,12 +1494,12 @@ class MainWindow(QMainWindow):
 
     def delete_annotation(self):
         """删除标注"""
-        items = self.annotation_list.selectedItems()
-        if not items:
+        rows = self.annotation_list.selectionModel().selectedRows()
+        if not rows:
             return
             
-        index = self.annotation_list.row(items[0])
-        if index < 0 or index >= len(self.annotations):
+        index = rows[0].row()
+        if index < 0 or index >= self.annotation_manager.count():
             return
             
         reply = QMessageBox.question(self, "确认删除", 
@@ -1285,18 +1508,16 @@ class MainWindow(QMainWindow):
         if reply == QMessageBox.Yes:
             self.annotation_manager.delete_annotation(index)
     
-    def update_annotation_list(self):
-        """更新标注列表UI"""
-        self.annotation_list.clear()
-        for annotation in self.annotations:
-            start_time = annotation.get("start_time", "??:??:??")
-            end_time = annotation.get("end_time", "??:??:??")
-            label = annotation.get("label", "")
-            
-            item_text = f"【{start_time} → {end_time}】 : {label}"
-            item = QListWidgetItem(item_text)
-            item.setToolTip(f"开始: {start_time}\n结束: {end_time}\n标签: {label}")
-            self.annotation_list.addItem(item)
+    def select_annotation_row(self, row):
+        """在标注列表中选中并滚动到指定行"""
+        index = self.annotation_list_model.index(row)
+        self.annotation_list.setCurrentIndex(index)
+        self.annotation_list.scrollTo(index)
+
+    def highlight_current_segments(self, time_ms):
+        """高亮覆盖当前播放时刻的标注片段，只更新状态发生变化的行"""
+        rows = self.annotation_manager.segments_at(time_ms) if self.video_player.cap else []
+        self.annotation_list_model.set_highlighted_rows(rows)
     
     def generate_annotation_data(self):
         """生成标注数据（调用API填充AI结果，不保存）"""
@@ -1321,7 +1542,7 @@ class MainWindow(QMainWindow):
 
         formatted_annotations = "\n".join([
             f"{a['start_time']}-{a['end_time']}: {a['label']}" 
-            for a in self.annotations
+            for a in self.annotation_manager.get_annotations()
         ])
         
         description_parts = []
@@ -1336,7 +1557,9 @@ class MainWindow(QMainWindow):
             self.statusBar.showMessage("正在调用AI分析...")
             QApplication.processEvents()
             
-            api_response = self.api_handler.call_api(api_input_description, final_diagnosis, self)
+            segments = [(segment.start_ms, segment.end_ms) for segment in self.annotation_manager.get_segments()]
+            api_response = self.api_handler.call_api(api_input_description, final_diagnosis, self,
+                                                     video_path=self.current_video_path, segments=segments)
             
             self.thinking_chain_edit.setPlainText(api_response.get("reasoning", ""))
             self.ai_answer_edit.setPlainText(api_response.get("answer", ""))
@@ -1357,9 +1580,14 @@ class MainWindow(QMainWindow):
         dialog = OutputFolderDialog(self.file_handler.output_folder, self)
         if dialog.exec_() == QDialog.Accepted:
             selected_folder = dialog.get_selected_folder()
-            if dialog.save_settings(selected_folder):
+            selected_backend = dialog.get_selected_backend()
+            if dialog.save_settings(selected_folder, selected_backend):
                 self.file_handler.output_folder = selected_folder
-                QMessageBox.information(self, "设置成功", f"输出文件夹已设置为: {selected_folder}")
+                message = f"输出文件夹已设置为: {selected_folder}"
+                if selected_backend != self.file_handler.storage_backend:
+                    self.file_handler.storage_backend = selected_backend
+                    message += "\n工作存储的更改将在下次导入数据文件夹时生效。"
+                QMessageBox.information(self, "设置成功", message)
                 try:
                     os.makedirs(selected_folder, exist_ok=True)
                 except Exception as e:
@@ -0,0 +1,277 @@
+import os
+import sys
+import json
+import time
+from contextlib import contextmanager
+from .history_store import JsonlHistoryIndex
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+MERGE_THRESHOLD = 200  # 追加日志超过该条数时合并回主文件
+LOCK_TIMEOUT = 30  # 等待写锁的最长秒数（Windows 下轮询）
+
+
+@contextmanager
+def file_lock(lock_path, timeout=LOCK_TIMEOUT):
+    """
+    跨进程的排他咨询锁。POSIX 使用 fcntl.flock（NFS 上由 lockd 支持），
+    Windows 使用 msvcrt.locking 轮询加锁。锁随文件描述符关闭而释放，进程崩溃不会留下死锁。
+    """
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            deadline = time.time() + timeout
+            while True:
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    if time.time() > deadline:
+                        raise TimeoutError(f"等待写锁超时: {lock_path}")
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+
+class JsonlOutputStore:
+    """
+    可供多个进程（多台工作站）同时写入的 JSONL 标注输出。
+
+    保存时在写锁内向 <jsonl>.log 追加一行，不再重写整个文件；同一视频多次保存时以最后一行为准
+    （与 JsonlHistoryIndex 的规则相同，读取时把主文件和日志一起传给它即可）。
+    id 在写锁内分配：已保存过的视频沿用原 id，新视频取当前最大 id + 1，因此单调递增且不会冲突。
+    日志超过 MERGE_THRESHOLD 条时在写锁内合并回主文件（每个视频只保留最新一条，按 id 排序），
+    导出数据前也可以调用 merge() 得到完整的主文件。
+
+    为了不在每次保存时重新扫描整个文件，视频 -> id 的对照表只增量读取文件新增的部分，
+    主文件被合并替换时才完整重建。
+    """
+
+    def __init__(self, jsonl_path, merge_threshold=MERGE_THRESHOLD):
+        self.jsonl_path = jsonl_path
+        self.log_path = jsonl_path + ".log"
+        self.lock_path = jsonl_path + ".lock"
+        self.merge_threshold = merge_threshold
+        self._reset_index()
+
+    def _reset_index(self):
+        self._ids_by_video = {}
+        self._max_id = 0
+        self._log_count = 0
+        self._positions = {}  # 文件路径 -> (inode, 已读取的字节数)
+
+    def paths(self):
+        """读取完整数据时需要依次读取的文件（后者覆盖前者）"""
+        return [self.jsonl_path, self.log_path]
+
+    def exists(self):
+        return any(os.path.exists(path) for path in self.paths())
+
+    def history_index(self):
+        """读取主文件和日志的历史记录索引"""
+        return JsonlHistoryIndex(self.paths())
+
+    @contextmanager
+    def locked(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.jsonl_path)), exist_ok=True)
+        with file_lock(self.lock_path):
+            yield
+
+    def _catch_up(self):
+        """读取自上次以来文件新增的行，更新对照表。文件被替换或截短时完整重建"""
+        stats = {}
+        for path in self.paths():
+            try:
+                stats[path] = os.stat(path)
+            except OSError:
+                stats[path] = None
+        for path, stat in stats.items():
+            position = self._positions.get(path)
+            if position is None:
+                continue
+            inode, offset = position
+            if stat is None or stat.st_ino != inode or stat.st_size < offset:
+                self._reset_index()
+                break
+
+        for path in self.paths():
+            stat = stats[path]
+            if stat is None:
+                continue
+            inode, offset = self._positions.get(path, (stat.st_ino, 0))
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                for line in iter(f.readline, b''):
+                    if not line.endswith(b"\n"):
+                        break  # 不完整的行（写入者崩溃留下的），下次从这里重读
+                    offset += len(line)
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._index_entry(entry, path == self.log_path)
+            self._positions[path] = (inode, offset)
+
+    def _index_entry(self, entry, from_log):
+        entry_id = entry.get("id")
+        if isinstance(entry_id, int):
+            self._ids_by_video.setdefault(entry.get("video", ""), entry_id)
+            self._max_id = max(self._max_id, entry_id)
+        if from_log:
+            self._log_count += 1
+
+    def save(self, entry):
+        """
+        保存（新增或更新）一个条目，写入 id 后追加到日志
+
+        Returns:
+            int: 条目的 id
+        """
+        with self.locked():
+            self._catch_up()
+            video = entry.get("video", "")
+            entry["id"] = self._ids_by_video.get(video) or self._max_id + 1
+            data = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+            with open(self.log_path, 'ab+') as f:
+                # 上一个写入者崩溃留下不完整的行时先补一个换行，避免本条拼接在残行后面而无法解析
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        data = b"\n" + data
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if self._log_count + 1 >= self.merge_threshold:
+                self._merge_locked()
+            return entry["id"]
+
+    def merge(self):
+        """把日志合并回主文件"""
+        with self.locked():
+            self._merge_locked()
+
+    def _merge_locked(self):
+        if not os.path.exists(self.log_path):
+            return
+        latest_by_video = {}
+        order = 0
+        for path in self.paths():
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as f:
+                for line in f:
+                    if not line.strip() or not line.endswith(b"\n"):
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError as e:
+                        print(f"合并时跳过无法解析的行 ({path}): {e}")
+                        continue
+                    latest_by_video[entry.get("video", "")] = (order, entry)
+                    order += 1
+
+        ordered = sorted(latest_by_video.values(),
+                         key=lambda item: (not isinstance(item[1].get("id"), int), item[1].get("id") or 0, item[0]))
+        tmp_path = self.jsonl_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for _, entry in ordered:
+                f.write(json.dumps(entry, ensure_ascii=False))
+                f.write("\n")
+            f.flush()
+            os.fsync(f.fileno())
+        # 先替换主文件再删除日志：中间被读取时只会多读到重复的条目，不会丢失
+        os.replace(tmp_path, self.jsonl_path)
+        os.remove(self.log_path)
+        self._reset_index()
+
+
+def merge_pending_log(jsonl_path):
+    """导出前调用：存在未合并的日志时合并到主文件"""
+    store = JsonlOutputStore(jsonl_path)
+    if os.path.exists(store.log_path):
+        store.merge()
+
+
+def _stress_writer(args):
+    """压力测试的写入进程：保存若干新视频，并反复更新共享的几个视频"""
+    jsonl_path, writer, saves, shared = args
+    store = JsonlOutputStore(jsonl_path)
+    ids = {}
+    for i in range(saves):
+        video = f"videos/shared_{i % shared}.mp4" if i % 4 == 0 else f"videos/w{writer}_{i}.mp4"
+        ids[video] = store.save({"video": video, "writer": writer, "seq": i})
+    return ids
+
+
+def run_stress_test(jsonl_path, writers=8, saves=200, shared=5):
+    """
+    多进程压力测试：writers 个进程同时保存，检查没有条目丢失、id 不重复、同一视频 id 不变
+
+    Returns:
+        bool: 检查是否全部通过
+    """
+    from .video_metadata import create_process_pool
+    for path in JsonlOutputStore(jsonl_path).paths():
+        if os.path.exists(path):
+            os.remove(path)
+
+    started = time.time()
+    with create_process_pool(writers) as executor:
+        results = list(executor.map(_stress_writer, [(jsonl_path, w, saves, shared) for w in range(writers)]))
+    elapsed = time.time() - started
+    merge_pending_log(jsonl_path)
+
+    with open(jsonl_path, 'r', encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    expected_videos = {video for ids in results for video in ids}
+    ids_by_video = {}
+    problems = []
+    for ids in results:
+        for video, entry_id in ids.items():
+            if ids_by_video.setdefault(video, entry_id) != entry_id:
+                problems.append(f"同一视频得到不同 id: {video}")
+    saved_videos = [entry["video"] for entry in entries]
+    if set(saved_videos) != expected_videos:
+        problems.append(f"条目丢失: 期望 {len(expected_videos)} 个视频，实际 {len(set(saved_videos))} 个")
+    if len(saved_videos) != len(set(saved_videos)):
+        problems.append("合并后仍有重复视频")
+    entry_ids = [entry["id"] for entry in entries]
+    if len(entry_ids) != len(set(entry_ids)):
+        problems.append("id 重复")
+    if entry_ids != sorted(entry_ids):
+        problems.append("合并后未按 id 排序")
+
+    total = writers * saves
+    print(f"{writers} 个进程共保存 {total} 次，用时 {elapsed:.2f} 秒（{total / elapsed:.0f} 次/秒），"
+          f"合并后 {len(entries)} 条")
+    for problem in problems:
+        print(f"失败: {problem}")
+    if not problems:
+        print("检查通过: 无丢失、id 唯一且稳定")
+    return not problems
+
+
+if __name__ == "__main__":
+    # 多进程并发写入压力测试: python -m modules.output_store [JSONL路径] [进程数] [每个进程的保存次数]
+    import tempfile
+    target = sys.argv[1] if len(sys.argv) > 1 else os.path.join(tempfile.mkdtemp(), "stress.jsonl")
+    writer_count = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    save_count = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    sys.exit(0 if run_stress_test(target, writer_count, save_count) else 1)
@@ -0,0 +1,153 @@
+import os
+import json
+import bisect
+import hashlib
+
+UNKNOWN_PTS = -1
+
+
+class PtsIndex:
+    """
+    单个视频的 帧号 -> 显示时间戳(PTS, 毫秒) 对照表。
+
+    表在正常播放和跳转时顺带记录解码器给出的时间戳，不需要额外的解码过程；
+    尚未记录的帧按相邻已知帧和帧率插值估计。可变帧率视频记录完整后，
+    时间与帧号之间的换算即与解码器完全一致。
+    """
+
+    def __init__(self, frame_count, fps, pts=None, keyframes=None):
+        self.frame_count = max(0, int(frame_count))
+        self.fps = fps if fps and fps > 0 else 25.0
+        self.pts = list(pts) if pts else [UNKNOWN_PTS] * self.frame_count
+        if len(self.pts) < self.frame_count:
+            self.pts.extend([UNKNOWN_PTS] * (self.frame_count - len(self.pts)))
+        self.known_count = sum(1 for value in self.pts if value != UNKNOWN_PTS)
+        self._known_frames = None  # 已知帧号的有序列表，查询时按需重建
+        self.keyframes = list(keyframes) if keyframes is not None else None  # 关键帧帧号，None 表示尚未获取
+        self.dirty = False
+
+    def record(self, frame_index, pts_ms):
+        """记录解码得到的时间戳"""
+        if pts_ms is None or pts_ms < 0:
+            return
+        if frame_index >= len(self.pts):
+            self.pts.extend([UNKNOWN_PTS] * (frame_index + 1 - len(self.pts)))
+            self.frame_count = len(self.pts)
+        if frame_index < 0:
+            return
+        pts_ms = int(round(pts_ms))
+        if self.pts[frame_index] == pts_ms:
+            return
+        if self.pts[frame_index] == UNKNOWN_PTS:
+            self.known_count += 1
+        self.pts[frame_index] = pts_ms
+        self._known_frames = None
+        self.dirty = True
+
+    def set_keyframes(self, keyframes):
+        """记录关键帧帧号（升序）"""
+        keyframes = sorted(set(int(frame) for frame in keyframes))
+        if keyframes != self.keyframes:
+            self.keyframes = keyframes
+            self.dirty = True
+
+    def keyframes_from_times(self, times):
+        """
+        把关键帧时间（秒，如 ffprobe 输出）换算为帧号。
+        第一个关键帧即第一帧，以它为零点消除容器起始时间的偏移。
+        """
+        if not times:
+            return []
+        origin = times[0]
+        # 多查 1 毫秒，避免时间舍入后落到前一帧
+        return [self.frame_for_time(int(round((t - origin) * 1000)) + 1) for t in times]
+
+    def is_complete(self):
+        return self.frame_count > 0 and self.known_count >= self.frame_count
+
+    def _known(self):
+        if self._known_frames is None:
+            self._known_frames = [i for i, value in enumerate(self.pts) if value != UNKNOWN_PTS]
+        return self._known_frames
+
+    def time_for_frame(self, frame_index):
+        """帧号 -> 毫秒。未记录的帧从最近的已知帧按帧率推算"""
+        if 0 <= frame_index < len(self.pts) and self.pts[frame_index] != UNKNOWN_PTS:
+            return self.pts[frame_index]
+        known = self._known()
+        if not known:
+            return int(round(frame_index * 1000 / self.fps))
+        i = bisect.bisect_left(known, frame_index)
+        if i == 0:
+            anchor = known[0]
+        elif i == len(known):
+            anchor = known[-1]
+        else:
+            before, after = known[i - 1], known[i]
+            # 两侧都有已知帧时线性插值
+            t0, t1 = self.pts[before], self.pts[after]
+            return int(round(t0 + (t1 - t0) * (frame_index - before) / (after - before)))
+        return int(round(self.pts[anchor] + (frame_index - anchor) * 1000 / self.fps))
+
+    def frame_for_time(self, time_ms):
+        """毫秒 -> 显示该时刻画面的帧号（时间戳不大于 time_ms 的最后一帧）"""
+        if self.frame_count <= 0:
+            return 0
+        low, high = 0, self.frame_count - 1
+        # time_for_frame 单调递增，二分查找
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.time_for_frame(mid) <= time_ms:
+                low = mid
+            else:
+                high = mid - 1
+        return low
+
+    def duration_ms(self):
+        """视频总时长：最后一帧时间戳加一帧的时长"""
+        if self.frame_count <= 0:
+            return 0
+        return self.time_for_frame(self.frame_count - 1) + int(round(1000 / self.fps))
+
+
+class PtsIndexCache:
+    """PTS 对照表的磁盘缓存，每个视频一个文件，视频大小或修改时间变化后失效"""
+
+    def __init__(self, cache_folder):
+        self.cache_folder = cache_folder
+
+    def _cache_path(self, video_path):
+        key = hashlib.sha1(os.path.normcase(os.path.abspath(video_path)).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_folder, f"{key}.json")
+
+    @staticmethod
+    def _signature(video_path):
+        stat = os.stat(video_path)
+        return [stat.st_size, stat.st_mtime]
+
+    def load(self, video_path, frame_count, fps):
+        """读取缓存的对照表，没有或已失效时返回空表"""
+        try:
+            with open(self._cache_path(video_path), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("signature") == self._signature(video_path):
+                return PtsIndex(max(frame_count, len(data["pts"])), fps, data["pts"], data.get("keyframes"))
+        except (OSError, ValueError, KeyError):
+            pass
+        return PtsIndex(frame_count, fps)
+
+    def save(self, video_path, index):
+        """有新记录时写回缓存"""
+        if not index.dirty:
+            return
+        try:
+            os.makedirs(self.cache_folder, exist_ok=True)
+            path = self._cache_path(video_path)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"signature": self._signature(video_path), "pts": index.pts,
+                           "keyframes": index.keyframes}, f)
+            os.replace(tmp_path, path)
+            index.dirty = False
+        except OSError as e:
+            print(f"保存PTS对照表失败: {e}")
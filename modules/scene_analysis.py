@@ -0,0 +1,232 @@
+import os
+import json
+import bisect
+import hashlib
+import cv2
+import numpy as np
+from .video_metadata import run_in_process_pool
+
+ANALYSIS_VERSION = 1  # 分析算法或参数变化时递增，使旧缓存失效
+SAMPLE_FPS = 5.0  # 每秒分析的帧数，其余帧只 grab() 不转换
+SAMPLE_WIDTH = 96  # 分析用缩略帧的宽度
+CHUNK_FRAMES = 256  # 每批向量化计算的缩略帧数，限制内存占用
+HIST_LEVELS = 4  # 每个颜色通道的量化级数，共 4x4x4=64 个颜色格
+SHOT_THRESHOLD = 0.3  # 颜色直方图差异比附近中位数高出该值时视为镜头切换
+MIN_MOTION_CONTRAST = 0.01  # 运动强度的高低分位差小于该值时不划分运动/静止
+MIN_SEGMENT_MS = 2000  # 建议片段的最短时长
+
+
+def frame_metrics(frames, previous=None):
+    """
+    计算一批缩略帧与各自前一帧之间的差异（全部为向量化运算）
+
+    Args:
+        frames: (N, h, w, 3) uint8 BGR 缩略帧
+        previous: 上一批的最后一帧，没有时第一帧的差异为 0
+
+    Returns:
+        tuple: (运动强度, 颜色直方图差异)，均为长度 N 的 float32 数组，取值 0~1
+    """
+    first = previous[None] if previous is not None else frames[:1]
+    stack = np.concatenate([first, frames])
+    count, height, width = stack.shape[:3]
+
+    # 运动强度：相邻两帧灰度绝对差的均值
+    gray = stack.astype(np.float32) @ np.array([0.114, 0.587, 0.299], np.float32)
+    motion = np.abs(np.diff(gray, axis=0)).mean(axis=(1, 2)) / 255.0
+
+    # 颜色直方图：把每个像素量化到 64 个颜色格，加上帧偏移后一次 bincount 得到所有帧的直方图
+    shift = 8 - int(np.log2(HIST_LEVELS))
+    quantized = (stack >> shift).astype(np.int32)
+    bins = HIST_LEVELS ** 3
+    cells = quantized[..., 0] * HIST_LEVELS * HIST_LEVELS + quantized[..., 1] * HIST_LEVELS + quantized[..., 2]
+    cells += (np.arange(count, dtype=np.int32) * bins)[:, None, None]
+    hist = np.bincount(cells.ravel(), minlength=count * bins).reshape(count, bins) / float(height * width)
+    # 总变差距离，0 表示颜色分布相同，1 表示完全不重叠
+    hist_diff = 0.5 * np.abs(np.diff(hist, axis=0)).sum(axis=1)
+    return motion.astype(np.float32), hist_diff.astype(np.float32)
+
+
+def _local_median(values, radius):
+    """滑动窗口中位数（窗口为 2*radius+1，边缘按端点值延伸）"""
+    padded = np.pad(values, radius, mode="edge")
+    return np.median(np.lib.stride_tricks.sliding_window_view(padded, 2 * radius + 1), axis=1)
+
+
+def detect_shots(hist_diff):
+    """返回镜头切换所在的采样序号：差异明显高于附近且是局部最大值"""
+    if len(hist_diff) < 3:
+        return np.array([], dtype=np.int64)
+    score = hist_diff - _local_median(hist_diff, int(SAMPLE_FPS * 2))
+    peaks = np.r_[False, (score[1:-1] >= score[:-2]) & (score[1:-1] >= score[2:]), False]
+    return np.flatnonzero((score > SHOT_THRESHOLD) & peaks)
+
+
+def detect_motion_changes(motion):
+    """
+    返回运动/静止状态切换所在的采样序号，以及每个采样是否处于运动状态。
+    运动强度先按约 1 秒平滑，阈值取高低分位数的中点。
+    """
+    if len(motion) < 3:
+        return np.array([], dtype=np.int64), np.zeros(len(motion), dtype=bool)
+    window = max(1, int(SAMPLE_FPS))
+    smoothed = np.convolve(motion, np.ones(window) / window, mode="same")
+    low, high = np.percentile(smoothed, [20, 80])
+    if high - low < MIN_MOTION_CONTRAST:
+        return np.array([], dtype=np.int64), np.zeros(len(motion), dtype=bool)
+    active = smoothed > (low + high) / 2
+    return np.flatnonzero(np.diff(active.astype(np.int8))) + 1, active
+
+
+def suggest_segments(times_ms, shots, motion_changes, active, duration_ms):
+    """
+    由镜头切换和运动变化点生成建议片段。先放入镜头切换，再放入与已有边界
+    相距不少于 MIN_SEGMENT_MS 的运动变化点；片段按其中处于运动状态的采样比例
+    标为“运动”或“静止”。
+
+    Returns:
+        list: [{'start_ms', 'end_ms', 'label'}]，没有找到任何边界时为空列表
+    """
+    times_ms = np.asarray(times_ms)
+    boundaries = [0, int(duration_ms)]
+    for time_ms in [int(times_ms[i]) for i in shots] + [int(times_ms[i]) for i in motion_changes]:
+        position = bisect.bisect_left(boundaries, time_ms)
+        if (time_ms - boundaries[position - 1] >= MIN_SEGMENT_MS and
+                boundaries[position] - time_ms >= MIN_SEGMENT_MS):
+            boundaries.insert(position, time_ms)
+    if len(boundaries) <= 2:
+        return []
+
+    suggestions = []
+    for start_ms, end_ms in zip(boundaries[:-1], boundaries[1:]):
+        inside = (times_ms >= start_ms) & (times_ms < end_ms)
+        label = "运动" if inside.any() and active[inside].mean() > 0.5 else "静止"
+        suggestions.append({"start_ms": start_ms, "end_ms": end_ms, "label": label})
+    return suggestions
+
+
+def analyze_video(video_path):
+    """
+    分析单个视频的镜头切换和运动变化。该函数会在子进程中执行，因此必须是模块级函数。
+
+    以约 SAMPLE_FPS 的频率取帧并缩小到 SAMPLE_WIDTH 宽，按批计算逐帧指标。
+
+    Returns:
+        dict: 分析结果，ok 为 False 时 error 字段说明原因
+    """
+    result = {"path": video_path, "version": ANALYSIS_VERSION, "ok": False, "error": "",
+              "times_ms": [], "motion": [], "hist_diff": [], "shots": [], "suggestions": []}
+    try:
+        stat = os.stat(video_path)
+        result["size"] = stat.st_size
+        result["mtime"] = stat.st_mtime
+    except OSError as e:
+        result["error"] = f"无法访问文件: {e}"
+        return result
+
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            result["error"] = "无法打开视频"
+            return result
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        step = max(1, int(round(fps / SAMPLE_FPS))) if fps > 0 else 1
+
+        times_ms, motion, hist_diff = [], [], []
+        batch, previous, size = [], None, None
+        last_time_ms = 0.0
+        finished = False
+        while not finished:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            last_time_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+            if size is None:
+                height, width = frame.shape[:2]
+                size = (SAMPLE_WIDTH, max(1, int(round(height * SAMPLE_WIDTH / width))))
+            times_ms.append(int(round(last_time_ms)))
+            batch.append(cv2.resize(frame, size, interpolation=cv2.INTER_AREA))
+            for _ in range(step - 1):
+                if not cap.grab():
+                    finished = True
+                    break
+                last_time_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+            if len(batch) >= CHUNK_FRAMES:
+                frames = np.stack(batch)
+                chunk_motion, chunk_diff = frame_metrics(frames, previous)
+                motion.extend(chunk_motion.tolist())
+                hist_diff.extend(chunk_diff.tolist())
+                previous = frames[-1]
+                batch = []
+        if batch:
+            frames = np.stack(batch)
+            chunk_motion, chunk_diff = frame_metrics(frames, previous)
+            motion.extend(chunk_motion.tolist())
+            hist_diff.extend(chunk_diff.tolist())
+
+        if not times_ms:
+            result["error"] = "无法解码视频帧"
+            return result
+
+        motion = np.array(motion, dtype=np.float32)
+        hist_diff = np.array(hist_diff, dtype=np.float32)
+        shots = detect_shots(hist_diff)
+        motion_changes, active = detect_motion_changes(motion)
+        duration_ms = int(round(last_time_ms + (1000.0 / fps if fps > 0 else 0)))
+
+        result["times_ms"] = times_ms
+        result["motion"] = [round(float(value), 4) for value in motion]
+        result["hist_diff"] = [round(float(value), 4) for value in hist_diff]
+        result["shots"] = [times_ms[i] for i in shots]
+        result["suggestions"] = suggest_segments(times_ms, shots, motion_changes, active, duration_ms)
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = f"分析视频时出错: {e}"
+    finally:
+        cap.release()
+    return result
+
+
+def analyze_videos(video_paths, max_workers=None, progress_callback=None, should_stop=None):
+    """使用进程池批量分析视频，参数含义同 run_in_process_pool"""
+    return run_in_process_pool(analyze_video, video_paths, max_workers, progress_callback, should_stop)
+
+
+class SceneAnalysisCache:
+    """镜头/运动分析结果的磁盘缓存，每个视频一个文件，视频大小或修改时间变化后失效"""
+
+    def __init__(self, cache_folder):
+        self.cache_folder = cache_folder
+
+    def _cache_path(self, video_path):
+        key = hashlib.sha1(os.path.normcase(os.path.abspath(video_path)).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_folder, f"{key}.json")
+
+    def load(self, video_path):
+        """读取仍然有效的分析结果，不存在或已过期时返回 None"""
+        try:
+            with open(self._cache_path(video_path), 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            stat = os.stat(video_path)
+        except (OSError, ValueError):
+            return None
+        if (result.get("version") != ANALYSIS_VERSION or result.get("size") != stat.st_size
+                or result.get("mtime") != stat.st_mtime):
+            return None
+        return result
+
+    def save(self, result):
+        """原子地写入一条分析结果"""
+        try:
+            os.makedirs(self.cache_folder, exist_ok=True)
+            path = self._cache_path(result["path"])
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"保存镜头分析结果失败: {e}")
+
+    def missing(self, video_paths):
+        """返回尚未分析或结果已过期的视频路径"""
+        return [path for path in video_paths if self.load(path) is None]
@@ -0,0 +1,245 @@
+import zlib
+import numpy as np
+from PyQt5.QtCore import Qt, QRect, QRectF, QPointF, pyqtSignal
+from PyQt5.QtGui import QPainter, QPicture, QColor, QPen, QPolygonF
+from PyQt5.QtWidgets import QWidget, QToolTip, QMenu
+from .annotation_format import format_time_ms
+
+
+class SegmentTimeline(QWidget):
+    """
+    进度条下方的片段时间轴。所有片段以彩色区间绘制到缓存的 QPicture 中，
+    只有片段变化或控件尺寸变化时才重新录制；播放位置变化只重绘播放头附近的窄条。
+    点击片段跳转到片段开始位置，点击空白处跳转到对应时间。
+
+    有镜头/运动分析结果时，背景绘制运动强度曲线，并用虚线标出建议片段的边界；
+    右键可采纳鼠标位置的建议片段。
+    """
+
+    seek_requested = pyqtSignal(int)  # 请求跳转信号（毫秒）
+    segment_clicked = pyqtSignal(int)  # 片段点击信号（标注行号）
+    suggestion_accepted = pyqtSignal(int)  # 采纳建议片段信号（建议片段序号）
+
+    MARGIN = 9  # 与进度条滑块半宽一致，使时间轴与进度条对齐
+    MAX_LANES = 3  # 重叠片段最多分几行显示
+    MIN_SPAN_WIDTH = 2
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.manager = None
+        self.duration_ms = 0
+        self.position_ms = 0
+        self.lanes = {}  # 标注行号 -> 显示行
+        self.curve_times = None  # 运动强度曲线的采样时间（毫秒）
+        self.curve_values = None  # 归一化到 0~1 的运动强度
+        self.lane_count = 1
+        self._picture = None
+        self._picture_size = None
+        self.setFixedHeight(18)
+        self.setMouseTracking(True)
+        self.setCursor(Qt.PointingHandCursor)
+
+    def set_annotation_manager(self, manager):
+        """关联标注管理器，片段变化时标记缓存失效"""
+        if self.manager is not None:
+            for signal in (self.manager.segment_inserted, self.manager.segment_updated,
+                           self.manager.segment_removed):
+                signal.disconnect(self._on_segments_changed)
+            self.manager.segments_reset.disconnect(self.invalidate)
+            self.manager.suggestions_changed.disconnect(self.invalidate)
+        self.manager = manager
+        if manager is not None:
+            for signal in (manager.segment_inserted, manager.segment_updated, manager.segment_removed):
+                signal.connect(self._on_segments_changed)
+            manager.segments_reset.connect(self.invalidate)
+            manager.suggestions_changed.connect(self.invalidate)
+        self.invalidate()
+
+    def set_motion_curve(self, times_ms, values):
+        """设置运动强度曲线，传入空列表时清除"""
+        if times_ms is None or len(times_ms) == 0 or len(times_ms) != len(values):
+            self.curve_times = self.curve_values = None
+        else:
+            values = np.asarray(values, dtype=np.float32)
+            # 按 99 分位数归一化，个别剧烈变化的帧不会把整条曲线压平
+            scale = float(np.percentile(values, 99)) or float(values.max()) or 1.0
+            self.curve_times = np.asarray(times_ms, dtype=np.float64)
+            self.curve_values = np.clip(values / scale, 0.0, 1.0)
+        self.invalidate()
+
+    def set_duration(self, duration_ms):
+        self.duration_ms = max(0, int(duration_ms))
+        self.position_ms = 0
+        self.invalidate()
+
+    def set_position(self, position_ms):
+        """移动播放头，只重绘新旧位置附近的区域"""
+        old_x = self._x_for_ms(self.position_ms)
+        self.position_ms = position_ms
+        new_x = self._x_for_ms(position_ms)
+        if old_x != new_x:
+            self.update(QRect(old_x - 2, 0, 5, self.height()))
+            self.update(QRect(new_x - 2, 0, 5, self.height()))
+
+    def _on_segments_changed(self, row):
+        self.invalidate()
+
+    def invalidate(self):
+        """片段或时长变化，下次绘制时重新录制 QPicture"""
+        self._picture = None
+        self.update()
+
+    def _usable_width(self):
+        return max(1, self.width() - 2 * self.MARGIN)
+
+    def _x_for_ms(self, time_ms):
+        if self.duration_ms <= 0:
+            return self.MARGIN
+        return self.MARGIN + int(round(time_ms * self._usable_width() / self.duration_ms))
+
+    def _ms_for_x(self, x):
+        if self.duration_ms <= 0:
+            return 0
+        ratio = (x - self.MARGIN) / self._usable_width()
+        return int(round(min(1.0, max(0.0, ratio)) * self.duration_ms))
+
+    @staticmethod
+    def color_for_label(label):
+        """同一标签始终使用同一颜色"""
+        hue = zlib.crc32(label.encode("utf-8")) % 360
+        return QColor.fromHsv(hue, 160, 220)
+
+    def _assign_lanes(self, segments):
+        """按开始时间贪心分配显示行，重叠的片段放到不同的行"""
+        lane_ends = []
+        lanes = {}
+        for row, segment in enumerate(segments):
+            for lane, end_ms in enumerate(lane_ends):
+                if end_ms < segment.start_ms:
+                    lane_ends[lane] = segment.end_ms
+                    lanes[row] = lane
+                    break
+            else:
+                if len(lane_ends) < self.MAX_LANES:
+                    lanes[row] = len(lane_ends)
+                    lane_ends.append(segment.end_ms)
+                else:
+                    lane = min(range(len(lane_ends)), key=lambda i: lane_ends[i])
+                    lane_ends[lane] = max(lane_ends[lane], segment.end_ms)
+                    lanes[row] = lane
+        return lanes, max(1, len(lane_ends))
+
+    def _span_rect(self, row, segment):
+        lane_height = (self.height() - 2) / self.lane_count
+        x1 = self._x_for_ms(segment.start_ms)
+        x2 = max(x1 + self.MIN_SPAN_WIDTH, self._x_for_ms(segment.end_ms))
+        return QRectF(x1, 1 + self.lanes.get(row, 0) * lane_height, x2 - x1, lane_height - 1)
+
+    def _curve_polygon(self):
+        """运动强度曲线：每个像素列取该列内采样的最大值"""
+        width = self._usable_width()
+        columns = np.clip(((self.curve_times * width) / self.duration_ms).astype(np.int64), 0, width - 1)
+        peaks = np.zeros(width, dtype=np.float32)
+        np.maximum.at(peaks, columns, self.curve_values)
+        bottom = self.height()
+        polygon = QPolygonF()
+        polygon.append(QPointF(self.MARGIN, bottom))
+        for column, value in enumerate(peaks):
+            polygon.append(QPointF(self.MARGIN + column, bottom - value * (bottom - 2)))
+        polygon.append(QPointF(self.MARGIN + width - 1, bottom))
+        return polygon
+
+    def _record_picture(self):
+        segments = self.manager.get_segments() if self.manager is not None else []
+        self.lanes, self.lane_count = self._assign_lanes(segments)
+        picture = QPicture()
+        painter = QPainter(picture)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor("#e8e8e8"))
+        painter.drawRoundedRect(QRectF(self.MARGIN, 0, self._usable_width(), self.height()), 3, 3)
+        if self.duration_ms > 0 and self.curve_times is not None:
+            painter.setBrush(QColor(52, 152, 219, 90))
+            painter.drawPolygon(self._curve_polygon())
+        if self.duration_ms > 0:
+            for row, segment in enumerate(segments):
+                painter.setBrush(self.color_for_label(segment.label))
+                painter.drawRect(self._span_rect(row, segment))
+            suggestions = self.manager.get_suggestions() if self.manager is not None else []
+            if suggestions:
+                painter.setPen(QPen(QColor("#555555"), 1, Qt.DashLine))
+                for suggestion in suggestions[1:]:
+                    x = self._x_for_ms(suggestion.start_ms)
+                    painter.drawLine(x, 0, x, self.height())
+        painter.end()
+        self._picture = picture
+        self._picture_size = self.size()
+
+    def paintEvent(self, event):
+        if self._picture is None or self._picture_size != self.size():
+            self._record_picture()
+        painter = QPainter(self)
+        painter.drawPicture(0, 0, self._picture)
+        if self.duration_ms > 0:
+            x = self._x_for_ms(self.position_ms)
+            painter.setPen(QColor("#c0392b"))
+            painter.drawLine(x, 0, x, self.height())
+        painter.end()
+
+    def segment_row_at(self, pos):
+        """返回鼠标位置下的片段行号，没有时返回 -1"""
+        if self.manager is None or self.duration_ms <= 0:
+            return -1
+        if self._picture is None or self._picture_size != self.size():
+            self._record_picture()  # 保证显示行分配是最新的
+        # 片段可能比 1 像素还短，按 ±2 像素的时间范围查询区间树
+        tolerance = self._ms_for_x(pos.x() + 2) - self._ms_for_x(pos.x())
+        time_ms = self._ms_for_x(pos.x())
+        segments = self.manager.get_segments()
+        for row in self.manager.find_overlaps(time_ms - tolerance, time_ms + tolerance):
+            if self._span_rect(row, segments[row]).adjusted(-2, 0, 2, 0).contains(pos):
+                return row
+        return -1
+
+    def mousePressEvent(self, event):
+        if event.button() != Qt.LeftButton or self.duration_ms <= 0:
+            return super().mousePressEvent(event)
+        row = self.segment_row_at(event.pos())
+        if row >= 0:
+            self.segment_clicked.emit(row)
+            self.seek_requested.emit(self.manager.get_segments()[row].start_ms)
+        else:
+            self.seek_requested.emit(self._ms_for_x(event.pos().x()))
+
+    def mouseMoveEvent(self, event):
+        row = self.segment_row_at(event.pos())
+        if row >= 0:
+            segment = self.manager.get_segments()[row]
+            QToolTip.showText(event.globalPos(),
+                              f"{format_time_ms(segment.start_ms)} → {format_time_ms(segment.end_ms)}\n{segment.label}",
+                              self)
+        elif self.duration_ms > 0:
+            text = format_time_ms(self._ms_for_x(event.pos().x()))
+            suggestion = self.suggestion_at(event.pos())
+            if suggestion >= 0:
+                segment = self.manager.get_suggestions()[suggestion]
+                text += (f"\n建议片段({segment.label}): {format_time_ms(segment.start_ms)} → "
+                         f"{format_time_ms(segment.end_ms)}，右键采纳")
+            QToolTip.showText(event.globalPos(), text, self)
+        super().mouseMoveEvent(event)
+
+    def suggestion_at(self, pos):
+        """返回鼠标位置的建议片段序号，没有时返回 -1"""
+        if self.manager is None or self.duration_ms <= 0:
+            return -1
+        return self.manager.suggestion_at(self._ms_for_x(pos.x()))
+
+    def contextMenuEvent(self, event):
+        index = self.suggestion_at(event.pos())
+        if index < 0:
+            return super().contextMenuEvent(event)
+        segment = self.manager.get_suggestions()[index]
+        menu = QMenu(self)
+        accept_action = menu.addAction(
+            f"采纳建议片段 {format_time_ms(segment.start_ms)} → {format_time_ms(segment.end_ms)}")
+        if menu.exec_(event.globalPos()) == accept_action:
+            self.suggestion_accepted.emit(index)
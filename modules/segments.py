@@ -0,0 +1,136 @@
+from .annotation_format import parse_time_ms, format_time_ms
+
+
+class Segment:
+    """视频片段标注，时间以整数毫秒存储"""
+
+    __slots__ = ("start_ms", "end_ms", "label")
+
+    def __init__(self, start_ms, end_ms, label=""):
+        self.start_ms = int(start_ms)
+        self.end_ms = int(end_ms)
+        self.label = label
+
+    @classmethod
+    def from_annotation(cls, annotation):
+        """从 {'start_time', 'end_time', 'label'} 字典创建，时间无法解析时返回 None"""
+        start_ms = parse_time_ms(annotation.get("start_time"))
+        end_ms = parse_time_ms(annotation.get("end_time"))
+        if start_ms is None or end_ms is None:
+            return None
+        return cls(min(start_ms, end_ms), max(start_ms, end_ms), annotation.get("label", ""))
+
+    def to_annotation(self):
+        """转换为界面和保存使用的字符串时间字典"""
+        return {
+            "start_time": format_time_ms(self.start_ms),
+            "end_time": format_time_ms(self.end_ms),
+            "label": self.label
+        }
+
+    def sort_key(self):
+        return self.start_ms, self.end_ms
+
+    def covers(self, time_ms):
+        return self.start_ms <= time_ms <= self.end_ms
+
+    def overlaps(self, start_ms, end_ms):
+        return self.start_ms <= end_ms and start_ms <= self.end_ms
+
+    def __repr__(self):
+        return f"Segment({self.start_ms}, {self.end_ms}, {self.label!r})"
+
+
+class _IntervalNode:
+    __slots__ = ("center", "by_start", "by_end", "left", "right")
+
+
+class IntervalTree:
+    """
+    静态中心区间树（闭区间）。构建 O(n log n)，
+    查询覆盖某一时刻或与某一区间重叠的片段为 O(log n + k)。
+    片段变化后整体重建即可，几千个片段的重建只需几毫秒。
+    """
+
+    def __init__(self, intervals=()):
+        """
+        Args:
+            intervals: 可迭代的 (start_ms, end_ms, value) 三元组
+        """
+        items = [(int(start), int(end), value) for start, end, value in intervals]
+        self.size = len(items)
+        self.root = self._build(items)
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def _build(cls, items):
+        if not items:
+            return None
+        endpoints = sorted([item[0] for item in items] + [item[1] for item in items])
+        node = _IntervalNode()
+        node.center = endpoints[len(endpoints) // 2]
+        left, right, middle = [], [], []
+        for item in items:
+            if item[1] < node.center:
+                left.append(item)
+            elif item[0] > node.center:
+                right.append(item)
+            else:
+                middle.append(item)
+        node.by_start = sorted(middle, key=lambda item: item[0])
+        node.by_end = sorted(middle, key=lambda item: item[1], reverse=True)
+        node.left = cls._build(left)
+        node.right = cls._build(right)
+        return node
+
+    def at(self, time_ms):
+        """返回覆盖 time_ms 的所有区间的 value"""
+        result = []
+        node = self.root
+        while node is not None:
+            if time_ms < node.center:
+                for start, _, value in node.by_start:
+                    if start > time_ms:
+                        break
+                    result.append(value)
+                node = node.left
+            elif time_ms > node.center:
+                for _, end, value in node.by_end:
+                    if end < time_ms:
+                        break
+                    result.append(value)
+                node = node.right
+            else:
+                result.extend(value for _, _, value in node.by_start)
+                break
+        return result
+
+    def overlapping(self, start_ms, end_ms):
+        """返回与闭区间 [start_ms, end_ms] 重叠的所有区间的 value"""
+        result = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            if end_ms < node.center:
+                # 查询区间整体在中心点左侧：中心区间按开始时间筛选
+                for start, _, value in node.by_start:
+                    if start > end_ms:
+                        break
+                    result.append(value)
+                stack.append(node.left)
+            elif start_ms > node.center:
+                for _, end, value in node.by_end:
+                    if end < start_ms:
+                        break
+                    result.append(value)
+                stack.append(node.right)
+            else:
+                # 查询区间包含中心点：所有中心区间都重叠
+                result.extend(value for _, _, value in node.by_start)
+                stack.append(node.left)
+                stack.append(node.right)
+        return result
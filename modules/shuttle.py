@@ -0,0 +1,131 @@
+import queue
+import threading
+import subprocess
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+from .clip_export import find_ffmpeg, probe_keyframes
+
+
+class KeyframeProbeThread(QThread):
+    """后台获取视频关键帧时间，供快速浏览使用。没有 ffmpeg 时返回空列表"""
+
+    probe_finished = pyqtSignal(str, list)  # 完成信号(视频路径, 关键帧时间列表(秒))
+
+    def __init__(self, video_path, parent=None):
+        super().__init__(parent)
+        self.video_path = video_path
+
+    def run(self):
+        times = []
+        ffmpeg, ffprobe = find_ffmpeg()
+        if ffmpeg:
+            try:
+                times = probe_keyframes(self.video_path, ffmpeg, ffprobe)
+            except Exception as e:
+                print(f"获取关键帧失败: {self.video_path}, {str(e)}")
+        self.probe_finished.emit(self.video_path, times)
+
+
+class ShuttleReader(QThread):
+    """
+    快速浏览读取线程。用 ffmpeg 只解码关键帧（-skip_frame nokey）并直接缩小到显示尺寸，
+    解码量约为逐帧播放的 1/GOP，倍速越高越省。
+
+    每次从一个已知关键帧开始解码一小段连续关键帧；倒放时整段解码完后倒序输出。
+    解码结果 (帧号, 图像) 放入有界队列，由界面定时器按播放进度取用，队列满时解码暂停。
+    读到末尾或出错时放入 None。
+    """
+
+    CHUNK_SIZE = 16  # 每次解码的关键帧数
+    QUEUE_SIZE = 8
+
+    def __init__(self, video_path, ffmpeg, keyframes, seek_times, start, direction, size, parent=None):
+        """
+        Args:
+            video_path: 视频路径
+            ffmpeg: ffmpeg 可执行文件路径
+            keyframes: 关键帧帧号列表（升序）
+            seek_times: 每个关键帧的时间（秒）
+            start: 第一个输出的关键帧在列表中的位置
+            direction: 1 为快进，-1 为快退
+            size: 输出图像尺寸 (宽, 高)
+        """
+        super().__init__(parent)
+        self.video_path = video_path
+        self.ffmpeg = ffmpeg
+        self.keyframes = keyframes
+        self.seek_times = seek_times
+        self.start_index = start
+        self.direction = 1 if direction > 0 else -1
+        self.size = size
+        self.frames = queue.Queue(self.QUEUE_SIZE)
+        self._stop_requested = False
+        self._process = None
+        self._lock = threading.Lock()
+
+    def stop(self):
+        """请求停止并结束正在运行的 ffmpeg"""
+        self._stop_requested = True
+        with self._lock:
+            if self._process is not None:
+                self._process.kill()
+
+    def _put(self, item):
+        while not self._stop_requested:
+            try:
+                self.frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode(self, first, count):
+        """从第 first 个关键帧开始解码 count 个关键帧，逐个返回图像"""
+        width, height = self.size
+        cmd = [self.ffmpeg, "-v", "error", "-nostdin", "-skip_frame", "nokey",
+               # 稍早于关键帧时间定位，避免时间舍入导致跳过该关键帧
+               "-ss", f"{max(0.0, self.seek_times[first] - 0.001):.3f}", "-i", self.video_path,
+               "-map", "0:v:0", "-an", "-vsync", "passthrough", "-frames:v", str(count),
+               "-vf", f"scale={width}:{height}", "-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+        frame_bytes = width * height * 3
+        with self._lock:
+            if self._stop_requested:
+                return
+            self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        process = self._process
+        try:
+            while not self._stop_requested:
+                data = process.stdout.read(frame_bytes)
+                if len(data) < frame_bytes:
+                    break
+                yield np.frombuffer(data, np.uint8).reshape(height, width, 3)
+        finally:
+            with self._lock:
+                process.kill()
+                process.stdout.close()
+                process.wait()
+                self._process = None
+
+    def run(self):
+        index = self.start_index
+        try:
+            while not self._stop_requested and 0 <= index < len(self.keyframes):
+                if self.direction > 0:
+                    first = index
+                    count = min(self.CHUNK_SIZE, len(self.keyframes) - index)
+                    decoded = enumerate(self._decode(first, count))
+                else:
+                    first = max(0, index - self.CHUNK_SIZE + 1)
+                    frames = list(self._decode(first, index - first + 1))
+                    decoded = reversed(list(enumerate(frames)))
+                emitted = 0
+                for offset, frame in decoded:
+                    if not self._put((self.keyframes[first + offset], frame)):
+                        return
+                    emitted += 1
+                if emitted == 0:
+                    break  # 解码失败，不再重试
+                index = first + emitted if self.direction > 0 else first - 1
+        except Exception as e:
+            print(f"快速浏览解码失败: {self.video_path}, {str(e)}")
+        self._put(None)
@@ -0,0 +1,301 @@
+import os
+import json
+import time
+import sqlite3
+from .annotation_format import is_valid_segments
+from .history_store import HistoryRecord, extract_diagnosis
+from .output_store import JsonlOutputStore
+
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    video TEXT NOT NULL UNIQUE,
+    diagnosis TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL,
+    saved_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cases (
+    folder_index INTEGER NOT NULL,
+    video TEXT NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (folder_index, video)
+);
+CREATE INDEX IF NOT EXISTS idx_cases_status ON cases(status, folder_index);
+CREATE INDEX IF NOT EXISTS idx_cases_video ON cases(video);
+CREATE TABLE IF NOT EXISTS segments (
+    entry_id INTEGER NOT NULL REFERENCES entries(id) ON DELETE CASCADE,
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL,
+    label TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_segments_entry ON segments(entry_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def default_sqlite_path(jsonl_path):
+    """工作数据库与 JSONL 放在同一目录，文件名相同、扩展名为 .sqlite"""
+    return os.path.splitext(jsonl_path)[0] + ".sqlite"
+
+
+class SqliteOutputStore:
+    """
+    以 SQLite（WAL 模式）作为标注的工作存储，JSONL 只作为交付文件由 merge() 流式导出。
+
+    条目按视频唯一索引，保存、按视频查找和按 id 读取都是索引查询，不需要扫描或重写文件；
+    WAL 模式下多个读取者可以和一个写入者并发。接口与 JsonlOutputStore 相同，可以互相替换。
+    id 在写事务内按首次保存的顺序分配，因此按主键排序即是历史记录的顺序。
+
+    导入数据文件夹时 register_folders() 把每个输入视频登记到 cases 表（未保存为 pending，
+    已保存为 done），保存时同步更新状态；查找断点只需 next_pending_folder() 一次状态索引查询。
+
+    数据库之外对 JSONL 的修改（以 JSONL 存储运行的会话、其他工作站）在打开时和导出前同步进来：
+    先合并 JSONL 的追加日志，再把数据库中没有的条目写入，已有但内容不同的条目在 JSONL 比数据库中
+    那一条更晚修改时以 JSONL 为准。因此导出 JSONL 不会丢掉只存在于 JSONL 中的条目。
+
+    注意：WAL 依赖同一台机器上的共享内存，数据库不能放在网络共享目录中由多台电脑同时使用，
+    多台工作站协作时请使用 JSONL 存储。
+    """
+
+    def __init__(self, db_path, jsonl_path):
+        self.db_path = db_path
+        self.jsonl_path = jsonl_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.connection = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+        self._sync_from_jsonl()
+
+    def close(self):
+        self.connection.close()
+
+    def _jsonl_signature(self):
+        """JSONL 及其追加日志的大小、修改时间和 inode，用于判断数据库之外是否有修改"""
+        parts = []
+        for path in JsonlOutputStore(self.jsonl_path).paths():
+            try:
+                stat = os.stat(path)
+                parts.append(f"{stat.st_size}:{stat.st_mtime_ns}:{stat.st_ino}")
+            except OSError:
+                parts.append("-")
+        return "|".join(parts)
+
+    def _get_meta(self, key):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.connection.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                                "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
+
+    def _sync_from_jsonl(self):
+        """打开时调用：JSONL 自上次同步后被修改过才需要读取"""
+        jsonl_store = JsonlOutputStore(self.jsonl_path)
+        if not jsonl_store.exists() or self._get_meta("jsonl_signature") == self._jsonl_signature():
+            return
+        with jsonl_store.locked():
+            self._reconcile_locked(jsonl_store)
+
+    def _reconcile_locked(self, jsonl_store):
+        """
+        在 JSONL 写锁内把 JSONL 中的修改同步到数据库：先合并追加日志，再逐行写入数据库缺少的条目，
+        以及内容不同且 JSONL 修改时间晚于数据库中该条保存时间的条目
+
+        Returns:
+            int: 写入数据库的条目数
+        """
+        jsonl_store._merge_locked()
+        count = 0
+        if os.path.exists(self.jsonl_path):
+            jsonl_mtime = os.path.getmtime(self.jsonl_path)
+            with open(self.jsonl_path, 'r', encoding='utf-8') as f:
+                self.connection.execute("BEGIN IMMEDIATE")
+                try:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        try:
+                            entry = json.loads(line)
+                        except ValueError as e:
+                            print(f"同步时跳过无法解析的行: {e}")
+                            continue
+                        row = self.connection.execute("SELECT data, saved_at FROM entries WHERE video = ?",
+                                                      (entry.get("video", ""),)).fetchone()
+                        if row is not None and (json.loads(row[0]) == entry or row[1] >= jsonl_mtime):
+                            continue
+                        self._write_entry(entry)
+                        count += 1
+                    self._set_meta("jsonl_signature", self._jsonl_signature())
+                    self.connection.execute("COMMIT")
+                except Exception:
+                    self.connection.execute("ROLLBACK")
+                    raise
+        if count:
+            print(f"已从 JSONL 同步 {count} 条标注到 {self.db_path}")
+        return count
+
+    def _write_entry(self, entry):
+        """在当前事务中写入条目（分配 id）和片段，并把对应的病例标记为已完成"""
+        video = entry.get("video", "")
+        row = self.connection.execute("SELECT id FROM entries WHERE video = ?", (video,)).fetchone()
+        if row:
+            entry["id"] = row[0]
+        elif not isinstance(entry.get("id"), int) or self.connection.execute(
+                "SELECT 1 FROM entries WHERE id = ?", (entry["id"],)).fetchone():
+            entry["id"] = self.connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM entries").fetchone()[0]
+
+        now = time.time()
+        self.connection.execute(
+            "INSERT INTO entries (id, video, diagnosis, data, saved_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(video) DO UPDATE SET diagnosis = excluded.diagnosis, "
+            "data = excluded.data, saved_at = excluded.saved_at",
+            (entry["id"], video, extract_diagnosis(entry), json.dumps(entry, ensure_ascii=False), now))
+        self.connection.execute("DELETE FROM segments WHERE entry_id = ?", (entry["id"],))
+        if is_valid_segments(entry.get("segments")):
+            self.connection.executemany(
+                "INSERT INTO segments (entry_id, start_ms, end_ms, label) VALUES (?, ?, ?, ?)",
+                [(entry["id"], segment["start_ms"], segment["end_ms"], segment.get("label", ""))
+                 for segment in entry["segments"]])
+        self.connection.execute("UPDATE cases SET status = ? WHERE video = ?", (STATUS_DONE, video))
+
+    def save(self, entry):
+        """
+        保存（新增或更新）一个条目。已保存过的视频沿用原 id，新视频取最大 id + 1
+
+        Returns:
+            int: 条目的 id
+        """
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._write_entry(entry)
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        return entry["id"]
+
+    def exists(self):
+        return self.connection.execute("SELECT 1 FROM entries LIMIT 1").fetchone() is not None
+
+    def register_folders(self, folder_videos):
+        """
+        登记本次导入的输入视频（folder_videos[i] 为第 i 个文件夹中的视频文件名列表），
+        已经保存过的视频标记为已完成
+        """
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            self.connection.execute("DELETE FROM cases")
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO cases (folder_index, video, status) VALUES (?, ?, ?)",
+                ((i, f"videos/{video}", STATUS_PENDING) for i, videos in enumerate(folder_videos) for video in videos))
+            self.connection.execute("UPDATE cases SET status = ? WHERE video IN (SELECT video FROM entries)",
+                                    (STATUS_DONE,))
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+
+    def next_pending_folder(self, start):
+        """
+        从 start 开始第一个还有未保存视频的文件夹索引（状态索引上的一次查询）
+
+        Returns:
+            int: 文件夹索引，没有时返回 None
+        """
+        row = self.connection.execute(
+            "SELECT MIN(folder_index) FROM cases WHERE status = ? AND folder_index >= ?",
+            (STATUS_PENDING, start)).fetchone()
+        return row[0]
+
+    def merge(self):
+        """
+        按 id 顺序把所有条目流式导出为交付用的 JSONL（写入临时文件后原子替换）。
+        导出前在同一把写锁内先同步 JSONL 中的修改，只存在于 JSONL 中的条目会保留下来
+        """
+        jsonl_store = JsonlOutputStore(self.jsonl_path)
+        with jsonl_store.locked():
+            self._reconcile_locked(jsonl_store)
+            tmp_path = self.jsonl_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for (data,) in self.connection.execute("SELECT data FROM entries ORDER BY id"):
+                    f.write(data)
+                    f.write("\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.jsonl_path)
+            self._set_meta("jsonl_signature", self._jsonl_signature())
+
+    def history_index(self):
+        return SqliteHistoryIndex(self)
+
+
+class SqliteHistoryIndex:
+    """
+    与 JsonlHistoryIndex 接口相同的历史记录索引。只在数据库被（任何连接）修改后重建摘要列表，
+    完整条目按 id 从数据库读取。
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.records = []
+        self._position_by_video = {}
+        self._data_version = None
+
+    def _current_version(self):
+        # data_version 在其他连接提交后变化；本连接的修改用 total_changes 判断
+        version = self.store.connection.execute("PRAGMA data_version").fetchone()[0]
+        return version, self.store.connection.total_changes
+
+    def refresh(self):
+        """数据库有变化时重建摘要列表，返回是否发生了重建"""
+        version = self._current_version()
+        if version == self._data_version:
+            return False
+        self.rebuild()
+        self._data_version = version
+        return True
+
+    def rebuild(self):
+        rows = self.store.connection.execute("SELECT id, video, diagnosis FROM entries ORDER BY id")
+        self.records = [HistoryRecord(entry_id, self.store.db_path, entry_id, video, diagnosis)
+                        for entry_id, video, diagnosis in rows]
+        self._position_by_video = {record.video: i for i, record in enumerate(self.records)}
+
+    def __len__(self):
+        return len(self.records)
+
+    def get_record(self, index):
+        if 0 <= index < len(self.records):
+            return self.records[index]
+        return None
+
+    def get_entry(self, index):
+        """按位置读取完整条目（按主键查询）"""
+        record = self.get_record(index)
+        if record is None:
+            return None
+        row = self.store.connection.execute("SELECT data FROM entries WHERE id = ?", (record.entry_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def position_of_video(self, video_field):
+        return self._position_by_video.get(video_field, -1)
+
+
+def export_sqlite_store(jsonl_path):
+    """导出前调用：存在工作数据库时，同步 JSONL 中的修改后由数据库导出完整的 JSONL"""
+    db_path = default_sqlite_path(jsonl_path)
+    if not os.path.exists(db_path):
+        return
+    store = SqliteOutputStore(db_path, jsonl_path)
+    try:
+        store.merge()
+    finally:
+        store.close()
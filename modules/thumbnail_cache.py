@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import threading
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QBuffer, QByteArray, QIODevice, QSize, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader
+
+THUMBNAIL_SIZE = 128  # 缩略图最长边（像素）
+BUSY_TIMEOUT = 5  # 数据库被其他工作站锁定时等待的秒数
+
+
+def make_thumbnail(image_path, max_side=THUMBNAIL_SIZE):
+    """
+    生成 JPEG 编码的缩略图。通过 setScaledSize 直接按缩略图尺寸解码，不解码完整原图。
+
+    Returns:
+        bytes: JPEG 数据，失败时返回 None
+    """
+    reader = QImageReader(image_path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid() and max(size.width(), size.height()) > max_side:
+        size.scale(QSize(max_side, max_side), Qt.KeepAspectRatio)
+        reader.setScaledSize(size)
+    image = reader.read()
+    if image.isNull():
+        print(f"生成缩略图失败: {image_path}, {reader.errorString()}")
+        return None
+    if max(image.width(), image.height()) > max_side:
+        image = image.scaled(max_side, max_side, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "JPEG", 85)
+    buffer.close()
+    return bytes(data)
+
+
+class ThumbnailCache:
+    """
+    基于 SQLite 的持久化缩略图缓存，以路径为键，文件修改时间或大小变化后失效。
+
+    输出目录可能位于多台工作站共享的网络存储上，因此使用回滚日志（DELETE）模式而不是 WAL
+    （WAL 依赖同一台机器上的共享内存）。数据库无法打开、被锁定或只读时不再使用缓存，
+    缩略图直接生成。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+        try:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=DELETE")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS thumbnails ("
+                "path TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL, data BLOB NOT NULL)"
+            )
+            self._conn.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"缩略图缓存不可用，将直接生成缩略图: {db_path}, {e}")
+            self.close()
+
+    @staticmethod
+    def _file_signature(image_path):
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size
+
+    def get(self, image_path):
+        """获取有效的缩略图 JPEG 数据，未命中时返回 None"""
+        signature = self._file_signature(image_path)
+        if signature is None:
+            return None
+        with self._lock:
+            if self._conn is None:
+                return None
+            try:
+                row = self._conn.execute(
+                    "SELECT mtime, size, data FROM thumbnails WHERE path = ?", (image_path,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"读取缩略图缓存失败: {e}")
+                return None
+        if row is None or (row[0], row[1]) != signature:
+            return None
+        return row[2]
+
+    def put(self, image_path, data):
+        """写入缩略图"""
+        signature = self._file_signature(image_path)
+        if signature is None or not data:
+            return
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO thumbnails (path, mtime, size, data) VALUES (?, ?, ?, ?)",
+                    (image_path, signature[0], signature[1], sqlite3.Binary(data))
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"写入缩略图缓存失败: {e}")
+
+    def get_or_create(self, image_path):
+        """获取缩略图，未命中时生成并写入缓存"""
+        data = self.get(image_path)
+        if data is None:
+            data = make_thumbnail(image_path)
+            if data:
+                self.put(image_path, data)
+        return data
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class _ThumbnailSignals(QObject):
+    ready = pyqtSignal(str, QImage)
+
+
+class _ThumbnailTask(QRunnable):
+    """在线程池中读取或生成一张缩略图"""
+
+    def __init__(self, image_path, cache, signals, emit_result):
+        super().__init__()
+        self.image_path = image_path
+        self.cache = cache
+        self.signals = signals
+        self.emit_result = emit_result
+
+    def run(self):
+        if self.cache is not None:
+            data = self.cache.get_or_create(self.image_path)
+        else:
+            data = make_thumbnail(self.image_path)
+        if not self.emit_result or not data:
+            return
+        image = QImage.fromData(data, "JPEG")
+        if not image.isNull():
+            self.signals.ready.emit(self.image_path, image)
+
+
+class ThumbnailLoader(QObject):
+    """在后台线程池中加载缩略图；也可只预生成缩略图写入缓存"""
+
+    thumbnail_ready = pyqtSignal(str, QImage)  # 缩略图就绪信号(图片路径, 缩略图)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cache = None
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+        self.signals = _ThumbnailSignals()
+        self.signals.ready.connect(self.thumbnail_ready)
+
+    def set_cache(self, cache):
+        """设置持久化缓存（导入数据文件夹后设置）"""
+        self.pool.clear()
+        self.pool.waitForDone()
+        if self.cache is not None:
+            self.cache.close()
+        self.cache = cache
+
+    def load(self, image_paths):
+        """加载当前病例的缩略图，结果通过 thumbnail_ready 信号返回"""
+        self.pool.clear()
+        for image_path in image_paths:
+            self.pool.start(_ThumbnailTask(image_path, self.cache, self.signals, True), 1)
+
+    def shutdown(self):
+        """取消排队的任务，等待正在执行的任务结束后关闭缓存（窗口关闭前调用）"""
+        self.set_cache(None)
+
+    def prefetch(self, image_paths):
+        """预生成缩略图（例如下一个病例），只写入缓存，不发送信号"""
+        if self.cache is None:
+            return
+        for image_path in image_paths:
+            self.pool.start(_ThumbnailTask(image_path, self.cache, self.signals, False), 0)
@@ -0,0 +1,129 @@
+import os
+import hashlib
+import cv2
+import numpy as np
+
+PARTIAL_HASH_BLOCK = 64 * 1024  # 部分哈希读取的头、中、尾块大小
+PHASH_SAMPLES = 4  # 感知哈希的取样帧数，位于视频 20%/40%/60%/80% 处
+PHASH_THRESHOLD = 6  # 各取样帧汉明距离的平均值不超过该值时视为内容相同
+DURATION_TOLERANCE = 1.0  # 内容相同的视频时长最多相差的秒数
+
+
+def partial_hash(video_path, size=None):
+    """
+    快速的部分文件哈希：文件大小加上开头、中间、结尾各一块的 SHA-1。
+    同一文件改名或复制后结果不变，读取量与文件大小无关。
+    """
+    size = os.path.getsize(video_path) if size is None else size
+    digest = hashlib.sha1(str(size).encode("ascii"))
+    with open(video_path, 'rb') as f:
+        for offset in sorted({0, max(0, size // 2 - PARTIAL_HASH_BLOCK // 2), max(0, size - PARTIAL_HASH_BLOCK)}):
+            f.seek(offset)
+            digest.update(f.read(PARTIAL_HASH_BLOCK))
+    return digest.hexdigest()
+
+
+def frame_phash(frame):
+    """单帧的 64 位 DCT 感知哈希，返回 16 位十六进制字符串"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].ravel()
+    bits = low > np.median(low[1:])  # 直流分量只反映整体亮度，不参与中位数
+    return f"{int(np.packbits(bits).view('>u8')[0]):016x}"
+
+
+def video_phash(cap, frame_count):
+    """
+    在视频 20%/40%/60%/80% 处各取一帧计算感知哈希。
+    按时长比例取样，重新编码或改变分辨率后取到的仍是同一画面。
+
+    Returns:
+        list: 感知哈希字符串列表，有帧无法读取时为空列表
+    """
+    hashes = []
+    for i in range(PHASH_SAMPLES):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(frame_count * (i + 1) / (PHASH_SAMPLES + 1)))
+        ret, frame = cap.read()
+        if not ret:
+            return []
+        hashes.append(frame_phash(frame))
+    return hashes
+
+
+def _phash_matrix(hash_lists):
+    return np.array([[int(value, 16) for value in hashes] for hashes in hash_lists], dtype=np.uint64)
+
+
+def find_duplicates(infos):
+    """
+    根据部分哈希和感知哈希查找内容相同的视频
+
+    Args:
+        infos: 视频元数据字典列表（含 path、size、duration、partial_hash、phash）
+
+    Returns:
+        list: [{'paths': [...], 'exact': 文件完全相同}]，每组至少两个视频
+    """
+    infos = [info for info in infos if info and info.get("partial_hash")]
+    parent = list(range(len(infos)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        parent[find(i)] = find(j)
+
+    # 1. 部分哈希相同：同一文件被复制或改名
+    first_by_hash = {}
+    for i, info in enumerate(infos):
+        key = (info.get("size"), info["partial_hash"])
+        if key in first_by_hash:
+            union(i, first_by_hash[key])
+        else:
+            first_by_hash[key] = i
+
+    # 2. 感知哈希接近且时长相同：重新编码或改变分辨率的同一视频。逐行向量化计算汉明距离
+    hashed = [i for i, info in enumerate(infos) if len(info.get("phash") or []) == PHASH_SAMPLES]
+    if len(hashed) > 1:
+        matrix = _phash_matrix([infos[i]["phash"] for i in hashed])
+        durations = np.array([infos[i].get("duration", 0.0) for i in hashed])
+        for row in range(len(hashed) - 1):
+            xor = matrix[row + 1:] ^ matrix[row]
+            distances = np.unpackbits(xor.view(np.uint8), axis=1).sum(axis=1) / float(PHASH_SAMPLES)
+            close = (distances <= PHASH_THRESHOLD) & (np.abs(durations[row + 1:] - durations[row]) <= DURATION_TOLERANCE)
+            for other in np.flatnonzero(close):
+                union(hashed[row], hashed[row + 1 + other])
+
+    groups = {}
+    for i in range(len(infos)):
+        groups.setdefault(find(i), []).append(i)
+    duplicates = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        exact = len({(infos[i].get("size"), infos[i]["partial_hash"]) for i in members}) == 1
+        duplicates.append({"paths": sorted(infos[i]["path"] for i in members), "exact": exact})
+    duplicates.sort(key=lambda group: group["paths"][0])
+    return duplicates
+
+
+def find_name_collisions(infos):
+    """
+    查找文件名相同但内容不同的视频（保存时会复制到同一个 videos/ 文件名下）
+
+    Returns:
+        list: [[路径, ...]]，每组文件名相同且部分哈希不全相同
+    """
+    by_name = {}
+    for info in infos:
+        if info:
+            by_name.setdefault(os.path.basename(info["path"]), []).append(info)
+    collisions = []
+    for name in sorted(by_name):
+        group = by_name[name]
+        if len(group) > 1 and len({info.get("partial_hash") or info["path"] for info in group}) > 1:
+            collisions.append(sorted(info["path"] for info in group))
+    return collisions
@@ -0,0 +1,249 @@
+import os
+import json
+import multiprocessing
+import cv2
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from .video_identity import partial_hash, video_phash
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+METADATA_VERSION = 2  # 元数据字段变化时递增，使旧缓存条目重新探测
+
+
+def dataset_cache_folder(output_folder, data_folder_name):
+    """
+    数据集的缓存目录：输出目录下的 .cache/<数据集名>。
+    缓存不放在交付的数据集文件夹中
+    """
+    return os.path.join(output_folder, ".cache", data_folder_name)
+
+
+def default_probe_workers():
+    """默认的探测进程数，限制并发以免同时打开过多视频拖慢磁盘"""
+    return max(1, min(4, (os.cpu_count() or 2) - 1))
+
+
+def create_process_pool(max_workers):
+    """
+    创建进程池。统一使用 spawn 方式启动子进程：在已启动 Qt 线程的进程中 fork
+    可能导致子进程死锁，Windows 下也只支持 spawn。
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def probe_video(video_path):
+    """
+    探测单个视频的元数据。该函数会在子进程中执行，因此必须是模块级函数。
+
+    Args:
+        video_path: 视频文件路径
+
+    Returns:
+        dict: 元数据字典，ok 为 False 时 error 字段说明原因
+    """
+    info = {
+        "version": METADATA_VERSION,
+        "path": video_path,
+        "size": 0,
+        "mtime": 0.0,
+        "ok": False,
+        "error": "",
+        "fps": 0.0,
+        "frame_count": 0,
+        "duration": 0.0,
+        "width": 0,
+        "height": 0,
+        "codec": "",
+        "partial_hash": "",
+        "phash": []
+    }
+
+    try:
+        stat = os.stat(video_path)
+        info["size"] = stat.st_size
+        info["mtime"] = stat.st_mtime
+    except OSError as e:
+        info["error"] = f"无法访问文件: {e}"
+        return info
+
+    if info["size"] == 0:
+        info["error"] = "文件为空"
+        return info
+
+    try:
+        info["partial_hash"] = partial_hash(video_path, info["size"])
+    except OSError as e:
+        info["error"] = f"无法读取文件: {e}"
+        return info
+
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            info["error"] = "无法打开视频"
+            return info
+
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+
+        info["fps"] = fps
+        info["frame_count"] = frame_count
+        info["width"] = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        info["height"] = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        info["codec"] = "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ")
+
+        if fps <= 0:
+            info["error"] = "帧率为0，无法计算时长"
+            return info
+
+        # 解码首帧，确认文件不是损坏的
+        ret, _ = cap.read()
+        if not ret:
+            info["error"] = "无法解码视频帧，文件可能已损坏"
+            return info
+
+        info["duration"] = frame_count / fps
+        # 感知哈希用于识别改名或重新编码的重复视频，取样失败不影响视频可用性
+        info["phash"] = video_phash(cap, frame_count)
+        info["ok"] = True
+    except Exception as e:
+        info["error"] = f"探测视频时出错: {e}"
+    finally:
+        cap.release()
+
+    return info
+
+
+def run_in_process_pool(func, items, max_workers=None, progress_callback=None, should_stop=None):
+    """
+    使用进程池对每个参数执行 func（必须是模块级函数），同时在途的任务数量受 max_workers 限制。
+
+    Args:
+        func: 在子进程中执行的函数，接收一个参数
+        items: 参数列表
+        max_workers: 最大进程数，默认见 default_probe_workers
+        progress_callback: (可选) 回调 callback(已完成数, 总数, 结果)
+        should_stop: (可选) 返回 True 时停止提交新任务
+
+    Returns:
+        list: 已完成的结果列表（按完成顺序），子进程出错的任务不包含在内
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    max_workers = max_workers or default_probe_workers()
+    results = []
+    total = len(items)
+    pending_items = iter(items)
+
+    with create_process_pool(max_workers) as executor:
+        in_flight = set()
+
+        def submit_more():
+            while len(in_flight) < max_workers * 2:
+                if should_stop and should_stop():
+                    return
+                item = next(pending_items, None)
+                if item is None:
+                    return
+                in_flight.add(executor.submit(func, item))
+
+        submit_more()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.discard(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"子进程任务出错: {e}")
+                    continue
+                results.append(result)
+                if progress_callback:
+                    progress_callback(len(results), total, result)
+            submit_more()
+
+    return results
+
+
+def probe_videos(video_paths, max_workers=None, progress_callback=None, should_stop=None):
+    """
+    使用进程池批量探测视频元数据
+
+    Args:
+        video_paths: 视频文件路径列表
+        max_workers: 最大进程数，默认见 default_probe_workers
+        progress_callback: (可选) 回调 callback(已完成数, 总数, 元数据字典)
+        should_stop: (可选) 返回 True 时停止提交新任务
+
+    Returns:
+        list: 已完成探测的元数据字典列表
+    """
+    return run_in_process_pool(probe_video, video_paths, max_workers, progress_callback, should_stop)
+
+
+class VideoMetadataCache:
+    """视频元数据缓存，以文件路径为键，文件大小或修改时间变化后自动失效"""
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        """从磁盘加载缓存"""
+        self.entries = {}
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self.entries = data
+        except Exception as e:
+            print(f"读取视频元数据缓存失败: {e}")
+
+    def save(self):
+        """原子地写回磁盘，避免写到一半时程序退出导致缓存损坏"""
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"保存视频元数据缓存失败: {e}")
+
+    def _key(self, video_path):
+        return os.path.normcase(os.path.abspath(video_path))
+
+    def get(self, video_path):
+        """获取仍然有效的缓存条目，不存在或已过期时返回 None"""
+        info = self.entries.get(self._key(video_path))
+        if not info:
+            return None
+        try:
+            stat = os.stat(video_path)
+        except OSError:
+            return None
+        if (info.get("version") != METADATA_VERSION or info.get("size") != stat.st_size
+                or info.get("mtime") != stat.st_mtime):
+            return None
+        return info
+
+    def put(self, info):
+        """写入一条探测结果"""
+        self.entries[self._key(info["path"])] = info
+
+    def missing(self, video_paths):
+        """返回尚未缓存或缓存已过期的视频路径"""
+        return [path for path in video_paths if self.get(path) is None]
+
+    def bad_videos(self, video_paths):
+        """返回已探测为不可用的视频元数据列表"""
+        bad = []
+        for path in video_paths:
+            info = self.get(path)
+            if info and not info.get("ok"):
+                bad.append(info)
+        return bad
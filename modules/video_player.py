@@ -1,10 +1,18 @@
 import os
+import queue
+import bisect
 import cv2
 from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QObject, QSize
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                             QSlider, QPushButton, QFileDialog, QStyle, QMessageBox,
                             QComboBox, QButtonGroup, QRadioButton)
 from PyQt5.QtGui import QImage, QPixmap, QIcon, QFont
+from .segment_timeline import SegmentTimeline
+from .pts_index import PtsIndex, PtsIndexCache
+from .frame_cache import DecodedFrameCache
+from .annotation_format import format_time_ms
+from .shuttle import KeyframeProbeThread, ShuttleReader
+from .clip_export import find_ffmpeg
 
 class VideoPlayer(QWidget):
     """
@@ -16,6 +24,11 @@ class VideoPlayer(QWidget):
     duration_changed = pyqtSignal(int)  # 视频总时长变化信号
     end_reached = pyqtSignal()  # 视频播放结束信号
     segment_marked = pyqtSignal(str, str, str)  # 视频片段标记信号(start_time, end_time, label)
+    time_changed = pyqtSignal(int)  # 当前播放时间变化信号（毫秒）
+
+    SHUTTLE_MIN_SPEED = 4.0  # 达到该倍速（或倒放）时进入快速浏览模式，只显示部分帧
+    SHUTTLE_DISPLAY_FPS = 12  # 快速浏览时每秒刷新画面的次数
+    FALLBACK_GOP_FRAMES = 30  # 关键帧未知时，后退解码的起点提前的帧数
     
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -27,6 +40,11 @@ class VideoPlayer(QWidget):
         self.total_frames = 0
         self.fps = 0
         self.is_playing = False
+        self.pts_index = None  # 当前视频的 帧号->时间戳 对照表
+        self.pts_cache = None  # 对照表磁盘缓存（导入数据文件夹后设置）
+        self.current_pts_ms = 0  # 当前显示帧的时间戳（毫秒）
+        self.frame_cache = DecodedFrameCache()  # 已解码帧缓存，用于后退、逐帧步进和倒放
+        self.decoder_next = -1  # 解码器下一次 read() 返回的帧号，-1 表示未知
         self.mark_start_time = None  # 标记开始时间
         self.is_marking = False  # 标记状态
         
@@ -35,13 +53,25 @@ class VideoPlayer(QWidget):
         
         # 新增：播放速度和音频状态
         self.play_speed = 1.0
-        self.speed_options = [2.0,1.5,1.0,0.8,0.5,0.3,0.1]  # 播放速度选项
+        self.speed_options = [16.0,8.0,4.0,2.0,1.5,1.0,0.8,0.5,0.3,0.1,-0.5,-1.0,-4.0,-8.0,-16.0]  # 播放速度选项，负数为倒放
+        self.default_speed_index = self.speed_options.index(1.0)
+
+        # 快速浏览（4x 以上或倒放）状态
+        self.shuttle_reader = None  # 只解码关键帧的后台读取线程
+        self.shuttle_position = 0.0  # 按倍速推进的播放进度（帧号，可为小数）
+        self.shuttle_pending = None  # 已取出但还没到显示时间的 (帧号, 图像)
+        self.shuttle_synced = True  # 当前画面是否为原始分辨率解码的帧（快速浏览显示的是缩小的关键帧）
+        self.keyframe_probe = None
         
         # 视频步进大小（秒）
         self.step_size = 0.5
         
         # 缩放比例
         self.zoom_factor = 0.43
+        self.frame_image = None  # 当前显示的原始帧（BGR），缩放和拖动时直接重绘
+        self.frame_scale = 1.0  # frame_image 相对原始分辨率的比例
+        self.pan_center = None  # 放大时可见区域中心在原始帧中的坐标 (x, y)，None 表示居中
+        self.pan_last_pos = None  # 拖动平移时上一次的鼠标位置
         
         self.setup_ui()
         
@@ -180,6 +210,34 @@ class VideoPlayer(QWidget):
         """)
         self.forward_button.clicked.connect(self.step_forward)
         controls_layout.addWidget(self.forward_button)
+
+        # 逐帧步进按钮
+        frame_step_style = """
+            QPushButton {
+                background-color: #7f8c8d;
+                border-radius: 16px;
+                min-width: 28px;
+                min-height: 28px;
+                padding: 0px;
+                color: white;
+            }
+            QPushButton:hover {
+                background-color: #95a5a6;
+            }
+        """
+        self.prev_frame_button = QPushButton()
+        self.prev_frame_button.setIcon(self.style().standardIcon(QStyle.SP_MediaSkipBackward))
+        self.prev_frame_button.setToolTip("上一帧 (, 或 Shift+←)")
+        self.prev_frame_button.setStyleSheet(frame_step_style)
+        self.prev_frame_button.clicked.connect(lambda: self.step_frame(-1))
+        controls_layout.addWidget(self.prev_frame_button)
+
+        self.next_frame_button = QPushButton()
+        self.next_frame_button.setIcon(self.style().standardIcon(QStyle.SP_MediaSkipForward))
+        self.next_frame_button.setToolTip("下一帧 (. 或 Shift+→)")
+        self.next_frame_button.setStyleSheet(frame_step_style)
+        self.next_frame_button.clicked.connect(lambda: self.step_frame(1))
+        controls_layout.addWidget(self.next_frame_button)
         
         # 添加剪刀按钮
         self.scissors_button = QPushButton("✂")
@@ -204,8 +262,8 @@ class VideoPlayer(QWidget):
         
         # 播放速度选择器
         self.speed_combo = QComboBox()
-        self.speed_combo.addItems([f"{s}x" for s in self.speed_options])
-        self.speed_combo.setCurrentIndex(2)  # 默认1.0x
+        self.speed_combo.addItems([f"{s}x" if s > 0 else f"倒放 {-s}x" for s in self.speed_options])
+        self.speed_combo.setCurrentIndex(self.default_speed_index)  # 默认1.0x
         self.speed_combo.setStyleSheet("""
             QComboBox {
                 background-color: #f0f0f0;
@@ -257,7 +315,17 @@ class VideoPlayer(QWidget):
         self.slider.sliderMoved.connect(self.set_position)
         self.slider.sliderPressed.connect(self.slider_pressed)
         self.slider.sliderReleased.connect(self.slider_released)
-        controls_layout.addWidget(self.slider)
+
+        # 片段时间轴（进度条下方）
+        self.timeline = SegmentTimeline()
+        self.timeline.seek_requested.connect(self.seek_to_ms)
+        self.time_changed.connect(self.timeline.set_position)
+
+        slider_layout = QVBoxLayout()
+        slider_layout.setSpacing(2)
+        slider_layout.addWidget(self.slider)
+        slider_layout.addWidget(self.timeline)
+        controls_layout.addLayout(slider_layout)
         
         # 时间标签
         self.time_label = QLabel("00:00.00 / 00:00.00")
@@ -273,37 +341,27 @@ class VideoPlayer(QWidget):
     def zoom_in(self):
         """放大视频"""
         self.zoom_factor *= 1.2
-        if self.cap:
-            # 更新当前帧显示
-            ret, frame = self.cap.read()
-            if ret:
-                self.display_frame(frame)
-                self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)  # 重置位置
+        self.refresh_frame()
     
     def zoom_out(self):
         """缩小视频"""
         self.zoom_factor *= 0.8
-        if self.cap:
-            # 更新当前帧显示
-            ret, frame = self.cap.read()
-            if ret:
-                self.display_frame(frame)
-                self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)  # 重置位置
+        self.refresh_frame()
     
     def zoom_reset(self):
         """重置缩放"""
         self.zoom_factor = 0.43
-        if self.cap:
-            # 更新当前帧显示
-            ret, frame = self.cap.read()
-            if ret:
-                self.display_frame(frame)
-                self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)  # 重置位置
+        self.pan_center = None
+        self.refresh_frame()
     
     def keyPressEvent(self, event):
         """处理键盘事件"""
         if event.key() == Qt.Key_Space:
             self.toggle_play()
+        elif event.key() == Qt.Key_Comma or (event.key() == Qt.Key_Left and event.modifiers() & Qt.ShiftModifier):
+            self.step_frame(-1)
+        elif event.key() == Qt.Key_Period or (event.key() == Qt.Key_Right and event.modifiers() & Qt.ShiftModifier):
+            self.step_frame(1)
         elif event.key() == Qt.Key_Left:
             self.step_backward()
         elif event.key() == Qt.Key_Right:
@@ -347,8 +405,49 @@ class VideoPlayer(QWidget):
         if event.button() == Qt.MiddleButton and (event.modifiers() & Qt.ControlModifier):
             self.zoom_reset()
             event.accept()
+        elif event.button() == Qt.LeftButton and self.can_pan() and \
+                self.video_label.geometry().contains(event.pos()):
+            # 放大后画面超出显示区域时，按住左键拖动平移
+            self.pan_last_pos = event.pos()
+            self.video_label.setCursor(Qt.ClosedHandCursor)
+            event.accept()
         else:
             super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        """拖动平移放大后的画面"""
+        if self.pan_last_pos is not None and self.pan_center is not None:
+            delta = event.pos() - self.pan_last_pos
+            self.pan_last_pos = event.pos()
+            # 鼠标移动的距离换算为原始帧中的像素，画面跟随鼠标移动
+            cx, cy = self.pan_center
+            self.pan_center = (cx - delta.x() / self.zoom_factor, cy - delta.y() / self.zoom_factor)
+            self.refresh_frame()
+            event.accept()
+        else:
+            super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if self.pan_last_pos is not None and event.button() == Qt.LeftButton:
+            self.pan_last_pos = None
+            self.update_pan_cursor()
+            event.accept()
+        else:
+            super().mouseReleaseEvent(event)
+
+    def can_pan(self):
+        """缩放后的画面是否超出显示区域（可以拖动平移）"""
+        if self.frame_image is None:
+            return False
+        h, w = self.frame_image.shape[:2]
+        zoom = self.zoom_factor / self.frame_scale
+        return w * zoom > self.video_label.width() or h * zoom > self.video_label.height()
+
+    def update_pan_cursor(self):
+        if self.can_pan():
+            self.video_label.setCursor(Qt.OpenHandCursor)
+        else:
+            self.video_label.unsetCursor()
     
     def change_speed(self, index):
         """改变播放速度"""
@@ -358,32 +457,55 @@ class VideoPlayer(QWidget):
             # 如果正在播放，调整播放速度
             if self.is_playing:
                 self.timer.stop()
-                interval = int(1000 / (self.fps * self.play_speed)) if self.fps > 0 else 100
-                self.timer.start(max(1, interval))
+                self.stop_shuttle(sync=not self.is_shuttle())
+                if self.is_shuttle():
+                    self.start_shuttle()
+                self.timer.start(self.timer_interval())
+
+    def timer_interval(self):
+        """播放定时器间隔（毫秒）"""
+        if self.is_shuttle():
+            return int(1000 / self.SHUTTLE_DISPLAY_FPS)
+        interval = int(1000 / (self.fps * abs(self.play_speed))) if self.fps > 0 else 100
+        return max(1, interval)
         
     def step_backward(self):
         """后退指定秒数"""
-        if not self.cap:
+        if not self.cap or self.pts_index is None:
             return
             
-        # 计算要后退的帧数
-        frames_to_move = int(self.step_size * self.fps)
-        new_position = max(0, self.current_frame - frames_to_move)
+        # 按时间戳计算目标帧，可变帧率视频也能准确后退
+        target_ms = self.get_current_time_ms() - int(self.step_size * 1000)
+        new_position = max(0, min(self.current_frame - 1, self.pts_index.frame_for_time(target_ms)))
         
         # 设置新位置
         self.set_position(new_position)
         
     def step_forward(self):
         """前进指定秒数"""
-        if not self.cap:
+        if not self.cap or self.pts_index is None:
             return
             
-        # 计算要前进的帧数
-        frames_to_move = int(self.step_size * self.fps)
-        new_position = min(self.total_frames - 1, self.current_frame + frames_to_move)
+        # 按时间戳计算目标帧，可变帧率视频也能准确前进
+        target_ms = self.get_current_time_ms() + int(self.step_size * 1000)
+        new_position = min(self.total_frames - 1, max(self.current_frame + 1, self.pts_index.frame_for_time(target_ms)))
         
         # 设置新位置
         self.set_position(new_position)
+
+    def step_frame(self, delta):
+        """逐帧步进（delta 为 ±1），后退时从已解码帧缓存中取帧"""
+        if not self.cap:
+            return
+        if self.is_playing:
+            self.pause_video()
+        new_position = max(0, min(self.total_frames - 1, self.current_frame + delta))
+        if new_position == self.current_frame:
+            return
+        self.slider.blockSignals(True)
+        self.slider.setValue(new_position)
+        self.slider.blockSignals(False)
+        self.set_position(new_position)
         
     def load_video(self, video_path):
         """加载视频文件"""
@@ -396,6 +518,7 @@ class VideoPlayer(QWidget):
         
         # 清除标记信息
         self.mark_start_time = None
+        self.pan_center = None
         
         # 打开新视频
         self.video_path = video_path
@@ -403,25 +526,35 @@ class VideoPlayer(QWidget):
         
         if not self.cap.isOpened():
             print(f"无法打开视频: {video_path}")
+            # 未打开的 VideoCapture 仍为真值，置空后各处的 "if not self.cap" 检查才有效
+            self.cap.release()
+            self.cap = None
             return False
         
         # 获取视频信息
         self.fps = self.cap.get(cv2.CAP_PROP_FPS)
         self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
         self.current_frame = 0
+        self.current_pts_ms = 0
+        if self.pts_cache is not None:
+            self.pts_index = self.pts_cache.load(video_path, self.total_frames, self.fps)
+        else:
+            self.pts_index = PtsIndex(self.total_frames, self.fps)
+        
+        # 显示第一帧
+        self.decoder_next = 0
+        frame = self.read_frame(0)
+        if frame is not None:
+            self.display_frame(frame)
         
         # 更新UI
         self.slider.setRange(0, self.total_frames)
+        self.timeline.set_duration(self.get_video_duration() * 1000)
         self.update_time_label()
         self.duration_changed.emit(self.total_frames)
         
-        # 显示第一帧
-        ret, frame = self.cap.read()
-        if ret:
-            self.display_frame(frame)
-        
         # 重置播放速度为默认值
-        self.speed_combo.setCurrentIndex(2)  # 1.0x
+        self.speed_combo.setCurrentIndex(self.default_speed_index)  # 1.0x
         
         return True
         
@@ -442,10 +575,11 @@ class VideoPlayer(QWidget):
             
         self.is_playing = True
         self.play_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPause))
+        if self.is_shuttle():
+            self.start_shuttle()
         
         # 根据播放速度设置定时器间隔
-        interval = int(1000 / (self.fps * self.play_speed)) if self.fps > 0 else 100
-        self.timer.start(max(1, interval))
+        self.timer.start(self.timer_interval())
         
     def pause_video(self):
         """暂停视频"""
@@ -455,75 +589,359 @@ class VideoPlayer(QWidget):
         self.is_playing = False
         self.play_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay))
         self.timer.stop()
+        self.stop_shuttle()
         
     def stop_video(self):
         """停止视频"""
         self.pause_video()
+        self.save_pts_index()
         if self.cap:
             self.cap.release()
             self.cap = None
+        self.shuttle_synced = True
+        self.frame_cache.clear()
+        self.decoder_next = -1
+        self.pts_index = None
+        self.current_pts_ms = 0
         self.current_frame = 0
         self.total_frames = 0
         self.fps = 0
+        self.frame_image = None
         self.video_label.clear()
+        self.video_label.unsetCursor()
         self.slider.setRange(0, 0)
+        self.timeline.set_duration(0)
         self.time_label.setText("00:00.00 / 00:00.00")
         
     def update_frame(self):
         """更新视频帧"""
         if not self.cap or not self.is_playing:
             return
+        if self.is_shuttle():
+            self.shuttle_step()
+            return
 
-        ret, frame = self.cap.read()
-        if not ret:
-            # 当视频播放到末尾时，回到开头并暂停
-            self.current_frame = 0
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            ret, frame = self.cap.read()
-            
-            # 如果不能获取帧，则停止播放
-            if not ret:
-                self.stop_video()
+        if self.play_speed < 0:
+            # 倒放：逐帧后退，由已解码帧缓存提供画面，到开头时暂停
+            if self.current_frame <= 0:
+                self.pause_video()
+                return
+            frame = self.read_frame(self.current_frame - 1)
+            if frame is None:
+                self.pause_video()
                 return
+            self.current_frame -= 1
+        else:
+            frame = self.read_frame(self.current_frame + 1)
+            if frame is None:
+                # 当视频播放到末尾时，回到开头并暂停
+                self.current_frame = 0
+                frame = self.read_frame(0)
                 
-            # 触发结束信号
-            self.end_reached.emit()
-            self.pause_video()
+                # 如果不能获取帧，则停止播放
+                if frame is None:
+                    self.stop_video()
+                    return
+                    
+                # 触发结束信号
+                self.end_reached.emit()
+                self.pause_video()
+            else:
+                self.current_frame += 1
 
-        self.current_frame += 1
+        self.current_pts_ms = self.pts_index.time_for_frame(self.current_frame)
         self.display_frame(frame)
+        self.frame_shown()
 
+    def gop_start(self, frame_index):
+        """返回解码 frame_index 需要从哪一帧开始：所在 GOP 的关键帧，关键帧未知时提前固定帧数"""
+        keyframes = self.pts_index.keyframes if self.pts_index is not None else None
+        if keyframes:
+            i = bisect.bisect_right(keyframes, frame_index) - 1
+            return keyframes[i] if i >= 0 else 0
+        if keyframes is None:
+            self.request_keyframes()
+        return max(0, frame_index - self.FALLBACK_GOP_FRAMES)
+
+    def read_frame(self, frame_index):
+        """
+        读取指定帧（BGR 图像），失败时返回 None。
+
+        优先从已解码帧缓存中取；未命中时，若解码器就在目标帧之前不远处则顺序读到目标帧，
+        否则跳到所在 GOP 的关键帧再顺序解码。途经的帧都放入缓存并记录时间戳，
+        因此倒放和连续后退时，每个 GOP 只需解码一次。
+        """
+        if frame_index < 0 or not self.cap:
+            return None
+        frame = self.frame_cache.get(frame_index)
+        if frame is not None:
+            return frame
+        start = self.gop_start(frame_index)
+        distance = frame_index - self.decoder_next
+        if self.decoder_next < 0 or distance < 0 or distance > max(frame_index - start, self.FALLBACK_GOP_FRAMES):
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            self.decoder_next = start
+        while self.decoder_next <= frame_index:
+            ret, frame = self.cap.read()
+            if not ret:
+                self.decoder_next = -1
+                return None
+            self.record_frame_pts(self.decoder_next)
+            self.frame_cache.put(self.decoder_next, frame)
+            self.decoder_next += 1
+        return frame
+
+    def frame_shown(self):
+        """播放中显示新帧后更新进度条和时间"""
         # 更新进度条，但避免触发滑动事件
         self.slider.blockSignals(True)
         self.slider.setValue(self.current_frame)
         self.slider.blockSignals(False)
         
         self.update_time_label()
+        self.time_changed.emit(self.get_current_time_ms())
+
+    def is_shuttle(self):
+        """当前速度是否使用快速浏览（4x 以上，正放或倒放）"""
+        return abs(self.play_speed) >= self.SHUTTLE_MIN_SPEED
+
+    def request_keyframes(self):
+        """后台获取当前视频的关键帧位置，结果保存在 PTS 对照表中"""
+        if self.keyframe_probe is not None or not self.video_path:
+            return
+        self.keyframe_probe = KeyframeProbeThread(self.video_path, self)
+        self.keyframe_probe.probe_finished.connect(self.on_keyframes_probed)
+        self.keyframe_probe.start()
+
+    def on_keyframes_probed(self, video_path, times):
+        self.keyframe_probe.wait()
+        self.keyframe_probe.deleteLater()
+        self.keyframe_probe = None
+        if video_path != self.video_path or self.pts_index is None:
+            # 获取期间已切换视频
+            if self.pts_index is not None and self.pts_index.keyframes is None and self.cap:
+                self.request_keyframes()
+            return
+        self.pts_index.set_keyframes(self.pts_index.keyframes_from_times(times))
+        print(f"获取到 {len(self.pts_index.keyframes)} 个关键帧: {os.path.basename(video_path)}")
+        if self.is_playing and self.is_shuttle() and self.shuttle_reader is None:
+            self.start_shuttle()
+
+    def start_shuttle(self):
+        """
+        开始快速浏览。已知关键帧且有 ffmpeg 时由后台线程只解码关键帧；
+        关键帧尚未获取完成或没有 ffmpeg 时，用 OpenCV 跳帧显示。
+        """
+        self.shuttle_position = float(self.current_frame)
+        self.shuttle_pending = None
+        if not self.cap or self.pts_index is None:
+            return
+        keyframes = self.pts_index.keyframes
+        if keyframes is None:
+            self.request_keyframes()
+            return
+        ffmpeg, _ = find_ffmpeg()
+        if not keyframes or not ffmpeg:
+            return
+        direction = 1 if self.play_speed > 0 else -1
+        if direction > 0:
+            start = bisect.bisect_right(keyframes, self.current_frame)
+        else:
+            start = bisect.bisect_left(keyframes, self.current_frame) - 1
+        if not 0 <= start < len(keyframes):
+            return
+        # 直接解码为当前显示尺寸，不超过原始分辨率
+        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        scale = min(1.0, self.zoom_factor)
+        size = (max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2))
+        seek_times = [self.pts_index.time_for_frame(frame) / 1000 for frame in keyframes]
+        self.shuttle_reader = ShuttleReader(self.video_path, ffmpeg, keyframes, seek_times,
+                                            start, direction, size, self)
+        self.shuttle_reader.source_scale = size[0] / width if width > 0 else 1.0
+        self.shuttle_reader.start()
+
+    def stop_shuttle(self, sync=True):
+        """
+        停止快速浏览的后台读取。sync 为 True 时以原始分辨率重新读取并显示当前帧，
+        之后的逐帧播放和步进从这里继续。
+        """
+        if self.shuttle_reader is not None:
+            self.shuttle_reader.stop()
+            self.shuttle_reader.wait()
+            self.shuttle_reader.deleteLater()
+            self.shuttle_reader = None
+        self.shuttle_pending = None
+        if sync and not self.shuttle_synced and self.cap:
+            self.set_position(self.current_frame)
+
+    def shuttle_step(self):
+        """快速浏览的一次定时刷新：按倍速推进进度，显示已到时间的最新关键帧"""
+        if self.shuttle_reader is None:
+            self.shuttle_step_opencv()
+            return
+        forward = self.play_speed > 0
+        self.shuttle_position += self.play_speed * self.fps / self.SHUTTLE_DISPLAY_FPS
+        target = int(self.shuttle_position)
+
+        shown = None
+        while True:
+            item = self.shuttle_pending
+            self.shuttle_pending = None
+            if item is None:
+                try:
+                    item = self.shuttle_reader.frames.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    # 关键帧读完（最后一个 GOP 或开头），剩余部分改用 OpenCV 跳帧
+                    self.stop_shuttle(sync=False)
+                    break
+            if (item[0] <= target) if forward else (item[0] >= target):
+                shown = item  # 更早的帧已过时，只显示最新的一帧
+            else:
+                self.shuttle_pending = item
+                break
+
+        if shown is not None:
+            frame_index, frame = shown
+            self.current_frame = frame_index
+            self.current_pts_ms = self.pts_index.time_for_frame(frame_index)
+            self.shuttle_synced = False
+            self.display_frame(frame, self.shuttle_reader.source_scale if self.shuttle_reader else 1.0)
+            self.frame_shown()
+        elif self.shuttle_reader is None:
+            self.shuttle_step_opencv()
+
+    def shuttle_step_opencv(self):
+        """没有关键帧信息时的快速浏览：快进时 grab() 跳过中间帧（不做颜色转换和显示），快退时跳转"""
+        step = int(round(self.play_speed * self.fps / self.SHUTTLE_DISPLAY_FPS)) if self.fps > 0 else 0
+        if step == 0:
+            step = 1 if self.play_speed > 0 else -1
+        if not self.shuttle_synced:
+            self.set_position(self.current_frame)
+        target = self.current_frame + step
+        if target < 0:
+            self.set_position(0)
+            self.pause_video()
+            return
+        if target >= self.total_frames:
+            self.set_position(max(0, self.total_frames - 1))
+            self.pause_video()
+            self.end_reached.emit()
+            return
+        if step < 0:
+            self.set_position(target)
+            self.frame_shown()
+            return
+        if self.decoder_next == self.current_frame + 1:
+            while self.decoder_next < target:
+                if not self.cap.grab():
+                    break
+                self.record_frame_pts(self.decoder_next)
+                self.decoder_next += 1
+        frame = self.read_frame(target)
+        if frame is None:
+            self.pause_video()
+            self.end_reached.emit()
+            return
+        self.current_frame = target
+        self.current_pts_ms = self.pts_index.time_for_frame(target)
+        self.display_frame(frame)
+        self.frame_shown()
             
-    def display_frame(self, frame):
-        """显示视频帧"""
-        # 转换OpenCV格式(BGR)到Qt格式(RGB)
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_frame.shape
-        bytes_per_line = ch * w
-        
-        # 创建QImage
-        image = QImage(rgb_frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(image)
+    def set_pts_cache_folder(self, cache_folder):
+        """设置 PTS 对照表缓存目录"""
+        self.save_pts_index()
+        self.pts_cache = PtsIndexCache(cache_folder) if cache_folder else None
+
+    def shutdown(self):
+        """窗口关闭前停止后台解码并保存 PTS 对照表"""
+        self.stop_shuttle(sync=False)
+        if self.keyframe_probe is not None:
+            self.keyframe_probe.wait()
+        self.save_pts_index()
+
+    def save_pts_index(self):
+        """把本次播放中新记录的时间戳写回缓存"""
+        if self.pts_cache is not None and self.pts_index is not None and self.video_path:
+            self.pts_cache.save(self.video_path, self.pts_index)
+
+    def record_frame_pts(self, frame_index):
+        """记录刚解码的帧的时间戳（解码器 PTS）"""
+        if self.pts_index is not None and self.cap:
+            self.pts_index.record(frame_index, self.cap.get(cv2.CAP_PROP_POS_MSEC))
         
+    def display_frame(self, frame, source_scale=1.0):
+        """
+        显示视频帧
+
+        只有显示区域内可见的部分会被转换和缩放：放大后先在原始帧上按可见区域切片
+        （numpy 视图，不复制数据），再做颜色转换和缩放，每帧的开销与显示区域
+        成正比，不随缩放倍数增长。
+
+        Args:
+            frame: BGR 图像
+            source_scale: 图像相对原始分辨率的比例（快速浏览时解码的是缩小的图像）
+        """
+        self.frame_image = frame
+        self.frame_scale = source_scale
+        h, w = frame.shape[:2]
+        zoom = self.zoom_factor / source_scale
+        label_w, label_h = self.video_label.width(), self.video_label.height()
+
+        # 可见区域在图像中的大小
+        view_w = min(w, label_w / zoom) if zoom > 0 else w
+        view_h = min(h, label_h / zoom) if zoom > 0 else h
+        if view_w >= w and view_h >= h:
+            self.pan_center = None
+            x0, y0, x1, y1 = 0, 0, w, h
+        else:
+            if self.pan_center is not None:
+                cx, cy = self.pan_center[0] * source_scale, self.pan_center[1] * source_scale
+            else:
+                cx, cy = w / 2, h / 2
+            # 限制中心位置，使可见区域不超出画面
+            cx = min(max(cx, view_w / 2), w - view_w / 2)
+            cy = min(max(cy, view_h / 2), h - view_h / 2)
+            self.pan_center = (cx / source_scale, cy / source_scale)
+            x0 = max(0, int(cx - view_w / 2))
+            y0 = max(0, int(cy - view_h / 2))
+            x1 = min(w, x0 + max(1, int(round(view_w))))
+            y1 = min(h, y0 + max(1, int(round(view_h))))
+
         # 应用缩放比例
-        new_width = int(w * self.zoom_factor)
-        new_height = int(h * self.zoom_factor)
-        
+        new_width = int(round((x1 - x0) * zoom))
+        new_height = int(round((y1 - y0) * zoom))
+
         # 确保缩放后的尺寸有效
         if new_width <= 0 or new_height <= 0:
-            # 如果缩放比例过小，使用原始尺寸或一个最小尺寸
-            scaled_pixmap = pixmap.scaled(self.video_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            # 如果缩放比例过小，按显示区域大小等比缩放
+            scale = min(label_w / w, label_h / h)
+            new_width, new_height = max(1, int(w * scale)), max(1, int(h * scale))
+
+        roi = frame[y0:y1, x0:x1]
+        # 缩小时先缩放再转换颜色（像素更少），放大时先转换再缩放
+        if new_width * new_height < roi.shape[0] * roi.shape[1]:
+            scaled = cv2.resize(roi, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+            rgb_frame = cv2.cvtColor(scaled, cv2.COLOR_BGR2RGB)
         else:
-            scaled_pixmap = pixmap.scaled(new_width, new_height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            rgb_frame = cv2.cvtColor(roi, cv2.COLOR_BGR2RGB)
+            if rgb_frame.shape[1] != new_width or rgb_frame.shape[0] != new_height:
+                rgb_frame = cv2.resize(rgb_frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+
+        # 转换OpenCV格式(BGR)到Qt格式(RGB)后创建QImage
+        out_h, out_w, ch = rgb_frame.shape
+        image = QImage(rgb_frame.data, out_w, out_h, ch * out_w, QImage.Format_RGB888)
+        self.video_label.setPixmap(QPixmap.fromImage(image))
+        if self.pan_last_pos is None:
+            self.update_pan_cursor()
+
+    def refresh_frame(self):
+        """用当前帧重新绘制（缩放或平移后），不读取新帧"""
+        if self.frame_image is not None:
+            self.display_frame(self.frame_image, self.frame_scale)
 
-        self.video_label.setPixmap(scaled_pixmap)
-            
     def slider_pressed(self):
         """滑块被按下时暂停视频并记录状态"""
         self.was_playing = self.is_playing
@@ -534,17 +952,34 @@ class VideoPlayer(QWidget):
         if not self.cap:
             return
             
+        restart_shuttle = self.shuttle_reader is not None
+        if restart_shuttle:
+            self.stop_shuttle(sync=False)
         self.current_frame = position
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, position)
-        self.position_changed.emit(position)
-        self.update_time_label()
+        self.shuttle_synced = True
         
-        # 更新当前帧显示
-        ret, frame = self.cap.read()
-        if ret:
+        # 更新当前帧显示；附近的帧已解码过时直接从缓存中取
+        frame = self.read_frame(position)
+        if frame is not None:
             self.display_frame(frame)
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, position)  # 重置位置，因为读取帧会前进一帧
+        self.current_pts_ms = self.pts_index.time_for_frame(position) if self.pts_index else 0
+
+        self.position_changed.emit(position)
+        self.update_time_label()
+        self.time_changed.emit(self.get_current_time_ms())
+        if restart_shuttle:
+            self.start_shuttle()
         
+    def seek_to_ms(self, time_ms):
+        """跳转到指定时间（毫秒）"""
+        if not self.cap or self.fps <= 0:
+            return
+        position = min(self.pts_index.frame_for_time(time_ms), max(0, self.total_frames - 1))
+        self.slider.blockSignals(True)
+        self.slider.setValue(position)
+        self.slider.blockSignals(False)
+        self.set_position(position)
+            
     def slider_released(self):
         """滑块释放后根据之前的状态决定是否恢复播放"""
         if hasattr(self, 'was_playing') and self.was_playing:
@@ -555,8 +990,8 @@ class VideoPlayer(QWidget):
         if self.fps <= 0:
             return
             
-        current_time = self.current_frame / self.fps
-        total_time = self.total_frames / self.fps
+        current_time = self.get_current_time_ms() / 1000
+        total_time = self.get_video_duration()
         
         current_minutes = int(current_time // 60)
         current_seconds = int(current_time % 60)
@@ -576,16 +1011,20 @@ class VideoPlayer(QWidget):
         if not self.cap:
             return "00:00.000"
 
-        current_time = self.current_frame / self.fps
-        minutes = int(current_time // 60)
-        seconds = int(current_time % 60)
-        milliseconds = int((current_time * 1000) % 1000)
-        return f"{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+        return format_time_ms(self.get_current_time_ms())
+        
+    def get_current_time_ms(self):
+        """获取当前显示帧的时间戳（毫秒），来自解码器 PTS 而不是帧计数"""
+        if not self.cap:
+            return 0
+        return self.current_pts_ms
         
     def get_video_duration(self):
         """获取视频总时长（秒）"""
         if self.fps <= 0:
             return 0
+        if self.pts_index is not None:
+            return self.pts_index.duration_ms() / 1000
         
         return self.total_frames / self.fps
 
@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import uuid
+import socket
+import hashlib
+
+LEASE_TTL = 300  # 租约在多少秒没有心跳后过期，可被其他实例接手
+HEARTBEAT_INTERVAL = 60  # 心跳间隔（秒），应明显小于 LEASE_TTL
+
+
+class LeaseManager:
+    """
+    共享存储上的病例租约，协调多台工作站同时标注同一个数据文件夹。
+
+    每个病例对应租约目录中的一个文件，用 O_CREAT | O_EXCL 原子创建，创建成功即获得租约；
+    持有者定期更新文件的修改时间作为心跳。过期判断使用共享存储自己的时钟
+    （新建一个探测文件读取其修改时间），不依赖各工作站的本地时间一致。
+
+    接手过期租约时先把它原子地改名为本实例专有的名字：多个实例同时接手时只有一个改名成功。
+    如果改名拿到的已经是别人刚建立的新租约，则原样放回。
+    """
+
+    def __init__(self, lease_folder, owner=None, ttl=LEASE_TTL):
+        self.lease_folder = lease_folder
+        self.owner = owner or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.ttl = ttl
+        self.held = set()  # 本实例持有的病例
+        os.makedirs(lease_folder, exist_ok=True)
+
+    def _lease_path(self, case_key):
+        key = hashlib.sha1(case_key.encode("utf-8")).hexdigest()
+        return os.path.join(self.lease_folder, f"{key}.lease")
+
+    def _read(self, path):
+        """读取租约内容和修改时间，文件不存在或正在写入时返回 (None, None)"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data, os.path.getmtime(path)
+        except (OSError, ValueError):
+            return None, None
+
+    def storage_time(self):
+        """共享存储当前的时间（取一个刚写入的探测文件的修改时间）"""
+        probe_path = os.path.join(self.lease_folder, f".clock-{self.owner}")
+        try:
+            with open(probe_path, 'w', encoding='utf-8') as f:
+                f.write(self.owner)
+            now = os.path.getmtime(probe_path)
+            os.remove(probe_path)
+            return now
+        except OSError:
+            return time.time()
+
+    def _create(self, path, case_key):
+        """原子地创建租约文件，已存在时返回 False"""
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({"owner": self.owner, "case": case_key, "acquired": time.strftime("%Y-%m-%dT%H:%M:%S")},
+                      f, ensure_ascii=False)
+        return True
+
+    def _take_over_expired(self, path, expected_owner):
+        """把过期租约改名移走，移走的正是过期的那份时返回 True"""
+        tombstone = f"{path}.expired-{self.owner}"
+        try:
+            os.rename(path, tombstone)
+        except OSError:
+            return False  # 已被其他实例接手或释放
+        data, _ = self._read(tombstone)
+        if data is not None and data.get("owner") != expected_owner:
+            # 移走的是别人刚创建的新租约，放回原处（目标已存在时不覆盖）
+            try:
+                os.link(tombstone, path)
+            except OSError:
+                pass
+            os.remove(tombstone)
+            return False
+        os.remove(tombstone)
+        return True
+
+    def try_acquire(self, case_key):
+        """
+        尝试获得病例的租约
+
+        Returns:
+            bool: 获得（或本来就持有）租约时返回 True
+        """
+        path = self._lease_path(case_key)
+        for _ in range(2):
+            if self._create(path, case_key):
+                self.held.add(case_key)
+                return True
+            data, mtime = self._read(path)
+            if data is None:
+                continue  # 刚被释放或正在写入，重试一次
+            if data.get("owner") == self.owner:
+                self.held.add(case_key)
+                os.utime(path)
+                return True
+            if self.storage_time() - mtime <= self.ttl:
+                return False
+            print(f"接手过期的租约: {case_key}（原持有者 {data.get('owner')}）")
+            if not self._take_over_expired(path, data.get("owner")):
+                return False
+        return False
+
+    def claim(self, case_key):
+        """获得一个病例的租约并释放本实例持有的其他租约（每个实例同时只处理一个病例）"""
+        if not self.try_acquire(case_key):
+            return False
+        for other in list(self.held - {case_key}):
+            self.release(other)
+        return True
+
+    def release(self, case_key):
+        """释放租约，只删除仍属于本实例的租约文件"""
+        self.held.discard(case_key)
+        path = self._lease_path(case_key)
+        data, _ = self._read(path)
+        if data is not None and data.get("owner") == self.owner:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"释放租约失败: {case_key}, {e}")
+
+    def release_all(self):
+        for case_key in list(self.held):
+            self.release(case_key)
+
+    def heartbeat(self):
+        """
+        更新所有持有租约的修改时间
+
+        Returns:
+            list: 已经失去的租约（过期后被其他实例接手）
+        """
+        lost = []
+        for case_key in list(self.held):
+            path = self._lease_path(case_key)
+            data, _ = self._read(path)
+            if data is None or data.get("owner") != self.owner:
+                self.held.discard(case_key)
+                lost.append(case_key)
+                continue
+            try:
+                os.utime(path)
+            except OSError as e:
+                print(f"更新租约心跳失败: {case_key}, {e}")
+        return lost